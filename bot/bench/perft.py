@@ -0,0 +1,195 @@
+"""Perft node counts for the move generator.
+
+Counts leaf positions reachable in N turns and compares them with stored
+expected values. A turn is a complete move: a capture sequence is followed
+to its end, and the other side moves next.
+
+Usage: python -m bot.bench.perft [--depth N] [--position NAME]
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from bot.bl.board import Board
+from bot.bl.piece import Piece, PieceColor, PieceType
+from bot.bl.variant import ENGLISH, INTERNATIONAL_10X10, RUSSIAN, Variant
+
+
+@dataclass
+class PerftCase:
+    name: str
+    white: str
+    black: str
+    color: PieceColor
+    expected: Sequence[int]
+    variant: Variant = RUSSIAN
+
+    def board(self) -> Board:
+        return position(self.white, self.black, self.variant)
+
+
+def position(white: str, black: str, variant: Variant = RUSSIAN) -> Board:
+    """Build a board from space separated squares, "K" marks a king."""
+    board = Board.from_masks(0, 0, 0, variant)
+    for color, squares in (
+        (PieceColor.WHITE, white), (PieceColor.BLACK, black)
+    ):
+        for square in squares.split():
+            king = square.startswith('K')
+            board.set_piece(square.lstrip('K'), Piece(
+                color=color,
+                type=PieceType.KING if king else PieceType.REGULAR
+            ))
+    return board
+
+
+# expected[i] is the node count at depth i + 1
+CASES: List[PerftCase] = [
+    PerftCase(
+        name='initial',
+        white='a1 c1 e1 g1 b2 d2 f2 h2 a3 c3 e3 g3',
+        black='b6 d6 f6 h6 a7 c7 e7 g7 b8 d8 f8 h8',
+        color=PieceColor.WHITE,
+        expected=[7, 49, 302, 1469, 7482, 37986],
+    ),
+    PerftCase(
+        name='king-chain-filter',
+        white='Ka1 e1', black='c3 f6 b6 g3',
+        color=PieceColor.WHITE,
+        expected=[6, 24, 181, 552, 4159, 12371, 92936],
+    ),
+    PerftCase(
+        name='king-multi-capture',
+        white='Kc1 a1', black='d2 d4 f4 f6 b6 d6',
+        color=PieceColor.WHITE,
+        expected=[7, 20, 124, 257, 1445, 4137, 25797, 79006],
+    ),
+    PerftCase(
+        # The king may not cross e7, taken earlier in the sequence, to
+        # capture g5 as well
+        name='turkish-strike',
+        white='Kb2', black='c3 d2 g5 e7',
+        color=PieceColor.WHITE,
+        expected=[2, 8, 26, 96, 613, 3474, 23513],
+    ),
+    PerftCase(
+        name='promotion-mid-capture',
+        white='d6 a1 g1', black='e7 g7 c7 b4 h4',
+        color=PieceColor.WHITE,
+        expected=[2, 12, 102, 464, 2982, 11835, 67813],
+    ),
+    PerftCase(
+        name='kings-endgame',
+        white='Ka1 Kh2 c3', black='Kh8 Ka7 f6',
+        color=PieceColor.BLACK,
+        expected=[10, 82, 634, 4648, 34418],
+    ),
+    PerftCase(
+        name='men-race',
+        white='a3 c3 e3 g3 b2 h2', black='b6 d6 f6 h6 a7 g7',
+        color=PieceColor.WHITE,
+        expected=[7, 49, 262, 1045, 3858, 14004, 48769],
+    ),
+    PerftCase(
+        name='international-initial',
+        white=(
+            'a1 c1 e1 g1 i1 b2 d2 f2 h2 j2 '
+            'a3 c3 e3 g3 i3 b4 d4 f4 h4 j4'
+        ),
+        black=(
+            'a7 c7 e7 g7 i7 b8 d8 f8 h8 j8 '
+            'a9 c9 e9 g9 i9 b10 d10 f10 h10 j10'
+        ),
+        color=PieceColor.WHITE,
+        expected=[9, 81, 658, 4265, 27117, 167140],
+        variant=INTERNATIONAL_10X10,
+    ),
+    PerftCase(
+        name='english-initial',
+        white='a1 c1 e1 g1 b2 d2 f2 h2 a3 c3 e3 g3',
+        black='b6 d6 f6 h6 a7 c7 e7 g7 b8 d8 f8 h8',
+        color=PieceColor.WHITE,
+        expected=[7, 49, 302, 1469, 7361, 36768, 179740],
+        variant=ENGLISH,
+    ),
+]
+
+
+def perft(board: Board, color: PieceColor, depth: int) -> int:
+    if depth == 0:
+        return 1
+
+    turns = board.get_turns(color)
+    if depth == 1:
+        return len(turns)
+
+    opponent = (
+        PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+    )
+    nodes = 0
+    for turn in turns:
+        tokens = [board.make_move(move) for move in turn]
+        nodes += perft(board, opponent, depth - 1)
+        for token in reversed(tokens):
+            board.unmake_move(token)
+
+    return nodes
+
+
+def run(cases: List[PerftCase], max_depth: int | None) -> bool:
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+
+    for case in cases:
+        depths = len(case.expected)
+        if max_depth is not None:
+            depths = min(depths, max_depth)
+
+        for depth in range(1, depths + 1):
+            board = case.board()
+            started = time.perf_counter()
+            nodes = perft(board, case.color, depth)
+            elapsed = time.perf_counter() - started
+
+            expected = case.expected[depth - 1]
+            status = 'ok' if nodes == expected else f'FAIL (want {expected})'
+            ok = ok and nodes == expected
+            total_nodes += nodes
+            total_time += elapsed
+
+            print(
+                f'{case.name:<24} depth {depth}: {nodes:>9} nodes '
+                f'{elapsed:8.3f}s {_rate(nodes, elapsed):>12} {status}'
+            )
+
+    print(f'total: {total_nodes} nodes {_rate(total_nodes, total_time)}')
+    return ok
+
+
+def _rate(nodes: int, elapsed: float) -> str:
+    return f'{nodes / elapsed:,.0f} n/s' if elapsed > 0 else '-'
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument(
+        '--position',
+        choices=[case.name for case in CASES],
+        action='append',
+    )
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.position:
+        by_name: Dict[str, PerftCase] = {case.name: case for case in CASES}
+        cases = [by_name[name] for name in args.position]
+
+    return 0 if run(cases, args.depth) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""Random self-play through the public Board API.
+
+Plays many games in worker processes, picking turns at random or with a
+one-turn lookahead, and checks on every turn that:
+
+- the side to move has a move, and captures when it has to, taking the
+  most pieces where the variant demands it;
+- no piece appears or disappears except the captured ones, which were
+  the opponent's;
+- no man stands on the row it promotes on, and a new king has reached
+  it during its turn;
+- ``to_dict``/``from_dict`` gives back the same position.
+
+A broken invariant is reported with the seed and game number, and the
+exit status is 1. Games and plies per second are printed per variant.
+
+Usage: python -m bot.bench.selfplay [--games N] [--workers N]
+    [--variant NAME] [--policy random|greedy] [--seed N] [--no-check]
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+from bot.bl.board import Board
+from bot.bl.engine import evaluate
+from bot.bl.move import PROMOTED_FLAG, Move
+from bot.bl.piece import PieceColor
+from bot.bl.variant import VARIANTS, Variant, VariantName, get_variant
+
+# Games a worker plays before reporting back
+BATCH = 200
+# Games still running after this many turns count as draws
+MAX_TURNS = 200
+# Broken games listed per variant
+MAX_REPORTED = 10
+
+Policy = Callable[
+    [Board, PieceColor, List[List[Move]], random.Random], List[Move]
+]
+
+
+class Violation(Exception):
+    pass
+
+
+class BatchResult(NamedTuple):
+    games: int
+    turns: int
+    plies: int
+    # white wins, draws, black wins
+    results: List[int]
+    violations: List[str]
+
+
+def _opponent(color: PieceColor) -> PieceColor:
+    return PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+
+
+def random_policy(
+    board: Board,
+    color: PieceColor,
+    turns: List[List[Move]],
+    rng: random.Random
+) -> List[Move]:
+    return rng.choice(turns)
+
+
+def greedy_policy(
+    board: Board,
+    color: PieceColor,
+    turns: List[List[Move]],
+    rng: random.Random
+) -> List[Move]:
+    """The turn with the best static score, ties broken at random."""
+    def score(turn: List[Move]) -> float:
+        tokens = [board.make_move(move) for move in turn]
+        value = evaluate(board, color)
+        for token in reversed(tokens):
+            board.unmake_move(token)
+        return value + rng.random()
+
+    return max(turns, key=score)
+
+
+POLICIES: Dict[str, Policy] = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
+
+
+def _check_obligation(
+    board: Board, color: PieceColor, turns: List[List[Move]]
+) -> None:
+    if not turns:
+        raise Violation('no turn in a position that is not over')
+
+    # Capture paths already know whether a jump crowns the man
+    valid = {
+        move.code & ~PROMOTED_FLAG
+        for moves in board.get_all_valid_moves(color).values()
+        for move in moves
+    }
+    if valid != {turn[0].code & ~PROMOTED_FLAG for turn in turns}:
+        raise Violation('valid moves differ from the first moves of turns')
+
+    must_capture = board.has_mandatory_captures(color)
+    captures = [turn for turn in turns if turn[0].is_capture]
+    if must_capture:
+        if len(captures) != len(turns):
+            raise Violation('a quiet move is offered while a capture is due')
+        if set(must_capture) != {turn[0].from_pos for turn in turns}:
+            raise Violation('mandatory captures differ from the capturers')
+        if board.variant.majority_capture and len(
+            {len(turn) for turn in turns}
+        ) > 1:
+            raise Violation('a shorter capture is offered under majority')
+    elif captures:
+        raise Violation('a capture is offered but not made mandatory')
+
+
+def _check_promotion(board: Board) -> None:
+    geometry = board.geometry
+    men = ~board.kings
+    if (
+        board.white & men & geometry.white_promotion
+        or board.black & men & geometry.black_promotion
+    ):
+        raise Violation('a man stands on its promotion row')
+
+
+def _play_turn(board: Board, color: PieceColor, turn: List[Move]) -> None:
+    opponent = _opponent(color)
+    own = board.count_pieces(color)
+    theirs = board.count_pieces(opponent)
+    material = board.material
+    kings_before = (
+        material.white_kings if color == PieceColor.WHITE
+        else material.black_kings
+    )
+
+    captured = 0
+    for move in turn:
+        for pos in move.captured_positions:
+            piece = board.get_piece(pos)
+            if piece is None or piece.color != opponent:
+                raise Violation(f'{pos} is captured but is not an enemy')
+        if not board.execute_move(move):
+            raise Violation(f'{move.from_pos}-{move.to_pos} was rejected')
+        captured += len(move.captured_positions)
+
+    if board.count_pieces(color) != own:
+        raise Violation('the side to move lost or gained a piece')
+    if board.count_pieces(opponent) != theirs - captured:
+        raise Violation('captured pieces do not match the pieces removed')
+
+    material = board.material
+    pieces = [0, 0, 0, 0]
+    for piece in board.squares.values():
+        if piece is not None:
+            slot = 0 if piece.color == PieceColor.WHITE else 2
+            pieces[slot + piece.is_king()] += 1
+    if tuple(pieces) != tuple(material):
+        raise Violation('material counts differ from the squares')
+
+    _check_promotion(board)
+    kings_after = (
+        material.white_kings if color == PieceColor.WHITE
+        else material.black_kings
+    )
+    crowned = kings_after - kings_before
+    if crowned not in (0, 1):
+        raise Violation(f'{crowned} kings were crowned in one turn')
+    promotion = board.geometry.promotion(color == PieceColor.WHITE)
+    if crowned and not any(promotion >> move.to_sq & 1 for move in turn):
+        raise Violation('a king was crowned away from the promotion row')
+
+
+def _check_round_trip(board: Board) -> None:
+    copy = Board.from_dict(board.to_dict())
+    if (
+        copy.variant is not board.variant
+        or (copy.white, copy.black, copy.kings)
+        != (board.white, board.black, board.kings)
+        or copy.position_hash(PieceColor.WHITE)
+        != board.position_hash(PieceColor.WHITE)
+    ):
+        raise Violation('to_dict/from_dict changes the position')
+
+
+def play_game(
+    variant: Variant,
+    policy: Policy,
+    rng: random.Random,
+    max_turns: int,
+    check: bool = True,
+) -> BatchResult:
+    """Play one game, counted as a batch of one.
+
+    A broken invariant raises ``Violation``; without ``check`` only the
+    moves are played, which times the rules alone.
+    """
+    board = Board(variant)
+    color = PieceColor.WHITE
+    plies = 0
+    for number in range(max_turns):
+        over, winner = board.is_game_over()
+        if over:
+            result = 0 if winner == PieceColor.WHITE else 2
+            break
+
+        turns = board.get_turns(color)
+        try:
+            if check:
+                _check_obligation(board, color, turns)
+            turn = policy(board, color, turns, rng)
+            if check:
+                _play_turn(board, color, turn)
+                _check_round_trip(board)
+            else:
+                for move in turn:
+                    board.execute_move(move)
+        except Violation as error:
+            raise Violation(f'turn {number + 1}: {error}') from None
+        plies += len(turn)
+        color = _opponent(color)
+    else:
+        # The last turn may have ended the game
+        number, result = max_turns, 1
+        over, winner = board.is_game_over()
+        if over:
+            result = 0 if winner == PieceColor.WHITE else 2
+
+    results = [0, 0, 0]
+    results[result] += 1
+    return BatchResult(1, number, plies, results, [])
+
+
+def play_batch(
+    variant_name: str,
+    policy_name: str,
+    seed: int,
+    first: int,
+    count: int,
+    max_turns: int,
+    check: bool = True,
+) -> BatchResult:
+    """Play games ``first`` to ``first + count`` of a run."""
+    variant = get_variant(variant_name)
+    policy = POLICIES[policy_name]
+    games = turns = plies = 0
+    results = [0, 0, 0]
+    violations: List[str] = []
+
+    for number in range(first, first + count):
+        rng = random.Random(f'{seed}:{number}')
+        try:
+            game = play_game(variant, policy, rng, max_turns, check)
+        except Violation as error:
+            violations.append(f'seed {seed} game {number}, {error}')
+            continue
+        games += 1
+        turns += game.turns
+        plies += game.plies
+        for slot, value in enumerate(game.results):
+            results[slot] += value
+
+    return BatchResult(games, turns, plies, results, violations)
+
+
+def run(
+    variants: Sequence[Variant],
+    games: int,
+    pool: ProcessPoolExecutor,
+    policy: str,
+    seed: int,
+    max_turns: int,
+    check: bool = True,
+) -> bool:
+    ok = True
+    for variant in variants:
+        started = time.perf_counter()
+        batches = list(pool.map(
+            partial(
+                _play_range, variant.name, policy, seed, games, max_turns,
+                check,
+            ),
+            range(0, games, BATCH),
+        ))
+        elapsed = time.perf_counter() - started
+
+        played = sum(batch.games for batch in batches)
+        plies = sum(batch.plies for batch in batches)
+        turns = sum(batch.turns for batch in batches)
+        white, draws, black = (
+            sum(batch.results[slot] for batch in batches) for slot in range(3)
+        )
+        violations = [
+            violation for batch in batches for violation in batch.violations
+        ]
+        ok = ok and not violations
+
+        print(
+            f'{variant.name:<14} {played:>8} games {turns:>10} turns '
+            f'{plies:>10} plies {elapsed:8.2f}s '
+            f'{_rate(played, elapsed, "games")} '
+            f'{_rate(plies, elapsed, "plies")} '
+            f'W/D/B {white}/{draws}/{black} '
+            f'{"ok" if not violations else f"FAIL ({len(violations)})"}'
+        )
+        for violation in violations[:MAX_REPORTED]:
+            print(f'  {violation}')
+
+    return ok
+
+
+def _play_range(
+    variant_name: str,
+    policy: str,
+    seed: int,
+    games: int,
+    max_turns: int,
+    check: bool,
+    first: int,
+) -> BatchResult:
+    return play_batch(
+        variant_name, policy, seed, first, min(BATCH, games - first),
+        max_turns, check,
+    )
+
+
+def _rate(count: int, elapsed: float, unit: str) -> str:
+    rate = f'{count / elapsed:,.0f}' if elapsed > 0 else '-'
+    return f'{rate:>10} {unit}/s'
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument(
+        '--variant', choices=list(VariantName), action='append'
+    )
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS)
+    parser.add_argument(
+        '--no-check', action='store_true',
+        help='only play the moves, to time the rules engine',
+    )
+    args = parser.parse_args(argv)
+
+    variants = [
+        get_variant(name) for name in args.variant or VARIANTS
+    ]
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as pool:
+        ok = run(
+            variants, args.games, pool, args.policy, args.seed,
+            args.max_turns, not args.no_check,
+        )
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Legal moves and game state derived once per board position."""
+from typing import Dict, List, Tuple
+
+from bot.bl.bitboard import BLACK_FORWARD, WHITE_FORWARD, iter_bits
+from bot.bl.capture import CaptureNode, build_capture_tree, single_captures
+from bot.bl.move import Move, encode
+from bot.bl.piece import PieceColor
+from bot.bl.variant import RUSSIAN, Variant
+
+# Bump whenever move generation changes, so legal-move maps persisted by an
+# older version are regenerated instead of trusted
+RULES_VERSION = 2
+
+
+def normal_targets(
+    variant: Variant, sq: int, color: PieceColor, king: bool, occupied: int
+) -> List[int]:
+    geometry = variant.geometry
+    targets = []
+
+    if king and variant.flying_kings:
+        for ray in geometry.rays[sq]:
+            for target in ray:
+                if occupied & 1 << target:
+                    break
+                targets.append(target)
+        return targets
+
+    if king:
+        directions: Tuple[int, ...] = (0, 1, 2, 3)
+    elif color == PieceColor.WHITE:
+        directions = WHITE_FORWARD
+    else:
+        directions = BLACK_FORWARD
+    for d in directions:
+        target = geometry.steps[sq][d]
+        if target >= 0 and not occupied & 1 << target:
+            targets.append(target)
+
+    return targets
+
+
+def capture_moves(
+    variant: Variant, sq: int, captures: List[Tuple[int, int]]
+) -> List[Move]:
+    return [
+        Move.from_code(encode(sq, land, 1 << captured), variant.geometry)
+        for land, captured in captures
+    ]
+
+
+def tree_moves(variant: Variant, node: CaptureNode) -> List[Move]:
+    """Moves for the next jump of a capture sequence."""
+    return [
+        Move.from_code(
+            encode(node.square, land, 1 << captured), variant.geometry
+        )
+        for land, (captured, _) in node.jumps.items()
+    ]
+
+
+class PositionAnalysis:
+    """Everything the controllers ask about one position.
+
+    Each side's moves are generated on first use and reused for move
+    validation, game-over detection, serialisation and keyboard rendering.
+    The analysis is tied to the masks it was built from; Board drops it as
+    soon as a square changes.
+    """
+
+    __slots__ = (
+        'white', 'black', 'kings', 'variant',
+        '_moves', '_must_capture', '_capture_trees', '_game_over',
+    )
+
+    def __init__(
+        self, white: int, black: int, kings: int, variant: Variant = RUSSIAN
+    ) -> None:
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.variant = variant
+        self._moves: Dict[PieceColor, Dict[str, List[Move]]] = {}
+        self._must_capture: Dict[PieceColor, List[str]] = {}
+        self._capture_trees: Dict[int, CaptureNode | None] = {}
+        self._game_over: Tuple[bool, PieceColor | None] | None = None
+
+    def _sides(self, color: PieceColor) -> Tuple[int, int]:
+        if color == PieceColor.WHITE:
+            return self.white, self.black
+        return self.black, self.white
+
+    def _generate(self, color: PieceColor) -> None:
+        variant = self.variant
+        positions = variant.geometry.positions
+        white = color == PieceColor.WHITE
+        own, enemy = self._sides(color)
+        moves: Dict[str, List[Move]] = {}
+
+        for sq in iter_bits(own):
+            captures = single_captures(
+                variant, sq, own, enemy, bool(self.kings & 1 << sq), white
+            )
+            if captures:
+                moves[positions[sq]] = capture_moves(variant, sq, captures)
+
+        if moves and variant.majority_capture:
+            moves = self._majority(moves)
+
+        self._must_capture[color] = list(moves)
+
+        if not moves:
+            occupied = own | enemy
+            for sq in iter_bits(own):
+                targets = normal_targets(
+                    variant, sq, color, bool(self.kings & 1 << sq), occupied
+                )
+                if targets:
+                    moves[positions[sq]] = [
+                        Move.from_code(encode(sq, target), variant.geometry)
+                        for target in targets
+                    ]
+
+        self._moves[color] = moves
+
+    def _majority(
+        self, moves: Dict[str, List[Move]]
+    ) -> Dict[str, List[Move]]:
+        # Only pieces starting one of the longest sequences may capture,
+        # and only with a jump that stays on such a sequence
+        trees = {pos: self.capture_tree(pos) for pos in moves}
+        longest = max(tree.length for tree in trees.values() if tree)
+        return {
+            pos: tree_moves(self.variant, tree)
+            for pos, tree in trees.items()
+            if tree and tree.length == longest
+        }
+
+    def preload(self, color: PieceColor, moves: Dict[str, List[Move]]) -> None:
+        """Use a move map generated earlier for this exact position."""
+        self._moves[color] = moves
+        self._must_capture[color] = [
+            pos for pos, piece_moves in moves.items()
+            if piece_moves[0].is_capture
+        ]
+
+    def moves(self, color: PieceColor) -> Dict[str, List[Move]]:
+        """Legal moves for ``color`` keyed by the square they start from."""
+        if color not in self._moves:
+            self._generate(color)
+        return self._moves[color]
+
+    def must_capture(self, color: PieceColor) -> List[str]:
+        """Squares of ``color`` pieces that have a capture available."""
+        if color not in self._must_capture:
+            self._generate(color)
+        return self._must_capture[color]
+
+    def capture_tree(self, pos: str) -> CaptureNode | None:
+        sq = self.variant.geometry.square_index.get(pos)
+        if sq is None:
+            return None
+        if sq in self._capture_trees:
+            return self._capture_trees[sq]
+
+        bit = 1 << sq
+        tree: CaptureNode | None = None
+        if (self.white | self.black) & bit:
+            color = PieceColor.WHITE if self.white & bit else PieceColor.BLACK
+            own, enemy = self._sides(color)
+            tree = build_capture_tree(
+                self.variant, sq, own, enemy, bool(self.kings & bit),
+                color == PieceColor.WHITE
+            )
+            if tree.is_final:
+                tree = None
+
+        self._capture_trees[sq] = tree
+        return tree
+
+    @property
+    def game_over(self) -> Tuple[bool, PieceColor | None]:
+        if self._game_over is None:
+            self._game_over = self._detect_game_over()
+        return self._game_over
+
+    def _detect_game_over(self) -> Tuple[bool, PieceColor | None]:
+        if not self.white:
+            return True, PieceColor.BLACK
+        if not self.black:
+            return True, PieceColor.WHITE
+
+        if not self.moves(PieceColor.WHITE):
+            return True, PieceColor.BLACK
+        if not self.moves(PieceColor.BLACK):
+            return True, PieceColor.WHITE
+
+        return False, None
@@ -0,0 +1,175 @@
+"""Analysis boards: positions from past games the user plays on freely.
+
+A session starts from a frame of the history viewer and lets its owner
+play both sides, a whole turn per move, with undo and redo. Sessions
+live only in the bot process: one per user, dropped after ``TTL``
+seconds without use or, past ``MAX_SESSIONS``, least recently used
+first. Nothing is written to the database.
+"""
+import secrets
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Tuple
+from uuid import UUID
+
+from bot.bl.board import Board
+from bot.bl.move import Move
+from bot.bl.piece import PieceColor
+from bot.bl.variant import Variant
+
+TTL = 30 * 60
+MAX_SESSIONS = 1000
+# Turns kept for undo
+MAX_TURNS = 300
+
+
+class Frame(NamedTuple):
+    white: int
+    black: int
+    kings: int
+    turn: PieceColor
+
+
+class AnalysisSession:
+    """Positions played from a game frame and the one being shown."""
+
+    __slots__ = (
+        'id', 'variant', 'game_id', 'move_number', 'locale', 'frames',
+        'cursor', 'selected', 'board',
+    )
+
+    def __init__(
+        self,
+        variant: Variant,
+        game_id: UUID,
+        move_number: int,
+        board: Board,
+        turn: PieceColor,
+        locale: str = 'en',
+    ) -> None:
+        # Tells the buttons of an older session's message apart
+        self.id = secrets.token_hex(4)
+        self.variant = variant
+        self.game_id = game_id
+        self.move_number = move_number
+        self.locale = locale
+        self.frames: List[Frame] = [
+            Frame(board.white, board.black, board.kings, turn)
+        ]
+        self.cursor = 0
+        self.selected: str | None = None
+        self.board = board
+
+    @property
+    def turn(self) -> PieceColor:
+        return self.frames[self.cursor].turn
+
+    @property
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.frames) - 1
+
+    def _show(self, cursor: int) -> None:
+        self.cursor = cursor
+        self.selected = None
+        frame = self.frames[cursor]
+        self.board = Board.from_masks(
+            frame.white, frame.black, frame.kings, self.variant
+        )
+
+    def turns_from(self, pos: str) -> List[List[Move]]:
+        return [
+            turn for turn in self.board.get_turns(self.turn)
+            if turn[0].from_pos == pos
+        ]
+
+    def play(self, from_pos: str, to_pos: str) -> bool:
+        """Play the turn from ``from_pos`` ending on ``to_pos``.
+
+        Turns played after the shown position are replaced.
+        """
+        turn = next(
+            (
+                moves for moves in self.turns_from(from_pos)
+                if moves[-1].to_pos == to_pos
+            ),
+            None,
+        )
+        if turn is None:
+            return False
+
+        for move in turn:
+            self.board.execute_move(move)
+        board = self.board
+        next_turn = (
+            PieceColor.BLACK if self.turn == PieceColor.WHITE
+            else PieceColor.WHITE
+        )
+        del self.frames[self.cursor + 1:]
+        self.frames.append(
+            Frame(board.white, board.black, board.kings, next_turn)
+        )
+        if len(self.frames) > MAX_TURNS:
+            del self.frames[0]
+        self.cursor = len(self.frames) - 1
+        self.selected = None
+        return True
+
+    def undo(self) -> bool:
+        if not self.can_undo:
+            return False
+        self._show(self.cursor - 1)
+        return True
+
+    def redo(self) -> bool:
+        if not self.can_redo:
+            return False
+        self._show(self.cursor + 1)
+        return True
+
+
+class SessionStore:
+    """Analysis sessions by user, bounded in number and idle time."""
+
+    def __init__(self, ttl: float = TTL, size: int = MAX_SESSIONS) -> None:
+        self.ttl = ttl
+        self.size = size
+        self._sessions: OrderedDict[
+            int, Tuple[AnalysisSession, float]
+        ] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            _, (_, used) = next(iter(self._sessions.items()))
+            if now - used < self.ttl and len(self._sessions) <= self.size:
+                break
+            self._sessions.popitem(last=False)
+
+    def put(self, user_id: int, session: AnalysisSession) -> None:
+        """Start ``session`` for the user, replacing their previous one."""
+        now = time.monotonic()
+        self._sessions.pop(user_id, None)
+        self._sessions[user_id] = (session, now)
+        self._evict(now)
+
+    def get(
+        self, user_id: int, session_id: str
+    ) -> AnalysisSession | None:
+        """The user's session if ``session_id`` is still the live one."""
+        now = time.monotonic()
+        self._evict(now)
+        found = self._sessions.get(user_id)
+        if found is None or found[0].id != session_id:
+            return None
+        self._sessions[user_id] = (found[0], now)
+        self._sessions.move_to_end(user_id)
+        return found[0]
+
+
+sessions = SessionStore()
@@ -0,0 +1,407 @@
+"""Vectorised rules engine for many positions at once.
+
+A ``BoardBatch`` keeps N positions as arrays of 32-bit square masks, the
+same layout as ``Board``. A step towards one of the four directions is a
+couple of masked shifts, so legal moves, move application and game-over
+detection cost a fixed number of NumPy operations per batch whatever its
+size. The results match ``PositionAnalysis`` for the Russian rules on
+the 8x8 board, the only variant covered; single moves are exchanged as
+``bot.bl.move`` codes. One difference remains: captured pieces leave the
+board as they are jumped, so a king in the middle of a sequence may cross
+squares that ``PositionAnalysis`` still counts as occupied.
+
+Legal moves are kept as origin masks: bit ``sq`` of ``origins[n, d, k]``
+is set when the piece on ``sq`` may move ``k + 1`` squares towards
+``DIRECTIONS[d]``.
+"""
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from bot.bl import move as move_codes
+from bot.bl.bitboard import (
+    BIT,
+    BLACK_FORWARD,
+    BLACK_PROMOTION,
+    RAYS,
+    SQUARE_COUNT,
+    STEPS,
+    WHITE_FORWARD,
+    WHITE_PROMOTION,
+)
+from bot.bl.board import Board
+from bot.bl.piece import PieceColor
+from bot.bl.variant import RUSSIAN
+
+# Values of BoardBatch.turn and of the winner array from game_over
+WHITE, BLACK = 0, 1
+NO_WINNER = -1
+
+MAX_DISTANCE = 7
+
+_ALL = np.uint32(0xFFFFFFFF)
+_SQUARES = np.arange(SQUARE_COUNT, dtype=np.int64)
+_OPPOSITE = (3, 2, 1, 0)
+_PROMOTION = np.array([WHITE_PROMOTION, BLACK_PROMOTION], dtype=np.uint32)
+
+_FORWARD = np.zeros((2, 4), dtype=bool)
+_FORWARD[WHITE, list(WHITE_FORWARD)] = True
+_FORWARD[BLACK, list(BLACK_FORWARD)] = True
+
+
+def _step_groups(d: int) -> Tuple[Tuple[int, np.uint32], ...]:
+    # Squares grouped by how far their index moves in direction d
+    groups: Dict[int, int] = {}
+    for sq in range(SQUARE_COUNT):
+        target = STEPS[sq][d]
+        if target >= 0:
+            groups[target - sq] = groups.get(target - sq, 0) | BIT[sq]
+    return tuple((delta, np.uint32(mask)) for delta, mask in groups.items())
+
+
+_STEP_GROUPS = tuple(_step_groups(d) for d in range(4))
+
+# RAY_INDEX[sq, d, k] is the square k + 1 steps from sq, or -1
+RAY_INDEX = np.full((SQUARE_COUNT, 4, MAX_DISTANCE), -1, dtype=np.intp)
+# (direction, distance index) of the move between two squares, or -1
+_RAY_STEP = np.full((SQUARE_COUNT, SQUARE_COUNT, 2), -1, dtype=np.intp)
+# Squares strictly between two squares on a diagonal
+_BETWEEN = np.zeros((SQUARE_COUNT, SQUARE_COUNT), dtype=np.uint32)
+
+for _sq, _rays in enumerate(RAYS):
+    for _d, _ray in enumerate(_rays):
+        _passed = 0
+        for _k, _target in enumerate(_ray):
+            RAY_INDEX[_sq, _d, _k] = _target
+            _RAY_STEP[_sq, _target] = _d, _k
+            _BETWEEN[_sq, _target] = _passed
+            _passed |= BIT[_target]
+
+
+def _step(masks: np.ndarray, d: int) -> np.ndarray:
+    """Move every bit of ``masks`` one square towards direction ``d``."""
+    result = np.zeros_like(masks)
+    for delta, source in _STEP_GROUPS[d]:
+        moved = masks & source
+        if delta > 0:
+            result |= moved << np.uint32(delta)
+        else:
+            result |= moved >> np.uint32(-delta)
+    return result
+
+
+def _ahead(masks: np.ndarray, d: int) -> np.ndarray:
+    """Squares whose neighbour towards ``d`` is set in ``masks``."""
+    return _step(masks, _OPPOSITE[d])
+
+
+def _bits(masks: np.ndarray) -> np.ndarray:
+    return (masks.astype(np.int64)[..., None] >> _SQUARES & 1).astype(bool)
+
+
+def _square_bits(squares: np.ndarray) -> np.ndarray:
+    return (np.int64(1) << squares).astype(np.uint32)
+
+
+def _capture_landings(
+    origins: np.ndarray, empty: np.ndarray, enemy: np.ndarray, d: int
+) -> List[np.ndarray]:
+    """Flying captures towards ``d``: origins landing at each distance."""
+    slide = origins
+    hit = land = np.zeros_like(origins)
+    empty_at, enemy_at = empty, enemy
+    landings = []
+    for _ in range(MAX_DISTANCE):
+        empty_at = _ahead(empty_at, d)
+        enemy_at = _ahead(enemy_at, d)
+        land = (land | hit) & empty_at
+        hit = slide & enemy_at
+        slide = slide & empty_at
+        landings.append(land)
+    return landings
+
+
+class LegalMoves(NamedTuple):
+    """Legal moves of a batch for the side to move.
+
+    ``capture[n]`` tells whether board n must capture, in which case the
+    square jumped over is the single ``enemy`` piece between the origin
+    and the landing.
+    """
+    origins: np.ndarray
+    enemy: np.ndarray
+    capture: np.ndarray
+
+    def any(self) -> np.ndarray:
+        return np.bitwise_or.reduce(self.origins, axis=(1, 2)) != 0
+
+    def counts(self) -> np.ndarray:
+        return np.bitwise_count(self.origins).sum(axis=(1, 2))
+
+    def codes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the board index and move code of every legal move."""
+        flat = self.origins.reshape(len(self.origins), -1)
+        n, slot, from_sq = np.nonzero(_bits(flat))
+        d, k = np.divmod(slot, MAX_DISTANCE)
+        to_sq = RAY_INDEX[from_sq, d, k]
+
+        capture = self.capture[n]
+        captured = np.where(
+            capture, self.enemy[n] & _BETWEEN[from_sq, to_sq], 0
+        ).astype(np.int64)
+        code = (
+            from_sq
+            | to_sq << move_codes.TO_SHIFT
+            | captured << move_codes.CAPTURED_SHIFT
+            | np.where(capture, move_codes.CAPTURE_FLAG, 0)
+        )
+        return n, code
+
+
+def _generate(
+    own: np.ndarray,
+    enemy: np.ndarray,
+    kings: np.ndarray,
+    turn: np.ndarray
+) -> LegalMoves:
+    empty = ~(own | enemy)
+    men = own & ~kings
+    own_kings = own & kings
+
+    shape = (len(own), 4, MAX_DISTANCE)
+    moves = np.zeros(shape, dtype=np.uint32)
+    captures = np.zeros(shape, dtype=np.uint32)
+
+    # Squares from which a king could capture towards each direction
+    reach = [
+        np.bitwise_or.reduce(_capture_landings(
+            np.full_like(own, _ALL), empty, enemy, d
+        ))
+        for d in range(4)
+    ]
+
+    for d in range(4):
+        forward = np.where(_FORWARD[turn, d], men, 0)
+        moves[:, d, 0] = forward & _ahead(empty, d)
+        captures[:, d, 1] = men & _ahead(enemy, d) & _ahead(
+            _ahead(empty, d), d
+        )
+
+        slide, empty_at = own_kings, empty
+        for k in range(MAX_DISTANCE):
+            empty_at = _ahead(empty_at, d)
+            slide = slide & empty_at
+            moves[:, d, k] |= slide
+
+        # Russian rules: when some landing lets the king keep capturing,
+        # only those landings are legal
+        landings = _capture_landings(own_kings, empty, enemy, d)
+        further = np.bitwise_or.reduce([
+            reach[other] for other in range(4) if other != _OPPOSITE[d]
+        ])
+        chained = []
+        for land in landings:
+            further = _ahead(further, d)
+            chained.append(land & further)
+        any_chained = np.bitwise_or.reduce(chained)
+        for k, (land, chain) in enumerate(zip(landings, chained)):
+            captures[:, d, k] |= chain | land & ~any_chained
+
+    capture = np.bitwise_or.reduce(captures, axis=(1, 2)) != 0
+    origins = np.where(capture[:, None, None], captures, moves)
+    return LegalMoves(origins, enemy, capture)
+
+
+class BoardBatch:
+    """N positions, the side to move and any capture still in progress.
+
+    ``chain[n]`` is the mask of the piece that must continue capturing on
+    board n, or 0.
+    """
+
+    __slots__ = ('white', 'black', 'kings', 'turn', 'chain')
+
+    def __init__(
+        self,
+        white: np.ndarray,
+        black: np.ndarray,
+        kings: np.ndarray,
+        turn: np.ndarray,
+        chain: np.ndarray | None = None
+    ) -> None:
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.turn = turn
+        self.chain = np.zeros_like(white) if chain is None else chain
+
+    def __len__(self) -> int:
+        return len(self.white)
+
+    @classmethod
+    def initial(cls, size: int) -> 'BoardBatch':
+        return cls.from_boards([Board()] * size, [PieceColor.WHITE] * size)
+
+    @classmethod
+    def from_boards(
+        cls, boards: Sequence[Board], turns: Sequence[PieceColor]
+    ) -> 'BoardBatch':
+        if any(board.variant is not RUSSIAN for board in boards):
+            raise ValueError('Only Russian boards can be batched')
+        return cls(
+            np.array([board.white for board in boards], dtype=np.uint32),
+            np.array([board.black for board in boards], dtype=np.uint32),
+            np.array([board.kings for board in boards], dtype=np.uint32),
+            np.array([
+                BLACK if turn == PieceColor.BLACK else WHITE
+                for turn in turns
+            ], dtype=np.intp),
+        )
+
+    def board(self, index: int) -> Board:
+        return Board.from_masks(
+            int(self.white[index]),
+            int(self.black[index]),
+            int(self.kings[index]),
+        )
+
+    def legal_moves(self) -> LegalMoves:
+        """Legal single jumps or steps for the side to move."""
+        black_to_move = self.turn == BLACK
+        legal = _generate(
+            np.where(black_to_move, self.black, self.white),
+            np.where(black_to_move, self.white, self.black),
+            self.kings,
+            self.turn,
+        )
+        only = np.where(self.chain != 0, self.chain, _ALL)
+        return legal._replace(origins=legal.origins & only[:, None, None])
+
+    def is_legal(self, codes: np.ndarray) -> np.ndarray:
+        """Check one move code per board against its legal moves."""
+        legal = self.legal_moves()
+        from_sq = codes & move_codes.SQUARE_MASK
+        to_sq = codes >> move_codes.TO_SHIFT & move_codes.SQUARE_MASK
+        d, k = _RAY_STEP[from_sq, to_sq].T
+
+        origins = legal.origins[np.arange(len(self)), d, k]
+        valid = (d >= 0) & (origins & _square_bits(from_sq) != 0)
+        expected = np.where(
+            legal.capture, legal.enemy & _BETWEEN[from_sq, to_sq], 0
+        )
+        return valid & (codes >> move_codes.CAPTURED_SHIFT == expected)
+
+    def apply(self, codes: np.ndarray) -> None:
+        """Play one move code per board; boards given -1 are left alone.
+
+        Captured pieces are removed at once and a man reaching the last
+        row is promoted. The turn passes unless the moving piece can keep
+        capturing, in which case ``chain`` points at it.
+        """
+        rows = np.nonzero(codes >= 0)[0]
+        if not len(rows):
+            return
+
+        codes = codes[rows]
+        from_bit = _square_bits(codes & move_codes.SQUARE_MASK)
+        to_bit = _square_bits(
+            codes >> move_codes.TO_SHIFT & move_codes.SQUARE_MASK
+        )
+        removed = (codes >> move_codes.CAPTURED_SHIFT).astype(np.uint32)
+
+        white, black, kings = (
+            self.white[rows], self.black[rows], self.kings[rows]
+        )
+        is_white = white & from_bit != 0
+        color = np.where(is_white, WHITE, BLACK)
+        is_king = (kings & from_bit | _PROMOTION[color] & to_bit) != 0
+
+        keep = ~(removed | from_bit)
+        white = white & keep | np.where(is_white, to_bit, 0)
+        black = black & keep | np.where(is_white, 0, to_bit)
+        kings = kings & keep | np.where(is_king, to_bit, 0)
+
+        self.white[rows] = white
+        self.black[rows] = black
+        self.kings[rows] = kings
+
+        # Only a capture can be continued, and only by the same piece
+        more = np.zeros(len(rows), dtype=bool)
+        jumped = np.nonzero(removed)[0]
+        if len(jumped):
+            own = np.where(is_white, white, black)[jumped]
+            enemy = np.where(is_white, black, white)[jumped]
+            legal = _generate(own, enemy, kings[jumped], color[jumped])
+            more[jumped] = legal.capture & (
+                legal.origins & to_bit[jumped, None, None]
+            ).any(axis=(1, 2))
+
+        self.chain[rows] = np.where(more, to_bit, 0)
+        self.turn[rows] = np.where(more, color, 1 - color)
+
+    def game_over(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (over, winner) arrays, with the rules of Board."""
+        side = np.zeros(len(self), dtype=np.intp)
+        white_moves = _generate(
+            self.white, self.black, self.kings, side + WHITE
+        ).any()
+        black_moves = _generate(
+            self.black, self.white, self.kings, side + BLACK
+        ).any()
+
+        winner = np.full(len(self), NO_WINNER, dtype=np.intp)
+        winner = np.where(black_moves, winner, WHITE)
+        winner = np.where(white_moves, winner, BLACK)
+        return winner != NO_WINNER, winner
+
+
+def replay(
+    games: Sequence[Sequence[int]], validate: bool = True
+) -> Tuple[BoardBatch, np.ndarray]:
+    """Play the move codes of every game from the initial position.
+
+    Returns the final positions and, per game, the ply of the first
+    illegal move or -1. A game stops at its first illegal move; without
+    ``validate`` every move is applied as given.
+    """
+    plies = max((len(moves) for moves in games), default=0)
+    codes = np.full((len(games), plies), -1, dtype=np.int64)
+    for n, moves in enumerate(games):
+        codes[n, :len(moves)] = moves
+
+    batch = BoardBatch.initial(len(games))
+    invalid = np.full(len(games), -1, dtype=np.intp)
+
+    for ply in range(plies):
+        current = np.where(invalid < 0, codes[:, ply], -1)
+        if validate:
+            illegal = (current >= 0) & ~batch.is_legal(
+                np.maximum(current, 0)
+            )
+            invalid[illegal] = ply
+            current[illegal] = -1
+        batch.apply(current)
+
+    return batch, invalid
+
+
+def game_codes(
+    from_positions: Sequence[str],
+    to_positions: Sequence[str],
+    captured: Sequence[List[str] | None]
+) -> List[int]:
+    """Encode the stored moves of one game as move codes."""
+    return [
+        move_codes.Move(
+            from_pos=from_pos,
+            to_pos=to_pos,
+            move_type=(
+                move_codes.MoveType.CAPTURE if squares
+                else move_codes.MoveType.NORMAL
+            ),
+            captured_positions=squares,
+        ).code
+        for from_pos, to_pos, squares in zip(
+            from_positions, to_positions, captured
+        )
+    ]
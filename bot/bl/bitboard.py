@@ -0,0 +1,139 @@
+"""Precomputed geometry of the playable squares.
+
+Squares are indexed row by row from a1, so bit ``i`` of a mask refers to
+``positions[i]``. A ``Geometry`` holds every table for one board size;
+the module-level names are the tables of the standard 8x8 board.
+"""
+from typing import Dict, Iterator, List, Tuple
+
+DIRECTIONS: Tuple[Tuple[int, int], ...] = (
+    (-1, -1), (-1, 1), (1, -1), (1, 1)
+)
+
+# Indexes into DIRECTIONS that men are allowed to step in
+WHITE_FORWARD: Tuple[int, ...] = (1, 3)
+BLACK_FORWARD: Tuple[int, ...] = (0, 2)
+
+# Index of the opposite direction
+OPPOSITE: Tuple[int, ...] = (3, 2, 1, 0)
+
+
+def _pos(col: int, row: int) -> str:
+    return chr(ord('a') + col) + str(row + 1)
+
+
+class Geometry:
+    """Squares, rays and special rows of a ``size`` x ``size`` board."""
+
+    __slots__ = (
+        'size', 'positions', 'square_count', 'square_coords',
+        'square_index', 'coords_index', 'bit', 'rays', 'steps', 'jumps',
+        'white_promotion', 'black_promotion', 'initial_white',
+        'initial_black', 'full',
+    )
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.square_coords: Tuple[Tuple[int, int], ...] = tuple(
+            (col, row)
+            for row in range(size)
+            for col in range(size)
+            if (col + row) % 2 == 0
+        )
+        self.positions: Tuple[str, ...] = tuple(
+            _pos(col, row) for col, row in self.square_coords
+        )
+        self.square_count = len(self.positions)
+        self.square_index: Dict[str, int] = {
+            pos: sq for sq, pos in enumerate(self.positions)
+        }
+        self.coords_index: Dict[Tuple[int, int], int] = {
+            coords: sq for sq, coords in enumerate(self.square_coords)
+        }
+        self.bit: Tuple[int, ...] = tuple(
+            1 << sq for sq in range(self.square_count)
+        )
+        self.full = (1 << self.square_count) - 1
+
+        # rays[sq][d] lists every square from ``sq`` towards DIRECTIONS[d]
+        self.rays: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+            tuple(self._ray(sq, dc, dr) for dc, dr in DIRECTIONS)
+            for sq in range(self.square_count)
+        )
+        # steps[sq][d] is the adjacent square towards DIRECTIONS[d] or -1
+        self.steps: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(ray[0] if ray else -1 for ray in rays)
+            for rays in self.rays
+        )
+        # jumps[sq][d] is the (jumped, landing) square pair or None
+        self.jumps: Tuple[Tuple[Tuple[int, int] | None, ...], ...] = tuple(
+            tuple(
+                (ray[0], ray[1]) if len(ray) > 1 else None for ray in rays
+            )
+            for rays in self.rays
+        )
+
+        start_rows = (size - 2) // 2
+        self.white_promotion = self._rows(size - 1, size - 1)
+        self.black_promotion = self._rows(0, 0)
+        self.initial_white = self._rows(0, start_rows - 1)
+        self.initial_black = self._rows(size - start_rows, size - 1)
+
+    def _ray(self, sq: int, dc: int, dr: int) -> Tuple[int, ...]:
+        col, row = self.square_coords[sq]
+        squares: List[int] = []
+        while True:
+            col, row = col + dc, row + dr
+            target = self.coords_index.get((col, row))
+            if target is None:
+                return tuple(squares)
+            squares.append(target)
+
+    def _rows(self, first: int, last: int) -> int:
+        return sum(
+            self.bit[sq]
+            for sq, (_, row) in enumerate(self.square_coords)
+            if first <= row <= last
+        )
+
+    def promotion(self, white: bool) -> int:
+        return self.white_promotion if white else self.black_promotion
+
+    def rotate(self, mask: int) -> int:
+        """Turn a mask by 180 degrees: square ``i`` becomes ``n - 1 - i``."""
+        size = (self.square_count + 7) // 8
+        data = mask.to_bytes(size, 'big').translate(_REVERSED_BYTES)
+        return int.from_bytes(data, 'little') >> (size * 8 - self.square_count)
+
+
+_REVERSED_BYTES = bytes(int(f'{byte:08b}'[::-1], 2) for byte in range(256))
+
+STANDARD = Geometry(8)
+INTERNATIONAL = Geometry(10)
+
+POSITIONS = STANDARD.positions
+SQUARE_COUNT = STANDARD.square_count
+SQUARE_COORDS = STANDARD.square_coords
+SQUARE_INDEX = STANDARD.square_index
+COORDS_INDEX = STANDARD.coords_index
+BIT = STANDARD.bit
+RAYS = STANDARD.rays
+STEPS = STANDARD.steps
+JUMPS = STANDARD.jumps
+WHITE_PROMOTION = STANDARD.white_promotion
+BLACK_PROMOTION = STANDARD.black_promotion
+INITIAL_WHITE = STANDARD.initial_white
+INITIAL_BLACK = STANDARD.initial_black
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield square indexes of the set bits in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def rotate(mask: int) -> int:
+    """Turn a mask of the standard board by 180 degrees."""
+    return STANDARD.rotate(mask)
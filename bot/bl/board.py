@@ -1,328 +1,434 @@
-from typing import Dict, List, Tuple
-
-from bot.bl.move import Move, MoveType
-from bot.bl.piece import Piece, PieceColor
+from typing import Dict, List, NamedTuple, Tuple
+
+from bot.bl import codec, zobrist
+from bot.bl.analysis import PositionAnalysis
+from bot.bl.bitboard import POSITIONS, Geometry, iter_bits
+from bot.bl.capture import CaptureNode, single_captures
+from bot.bl.move import PROMOTED_FLAG, Move, encode
+from bot.bl.piece import (
+    BLACK_KING,
+    BLACK_MAN,
+    WHITE_KING,
+    WHITE_MAN,
+    Piece,
+    PieceColor,
+)
+from bot.bl.symmetry import Transform
+from bot.bl.variant import RUSSIAN, CapturePromotion, Variant, get_variant
+
+
+class Material(NamedTuple):
+    white_men: int
+    white_kings: int
+    black_men: int
+    black_kings: int
+
+
+class UndoToken(NamedTuple):
+    """State captured by Board.make_move and restored by unmake_move."""
+    move: Move
+    promoted: bool
+    white: int
+    black: int
+    kings: int
+    material: Tuple[int, int, int, int]
+    zobrist: int
+    analysis: PositionAnalysis | None
+
+
+# Indexes into Board._material
+WHITE_MEN, WHITE_KINGS, BLACK_MEN, BLACK_KINGS = range(4)
+
+_PIECES_BY_SLOT = (WHITE_MAN, WHITE_KING, BLACK_MAN, BLACK_KING)
 
 
 class Board:
-    POSITIONS = [
-        "a1", "c1", "e1", "g1",
-        "b2", "d2", "f2", "h2",
-        "a3", "c3", "e3", "g3",
-        "b4", "d4", "f4", "h4",
-        "a5", "c5", "e5", "g5",
-        "b6", "d6", "f6", "h6",
-        "a7", "c7", "e7", "g7",
-        "b8", "d8", "f8", "h8",
-    ]
-
-    def __init__(self) -> None:
-        self.squares: Dict[str, Piece | None] = {
-            pos: None for pos in self.POSITIONS
-        }
+    POSITIONS = list(POSITIONS)
+
+    __slots__ = (
+        'white', 'black', 'kings', 'zobrist', 'variant',
+        '_material', '_analysis', '_undo_stack',
+    )
+
+    def __init__(self, variant: Variant = RUSSIAN) -> None:
+        self.variant = variant
+        self.white = 0
+        self.black = 0
+        self.kings = 0
+        self._material = [0, 0, 0, 0]
+        self.zobrist = 0
+        self._analysis: PositionAnalysis | None = None
+        self._undo_stack: List[UndoToken] = []
         self._setup_initial_position()
 
     def _setup_initial_position(self) -> None:
-        white_positions = [
-            "a1", "c1", "e1", "g1",
-            "b2", "d2", "f2", "h2",
-            "a3", "c3", "e3", "g3"
+        geometry = self.geometry
+        self.white = geometry.initial_white
+        self.black = geometry.initial_black
+        self.kings = 0
+        self._material = [
+            self.white.bit_count(), 0, self.black.bit_count(), 0
         ]
-        for pos in white_positions:
-            self.squares[pos] = Piece(color=PieceColor.WHITE)
+        self.zobrist = zobrist.compute(self.white, self.black, self.kings)
 
-        black_positions = [
-            "b6", "d6", "f6", "h6",
-            "a7", "c7", "e7", "g7",
-            "b8", "d8", "f8", "h8"
-        ]
-        for pos in black_positions:
-            self.squares[pos] = Piece(color=PieceColor.BLACK)
+    @property
+    def geometry(self) -> Geometry:
+        return self.variant.geometry
 
-    @staticmethod
-    def pos_to_coords(pos: str) -> Tuple[int, int]:
+    def pos_to_coords(self, pos: str) -> Tuple[int, int]:
+        sq = self.geometry.square_index.get(pos)
+        if sq is not None:
+            return self.geometry.square_coords[sq]
         col = ord(pos[0]) - ord('a')
-        row = int(pos[1]) - 1
+        row = int(pos[1:]) - 1
         return col, row
 
-    @staticmethod
-    def coords_to_pos(col: int, row: int) -> str | None:
-        if not (0 <= col <= 7 and 0 <= row <= 7):
+    def coords_to_pos(self, col: int, row: int) -> str | None:
+        sq = self.geometry.coords_index.get((col, row))
+        return self.geometry.positions[sq] if sq is not None else None
+
+    @property
+    def squares(self) -> Dict[str, Piece | None]:
+        return {pos: self.get_piece(pos) for pos in self.geometry.positions}
+
+    def _piece_at(self, sq: int) -> Piece | None:
+        bit = 1 << sq
+        if not (self.white | self.black) & bit:
             return None
-        pos = chr(ord('a') + col) + str(row + 1)
-        return pos if pos in Board.POSITIONS else None
+        return _PIECES_BY_SLOT[self._material_slot(bit)]
+
+    def _material_slot(self, bit: int) -> int:
+        slot = WHITE_MEN if self.white & bit else BLACK_MEN
+        return slot + 1 if self.kings & bit else slot
+
+    def _place(self, sq: int, piece: Piece | None) -> None:
+        bit = 1 << sq
+        self._analysis = None
+        if (self.white | self.black) & bit:
+            slot = self._material_slot(bit)
+            self._material[slot] -= 1
+            self.zobrist ^= zobrist.PIECE_KEYS[sq][slot]
+        self.white &= ~bit
+        self.black &= ~bit
+        self.kings &= ~bit
+        if piece is None:
+            return
+        if piece.color == PieceColor.WHITE:
+            self.white |= bit
+        else:
+            self.black |= bit
+        if piece.is_king():
+            self.kings |= bit
+        slot = self._material_slot(bit)
+        self._material[slot] += 1
+        self.zobrist ^= zobrist.PIECE_KEYS[sq][slot]
+
+    def _promote(self, sq: int) -> None:
+        bit = 1 << sq
+        slot = self._material_slot(bit)
+        self._material[slot] -= 1
+        self._material[slot + 1] += 1
+        keys = zobrist.PIECE_KEYS[sq]
+        self.zobrist ^= keys[slot] ^ keys[slot + 1]
+        self.kings |= bit
+        self._analysis = None
+
+    @property
+    def material(self) -> Material:
+        """Men and kings of each color, maintained on every change."""
+        return Material(*self._material)
+
+    def position_hash(self, turn: PieceColor) -> int:
+        """64-bit Zobrist key of the pieces, side to move and variant."""
+        key = self.zobrist ^ self.variant.hash_key
+        if turn == PieceColor.BLACK:
+            return key ^ zobrist.BLACK_TO_MOVE
+        return key
+
+    def transformed(self, transform: Transform) -> 'Board':
+        return Board.from_masks(
+            *transform.masks(
+                self.white, self.black, self.kings, self.geometry
+            ),
+            variant=self.variant,
+        )
+
+    def canonical(self, turn: PieceColor) -> Tuple['Board', Transform]:
+        """Return the equivalent position with white to move.
+
+        The transform maps squares, colors and moves of this board onto the
+        canonical one and, applied again, moves found on the canonical
+        board back onto this one.
+        """
+        transform = Transform.for_turn(turn)
+        return self.transformed(transform), transform
+
+    def canonical_hash(self, turn: PieceColor) -> int:
+        """Position hash shared by this position and its mirror image."""
+        if turn == PieceColor.WHITE:
+            return self.zobrist ^ self.variant.hash_key
+        return self.variant.hash_key ^ zobrist.compute(
+            *Transform.SWAP.masks(
+                self.white, self.black, self.kings, self.geometry
+            )
+        )
+
+    @property
+    def white_count(self) -> int:
+        return self._material[WHITE_MEN] + self._material[WHITE_KINGS]
+
+    @property
+    def black_count(self) -> int:
+        return self._material[BLACK_MEN] + self._material[BLACK_KINGS]
 
     def get_piece(self, pos: str) -> Piece | None:
-        return self.squares.get(pos)
+        sq = self.geometry.square_index.get(pos)
+        return self._piece_at(sq) if sq is not None else None
 
     def set_piece(self, pos: str, piece: Piece | None) -> None:
-        if pos in self.squares:
-            self.squares[pos] = piece
+        sq = self.geometry.square_index.get(pos)
+        if sq is not None:
+            self._place(sq, piece)
 
     def move_piece(self, from_pos: str, to_pos: str) -> bool:
-        piece = self.get_piece(from_pos)
-        if not piece:
+        index = self.geometry.square_index
+        from_sq = index.get(from_pos)
+        to_sq = index.get(to_pos)
+        if from_sq is None or to_sq is None:
             return False
+        return self._move(from_sq, to_sq)
 
-        self.set_piece(to_pos, piece)
-        self.set_piece(from_pos, None)
+    def _move(self, from_sq: int, to_sq: int, promote: bool = True) -> bool:
+        piece = self._piece_at(from_sq)
+        if not piece:
+            return False
 
-        col, row = self.pos_to_coords(to_pos)
-        if piece.color == PieceColor.WHITE and row == 7:
-            piece.promote()
-        elif piece.color == PieceColor.BLACK and row == 0:
-            piece.promote()
+        self._place(to_sq, piece)
+        self._place(from_sq, None)
+        if promote:
+            self._promote_if_crowned(to_sq)
 
         return True
 
-    def get_valid_moves(self, pos: str, color: PieceColor) -> List[Move]:
-        piece = self.get_piece(pos)
-        if not piece or piece.color != color:
-            return []
+    def _continues_as_man(self, sq: int) -> bool:
+        """Whether a man on ``sq`` mid-capture must jump on before crowning.
 
-        captures = self._get_single_captures(pos, piece)
-        if captures:
-            return captures
+        Only variants that keep a man uncrowned until its sequence ends
+        defer the promotion.
+        """
+        if self.variant.capture_promotion != CapturePromotion.CONTINUE_AS_MAN:
+            return False
+        bit = 1 << sq
+        if self.kings & bit:
+            return False
+        white = bool(self.white & bit)
+        own, enemy = (
+            (self.white, self.black) if white else (self.black, self.white)
+        )
+        return bool(single_captures(
+            self.variant, sq, own, enemy, False, white
+        ))
+
+    def _promote_if_crowned(self, sq: int) -> None:
+        bit = 1 << sq
+        geometry = self.geometry
+        promotion = (
+            self.white & geometry.white_promotion
+            | self.black & geometry.black_promotion
+        )
+        if bit & promotion & ~self.kings:
+            self._promote(sq)
 
-        if self.has_mandatory_captures(color):
-            return []
+    @property
+    def analysis(self) -> PositionAnalysis:
+        if self._analysis is None:
+            self._analysis = PositionAnalysis(
+                self.white, self.black, self.kings, self.variant
+            )
+        return self._analysis
 
-        return self._get_normal_moves(pos, piece)
+    def get_valid_moves(self, pos: str, color: PieceColor) -> List[Move]:
+        return list(self.analysis.moves(color).get(pos, []))
 
-    def _get_normal_moves(self, pos: str, piece: Piece) -> List[Move]:
-        moves = []
-        col, row = self.pos_to_coords(pos)
+    def get_capture_tree(self, pos: str) -> CaptureNode | None:
+        """Build every capture sequence available to the piece on ``pos``.
 
-        if piece.is_king():
-            directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        elif piece.color == PieceColor.WHITE:
-            directions = [(-1, 1), (1, 1)]
-        else:
-            directions = [(-1, -1), (1, -1)]
-
-        for dc, dr in directions:
-            if piece.is_king():
-                distance = 1
-                while True:
-                    new_col = col + (dc * distance)
-                    new_row = row + (dr * distance)
-                    new_pos = self.coords_to_pos(new_col, new_row)
-
-                    if not new_pos:
-                        break
-
-                    target_piece = self.get_piece(new_pos)
-                    if target_piece:
-                        break
-
-                    moves.append(Move(
-                        from_pos=pos,
-                        to_pos=new_pos,
-                        move_type=MoveType.NORMAL
-                    ))
-                    distance += 1
-            else:
-                new_col, new_row = col + dc, row + dr
-                new_pos = self.coords_to_pos(new_col, new_row)
-
-                if new_pos and not self.get_piece(new_pos):
-                    moves.append(Move(
-                        from_pos=pos,
-                        to_pos=new_pos,
-                        move_type=MoveType.NORMAL
-                    ))
-
-        return moves
-
-    def _get_single_captures(
-        self,
-        pos: str,
-        piece: Piece,
-        excluded_positions: List[str] | None = None
-    ) -> List[Move]:
-        captures = []
-        col, row = self.pos_to_coords(pos)
-
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        excluded = excluded_positions or []
-
-        for dc, dr in directions:
-            if piece.is_king():
-                direction_captures: List[Move] = []
-                distance = 1
-                captured_piece_pos: str | None = None
-
-                while True:
-                    check_col = col + (dc * distance)
-                    check_row = row + (dr * distance)
-                    check_pos = self.coords_to_pos(check_col, check_row)
-
-                    if not check_pos:
-                        break
-
-                    # Skip excluded positions (already captured in chain)
-                    if check_pos in excluded:
-                        distance += 1
-                        continue
-
-                    check_piece = self.get_piece(check_pos)
-
-                    if captured_piece_pos is None:
-                        if check_piece:
-                            if check_piece.color != piece.color:
-                                captured_piece_pos = check_pos
-                            else:
-                                break
-                    else:
-                        if check_piece:
-                            break
-                        else:
-                            move = Move(
-                                from_pos=pos,
-                                to_pos=check_pos,
-                                move_type=MoveType.CAPTURE,
-                                captured_positions=[captured_piece_pos]
-                            )
-                            direction_captures.append(move)
-
-                    distance += 1
-
-                # Filter: if any landing enables chain, only keep those
-                if direction_captures:
-                    can_continue = []
-                    cannot_continue = []
-
-                    for move in direction_captures:
-                        further = self._get_single_captures(
-                            move.to_pos,
-                            piece,
-                            move.captured_positions
-                        )
-                        if further:
-                            can_continue.append(move)
-                        else:
-                            cannot_continue.append(move)
-
-                    if can_continue:
-                        captures.extend(can_continue)
-                    else:
-                        captures.extend(cannot_continue)
-            else:
-                mid_col, mid_row = col + dc, row + dr
-                mid_pos = self.coords_to_pos(mid_col, mid_row)
-
-                if not mid_pos:
-                    continue
-
-                mid_piece = self.get_piece(mid_pos)
-                if not mid_piece or mid_piece.color == piece.color:
-                    continue
-
-                land_col, land_row = mid_col + dc, mid_row + dr
-                land_pos = self.coords_to_pos(land_col, land_row)
-
-                if land_pos and not self.get_piece(land_pos):
-                    move = Move(
-                        from_pos=pos,
-                        to_pos=land_pos,
-                        move_type=MoveType.CAPTURE,
-                        captured_positions=[mid_pos]
-                    )
-                    captures.append(move)
-
-        return captures
+        Returns None when the square is empty or the piece cannot capture.
+        """
+        return self.analysis.capture_tree(pos)
 
-    def has_mandatory_captures(self, color: PieceColor) -> List[str]:
-        positions_with_captures = []
+    def get_capture_paths(self, pos: str) -> List[List[Move]]:
+        """Return every complete capture sequence starting on ``pos``."""
+        tree = self.get_capture_tree(pos)
+        if tree is None:
+            return []
 
-        for pos, piece in self.squares.items():
-            if piece and piece.color == color:
-                if self._get_single_captures(pos, piece):
-                    positions_with_captures.append(pos)
+        paths = []
+        for path in tree.paths():
+            moves = []
+            from_sq = tree.square
+            for land, captured, node in path:
+                code = encode(from_sq, land, 1 << captured)
+                if node.king:
+                    code |= PROMOTED_FLAG
+                moves.append(Move.from_code(code, self.geometry))
+                from_sq = land
+            paths.append(moves)
+
+        return paths
+
+    def get_turns(self, color: PieceColor) -> List[List[Move]]:
+        """Every complete move of ``color``, a capture sequence or a step."""
+        must_capture = self.analysis.must_capture(color)
+        if must_capture:
+            return [
+                path
+                for pos in must_capture
+                for path in self.get_capture_paths(pos)
+            ]
+        return [
+            [move]
+            for moves in self.analysis.moves(color).values()
+            for move in moves
+        ]
 
-        return positions_with_captures
+    def has_mandatory_captures(self, color: PieceColor) -> List[str]:
+        return list(self.analysis.must_capture(color))
 
     def execute_move(self, move: Move) -> bool:
-        if move.is_capture and move.captured_positions:
-            for cap_pos in move.captured_positions:
-                self.set_piece(cap_pos, None)
-
-        success = self.move_piece(move.from_pos, move.to_pos)
-
-        piece = self.get_piece(move.to_pos)
-        if piece and piece.is_king():
+        if move.is_capture:
+            for sq in iter_bits(move.captured_mask):
+                self._place(sq, None)
+
+        to_sq = move.to_sq
+        success = self._move(move.from_sq, to_sq, promote=False)
+        if success and not (
+            move.is_capture and self._continues_as_man(to_sq)
+        ):
+            self._promote_if_crowned(to_sq)
+
+        if self.kings & 1 << to_sq:
             move.promoted = True
 
         return success
 
-    def get_all_valid_moves(self, color: PieceColor) -> Dict[str, List[Move]]:
-        all_moves = {}
-
-        mandatory_captures = self.has_mandatory_captures(color)
-
-        if mandatory_captures:
-            for pos in mandatory_captures:
-                piece = self.get_piece(pos)
-                if piece:
-                    moves = self._get_single_captures(pos, piece)
-                    if moves:
-                        all_moves[pos] = moves
-        else:
-            for pos, piece in self.squares.items():
-                if piece and piece.color == color:
-                    moves = self._get_normal_moves(pos, piece)
-                    if moves:
-                        all_moves[pos] = moves
+    def make_move(self, move: Move) -> UndoToken:
+        """Execute ``move`` and return a token that can take it back."""
+        m = self._material
+        token = UndoToken(
+            move=move,
+            promoted=move.promoted,
+            white=self.white,
+            black=self.black,
+            kings=self.kings,
+            material=(m[0], m[1], m[2], m[3]),
+            zobrist=self.zobrist,
+            analysis=self._analysis,
+        )
+        self._undo_stack.append(token)
+        self.execute_move(move)
+        return token
+
+    def unmake_move(self, token: UndoToken) -> None:
+        """Restore the position from before the matching make_move.
+
+        Tokens must be undone in reverse order of the moves they came from.
+        """
+        if not self._undo_stack or self._undo_stack[-1] is not token:
+            raise ValueError('Moves must be unmade in reverse order')
+
+        self._undo_stack.pop()
+        self.white = token.white
+        self.black = token.black
+        self.kings = token.kings
+        self._material[:] = token.material
+        self.zobrist = token.zobrist
+        self._analysis = token.analysis
+        token.move.promoted = token.promoted
 
-        return all_moves
+    def get_all_valid_moves(self, color: PieceColor) -> Dict[str, List[Move]]:
+        return {
+            pos: list(moves)
+            for pos, moves in self.analysis.moves(color).items()
+        }
 
     def has_valid_moves(self, color: PieceColor) -> bool:
-        return len(self.get_all_valid_moves(color)) > 0
+        return bool(self.analysis.moves(color))
 
     def count_pieces(self, color: PieceColor) -> int:
-        return sum(
-            1 for piece in self.squares.values()
-            if piece and piece.color == color
-        )
+        if color == PieceColor.WHITE:
+            return self.white_count
+        return self.black_count
 
     def is_game_over(self) -> Tuple[bool, PieceColor | None]:
-        white_count = self.count_pieces(PieceColor.WHITE)
-        black_count = self.count_pieces(PieceColor.BLACK)
-
-        if white_count == 0:
-            return True, PieceColor.BLACK
-        if black_count == 0:
-            return True, PieceColor.WHITE
-
-        if not self.has_valid_moves(PieceColor.WHITE):
-            return True, PieceColor.BLACK
-        if not self.has_valid_moves(PieceColor.BLACK):
-            return True, PieceColor.WHITE
-
-        return False, None
+        return self.analysis.game_over
 
     def to_dict(self) -> dict:
+        positions = self.geometry.positions
         squares_dict = {}
-        for pos, piece in self.squares.items():
+        for sq in iter_bits(self.white | self.black):
+            piece = self._piece_at(sq)
             if piece:
-                squares_dict[pos] = piece.to_dict()
+                squares_dict[positions[sq]] = piece.to_dict()
 
-        must_capture = self.has_mandatory_captures(PieceColor.WHITE)
-        must_capture.extend(self.has_mandatory_captures(PieceColor.BLACK))
+        must_capture = [
+            *self.analysis.must_capture(PieceColor.WHITE),
+            *self.analysis.must_capture(PieceColor.BLACK),
+        ]
 
         return {
+            "variant": self.variant.name,
             "squares": squares_dict,
             "must_capture": must_capture
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Board':
-        board = cls.__new__(cls)
-        board.squares = {pos: None for pos in cls.POSITIONS}
+        board = cls.from_masks(0, 0, 0, get_variant(
+            data.get("variant", RUSSIAN.name)
+        ))
 
         for pos, piece_data in data.get("squares", {}).items():
-            if pos in board.squares:
-                board.squares[pos] = Piece.from_dict(piece_data)
+            board.set_piece(pos, Piece.from_dict(piece_data))
 
         return board
+
+    @classmethod
+    def from_masks(
+        cls, white: int, black: int, kings: int, variant: Variant = RUSSIAN
+    ) -> 'Board':
+        board = cls.__new__(cls)
+        board.variant = variant
+        board.white = white
+        board.black = black
+        board.kings = kings
+        board._material = [
+            (white & ~kings).bit_count(),
+            (white & kings).bit_count(),
+            (black & ~kings).bit_count(),
+            (black & kings).bit_count(),
+        ]
+        board.zobrist = zobrist.compute(white, black, kings)
+        board._analysis = None
+        board._undo_stack = []
+        return board
+
+    def to_bytes(self, turn: PieceColor) -> bytes:
+        return codec.encode(
+            self.white, self.black, self.kings, turn,
+            self.geometry.square_count,
+        )
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        version: int = codec.CODEC_VERSION,
+        variant: Variant = RUSSIAN
+    ) -> 'Board':
+        if version != codec.CODEC_VERSION:
+            raise ValueError(f'Unsupported board encoding version {version}')
+        white, black, kings, _ = codec.decode(
+            data, variant.geometry.square_count
+        )
+        return cls.from_masks(white, black, kings, variant)
@@ -0,0 +1,294 @@
+"""Opening book: how the turns played from early positions turned out.
+
+The book is a trie of turns built from finished games. Every node counts
+the games that went through it by result, and the children of a node
+are stored next to each other, sorted by turn code, so walking a move
+prefix is one binary search per turn. A second, sorted array maps the
+position hash of every node to the node, which also finds positions
+reached by a different move order.
+
+A turn is keyed by a single move code (``bot.bl.move``) from its first
+square to its last one with the union of the captured squares, so a
+capture sequence is one edge like a quiet move.
+
+Files are built by ``bot.jobs.book``, one per variant, and
+memory-mapped.
+"""
+import logging
+import mmap
+import os
+import random
+import struct
+from collections import deque
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from bot.bl.bitboard import Geometry
+from bot.bl.board import Board
+from bot.bl.history import MoveRecord, record_move, split_turns
+from bot.bl.move import CAPTURE_FLAG, SQUARE_MASK, TO_SHIFT, Move, encode
+from bot.bl.piece import PieceColor
+from bot.bl.variant import Variant, VariantName, get_variant
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'CKOB'
+FORMAT_VERSION = 1
+
+# magic, format version, variant name, node count, plies per game
+_HEADER = struct.Struct('<4sH16sII')
+
+_NODE = np.dtype([
+    ('code', '<u8'),
+    ('white', '<u4'),
+    ('draws', '<u4'),
+    ('black', '<u4'),
+    ('first', '<u4'),
+    ('count', '<u2'),
+])
+
+# Book turns played in fewer games are left to the engine
+MIN_BOOK_GAMES = 3
+
+
+def turn_code(turn: Sequence[Move]) -> int:
+    captured = 0
+    for move in turn:
+        captured |= move.captured_mask
+    return encode(turn[0].from_sq, turn[-1].to_sq, captured)
+
+
+class BookMove(NamedTuple):
+    """A turn of the book and the results of the games that played it."""
+    code: int
+    white: int
+    draws: int
+    black: int
+
+    @property
+    def games(self) -> int:
+        return self.white + self.draws + self.black
+
+    def score(self, color: PieceColor) -> float:
+        """Points per game for ``color``, a draw counting half."""
+        wins = self.white if color == PieceColor.WHITE else self.black
+        return (wins + self.draws / 2) / self.games
+
+    def notation(self, geometry: Geometry) -> str:
+        positions = geometry.positions
+        separator = ':' if self.code & CAPTURE_FLAG else '-'
+        return (
+            positions[self.code & SQUARE_MASK] + separator
+            + positions[self.code >> TO_SHIFT & SQUARE_MASK]
+        )
+
+
+class _Node:
+    __slots__ = ('key', 'results', 'children')
+
+    def __init__(self, key: int) -> None:
+        self.key = key
+        # white wins, draws, black wins
+        self.results = [0, 0, 0]
+        self.children: Dict[int, _Node] = {}
+
+
+class BookBuilder:
+    """The trie of the first ``plies`` turns of the games added to it."""
+
+    def __init__(self, variant: Variant, plies: int) -> None:
+        self.variant = variant
+        self.plies = plies
+        self.games = 0
+        self._root = _Node(Board(variant).position_hash(PieceColor.WHITE))
+
+    def add_game(
+        self, records: Sequence[MoveRecord], winner: PieceColor | None
+    ) -> None:
+        result = 1 if winner is None else (
+            0 if winner == PieceColor.WHITE else 2
+        )
+        board = Board(self.variant)
+        color = PieceColor.WHITE
+        node = self._root
+        node.results[result] += 1
+        self.games += 1
+
+        for turn in split_turns(records)[:self.plies]:
+            moves = [record_move(record, board.geometry) for record in turn]
+            for move in moves:
+                board.execute_move(move)
+            color = (
+                PieceColor.BLACK if color == PieceColor.WHITE
+                else PieceColor.WHITE
+            )
+
+            code = turn_code(moves)
+            child = node.children.get(code)
+            if child is None:
+                child = node.children[code] = _Node(
+                    board.position_hash(color)
+                )
+            child.results[result] += 1
+            node = child
+
+    def write(self, path: str, min_games: int = 1) -> int:
+        """Write the book to ``path``; returns the number of nodes.
+
+        Turns played in fewer than ``min_games`` games are left out with
+        everything after them.
+        """
+        order: List[_Node] = [self._root]
+        codes = [0]
+        children: List[List[int]] = []
+        queue = deque([self._root])
+        while queue:
+            node = queue.popleft()
+            kept = sorted(
+                (code, child) for code, child in node.children.items()
+                if sum(child.results) >= min_games
+            )
+            children.append([len(order), len(kept)])
+            for code, child in kept:
+                order.append(child)
+                codes.append(code)
+                queue.append(child)
+
+        nodes = np.zeros(len(order), dtype=_NODE)
+        nodes['code'] = codes
+        results = np.array([node.results for node in order], dtype=np.uint32)
+        nodes['white'], nodes['draws'], nodes['black'] = results.T
+        first, count = np.array(children, dtype=np.uint32).T
+        nodes['first'] = first
+        nodes['count'] = count
+
+        keys = np.array([node.key for node in order], dtype=np.uint64)
+        index = np.argsort(keys, kind='stable').astype(np.uint32)
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(_HEADER.pack(
+                MAGIC, FORMAT_VERSION, self.variant.name.encode(),
+                len(order), self.plies,
+            ))
+            file.write(nodes.tobytes())
+            file.write(keys[index].tobytes())
+            file.write(index.tobytes())
+        os.replace(temporary, path)
+        return len(order)
+
+
+class Book:
+    """A memory-mapped opening book."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, name, count, self.plies = _HEADER.unpack_from(
+            self._data
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._data.close()
+            raise ValueError(
+                f'{path} is not a version {FORMAT_VERSION} opening book'
+            )
+
+        self.variant = get_variant(name.rstrip(b'\0').decode())
+        offset = _HEADER.size
+        self._nodes = np.frombuffer(self._data, _NODE, count, offset)
+        offset += _NODE.itemsize * count
+        self._keys = np.frombuffer(self._data, np.uint64, count, offset)
+        offset += 8 * count
+        self._index = np.frombuffer(self._data, np.uint32, count, offset)
+
+    @property
+    def games(self) -> int:
+        root = self._nodes[0]
+        return int(root['white'] + root['draws'] + root['black'])
+
+    def _children(self, node: int) -> np.ndarray:
+        first = int(self._nodes[node]['first'])
+        return self._nodes[first:first + int(self._nodes[node]['count'])]
+
+    def find(self, codes: Sequence[int]) -> int | None:
+        """Node reached by the turns ``codes`` from the initial position."""
+        node = 0
+        for code in codes:
+            children = self._children(node)
+            at = int(np.searchsorted(children['code'], code))
+            if at == len(children) or children[at]['code'] != code:
+                return None
+            node = int(self._nodes[node]['first']) + at
+        return node
+
+    def moves_after(self, codes: Sequence[int]) -> List[BookMove]:
+        """Book turns after the move prefix ``codes``, most played first."""
+        node = self.find(codes)
+        if node is None:
+            return []
+        return self._moves([node])
+
+    def moves_at(self, board: Board, turn: PieceColor) -> List[BookMove]:
+        """Book turns from the position, however the games reached it."""
+        key = np.uint64(board.position_hash(turn))
+        start = int(np.searchsorted(self._keys, key, 'left'))
+        stop = int(np.searchsorted(self._keys, key, 'right'))
+        return self._moves([int(node) for node in self._index[start:stop]])
+
+    def _moves(self, nodes: Sequence[int]) -> List[BookMove]:
+        totals: Dict[int, List[int]] = {}
+        for node in nodes:
+            for child in self._children(node):
+                counts = totals.setdefault(int(child['code']), [0, 0, 0])
+                counts[0] += int(child['white'])
+                counts[1] += int(child['draws'])
+                counts[2] += int(child['black'])
+        moves = [BookMove(code, *counts) for code, counts in totals.items()]
+        moves.sort(key=lambda move: move.games, reverse=True)
+        return moves
+
+    def choose(
+        self,
+        board: Board,
+        turn: PieceColor,
+        rng: random.Random | None = None
+    ) -> List[Move] | None:
+        """Pick a book turn, weighted by how well it scored, or None."""
+        moves = [
+            move for move in self.moves_at(board, turn)
+            if move.games >= MIN_BOOK_GAMES and move.score(turn) > 0
+        ]
+        if not moves:
+            return None
+
+        chosen = (rng or random).choices(
+            moves, [move.games * move.score(turn) for move in moves]
+        )[0]
+        for candidate in board.get_turns(turn):
+            if turn_code(candidate) == chosen.code:
+                return candidate
+        return None
+
+
+_books: Dict[VariantName, Book] = {}
+
+
+def file_name(variant: VariantName) -> str:
+    return f'{variant}.book'
+
+
+def load(directory: str) -> None:
+    """Map the opening book of every variant found in ``directory``."""
+    for name in VariantName:
+        path = os.path.join(directory, file_name(name))
+        if not os.path.exists(path):
+            continue
+        # A replaced book is unmapped once no array refers to it
+        book = _books[name] = Book(path)
+        log.info('Opening book for %s: %d games', name, book.games)
+
+
+def get(variant: VariantName) -> Book | None:
+    return _books.get(variant)
@@ -0,0 +1,199 @@
+"""Single-jump and full capture-sequence generation on bitboards."""
+from typing import Dict, Iterator, List, Tuple
+
+from bot.bl.bitboard import Geometry
+from bot.bl.variant import CapturePromotion, Variant
+
+# (square, captured mask, king, stopped)
+CaptureKey = Tuple[int, int, bool, bool]
+
+
+def has_king_capture(
+    geometry: Geometry, sq: int, own: int, enemy: int, captured: int
+) -> bool:
+    """Check whether a flying king on ``sq`` could capture anything.
+
+    Pieces in ``captured`` were taken earlier in the sequence; they stay
+    on the board until it ends, so they block the scan but cannot be
+    captured again.
+    """
+    occupied = own | enemy
+
+    for ray in geometry.rays[sq]:
+        found_enemy = False
+        for target in ray:
+            bit = 1 << target
+            if not found_enemy:
+                if bit & enemy & ~captured:
+                    found_enemy = True
+                elif bit & occupied:
+                    break
+            elif bit & occupied:
+                break
+            else:
+                return True
+
+    return False
+
+
+def single_captures(
+    variant: Variant,
+    sq: int,
+    own: int,
+    enemy: int,
+    king: bool,
+    white: bool,
+    captured: int = 0
+) -> List[Tuple[int, int]]:
+    """Return (landing, captured) square pairs for a single jump.
+
+    Pieces in ``captured``, taken earlier in the sequence, still occupy
+    their squares but cannot be jumped again.
+    """
+    geometry = variant.geometry
+    captures: List[Tuple[int, int]] = []
+    occupied = own | enemy
+    targets = enemy & ~captured
+
+    if king and variant.flying_kings:
+        for ray in geometry.rays[sq]:
+            jumped = -1
+            landings: List[int] = []
+
+            for target in ray:
+                bit = 1 << target
+                if jumped < 0:
+                    if bit & targets:
+                        jumped = target
+                    elif bit & occupied:
+                        break
+                elif bit & occupied:
+                    break
+                else:
+                    landings.append(target)
+
+            # Filter: if any landing enables chain, only keep those
+            if landings:
+                can_continue = [
+                    land for land in landings
+                    if has_king_capture(
+                        geometry, land, own, enemy, captured | 1 << jumped
+                    )
+                ]
+                captures.extend(
+                    (land, jumped) for land in (can_continue or landings)
+                )
+        return captures
+
+    directions = (
+        range(4) if king else variant.men_capture_directions(white)
+    )
+    for d in directions:
+        jump = geometry.jumps[sq][d]
+        if jump is None:
+            continue
+        mid, land = jump
+        if targets & 1 << mid and not occupied & 1 << land:
+            captures.append((land, mid))
+
+    return captures
+
+
+class CaptureNode:
+    """A point inside a capture sequence.
+
+    ``jumps`` maps each landing square to the captured square and the node
+    reached after that jump. ``length`` is the number of captures still
+    ahead on the longest path. Nodes are shared between every order of
+    jumps that leads to the same square with the same pieces captured.
+    """
+
+    __slots__ = ('square', 'captured', 'king', 'jumps', 'length')
+
+    def __init__(self, square: int, captured: int, king: bool) -> None:
+        self.square = square
+        self.captured = captured
+        self.king = king
+        self.jumps: Dict[int, Tuple[int, CaptureNode]] = {}
+        self.length = 0
+
+    @property
+    def is_final(self) -> bool:
+        return not self.jumps
+
+    def jump_to(self, sq: int) -> 'CaptureNode | None':
+        """Return the node reached by jumping from here to ``sq``."""
+        jump = self.jumps.get(sq)
+        return jump[1] if jump else None
+
+    def paths(self) -> Iterator[List[Tuple[int, int, 'CaptureNode']]]:
+        """Yield every complete sequence as (landing, captured, node)."""
+        if not self.jumps:
+            yield []
+            return
+        for land, (captured, child) in self.jumps.items():
+            for rest in child.paths():
+                yield [(land, captured, child), *rest]
+
+
+def build_capture_tree(
+    variant: Variant,
+    origin: int,
+    own: int,
+    enemy: int,
+    king: bool,
+    white: bool
+) -> CaptureNode:
+    """Enumerate all capture sequences for the piece on ``origin``.
+
+    Each jump is evaluated on the board as it stands after the previous
+    ones: the origin square is vacated, while captured pieces stay on
+    their squares until the sequence ends, blocking kings and never
+    jumped twice (the Turkish strike rule).
+    A man reaching the last row continues as a king, continues as a man
+    and is promoted if the sequence ends there, or stops, depending on
+    the variant. Under the majority rule only the longest sequences are
+    kept.
+    """
+    nodes: Dict[CaptureKey, CaptureNode] = {}
+    others = own & ~(1 << origin)
+    promotion = variant.geometry.promotion(white)
+    crowns = variant.capture_promotion != CapturePromotion.CONTINUE_AS_MAN
+    stops = variant.capture_promotion == CapturePromotion.STOP
+
+    def expand(
+        sq: int, captured: int, is_king: bool, stopped: bool
+    ) -> CaptureNode:
+        key = (sq, captured, is_king, stopped)
+        node = nodes.get(key)
+        if node is not None:
+            return node
+
+        node = nodes[key] = CaptureNode(sq, captured, is_king)
+        if stopped:
+            return node
+
+        jumps = single_captures(
+            variant, sq, others | 1 << sq, enemy, is_king, white, captured
+        )
+        for land, jumped in jumps:
+            promotes = not is_king and bool(promotion & 1 << land)
+            child = expand(
+                land,
+                captured | 1 << jumped,
+                is_king or promotes and crowns,
+                promotes and stops,
+            )
+            node.jumps[land] = (jumped, child)
+            node.length = max(node.length, child.length + 1)
+
+        if variant.majority_capture:
+            node.jumps = {
+                land: jump for land, jump in node.jumps.items()
+                if jump[1].length + 1 == node.length
+            }
+        if not node.jumps and not is_king and promotion & 1 << sq:
+            node.king = True
+        return node
+
+    return expand(origin, 0, king, False)
@@ -0,0 +1,148 @@
+"""Compact binary encodings of positions and legal-move maps.
+
+Each playable square is in one of five states, so the squares form a
+base-5 number. Doubled and offset by the side to move it fits in 10 bytes
+(little-endian) on the 8x8 board and in 15 bytes on the 10x10 one.
+Squares are packed four at a time through a 625-entry table, which keeps
+encoding and decoding to a handful of int operations.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from bot.bl.bitboard import SQUARE_COUNT, STANDARD, Geometry
+from bot.bl.move import Move
+from bot.bl.move import encode as encode_move
+from bot.bl.piece import PieceColor
+
+CODEC_VERSION = 1
+
+# Per-square states, i.e. the base-5 digits
+EMPTY, WHITE_MAN, WHITE_KING, BLACK_MAN, BLACK_KING = range(5)
+
+_GROUP = 4
+_GROUP_BASE = 5 ** _GROUP
+
+
+def _group_masks(value: int) -> Tuple[int, int, int]:
+    white = black = kings = 0
+    for i in range(_GROUP):
+        value, state = divmod(value, 5)
+        bit = 1 << i
+        if state in (WHITE_MAN, WHITE_KING):
+            white |= bit
+        elif state in (BLACK_MAN, BLACK_KING):
+            black |= bit
+        if state in (WHITE_KING, BLACK_KING):
+            kings |= bit
+    return white, black, kings
+
+
+# Base-5 value of four squares <-> their (white, black, kings) nibbles
+_DECODE: List[Tuple[int, int, int]] = [
+    _group_masks(value) for value in range(_GROUP_BASE)
+]
+_ENCODE: Dict[Tuple[int, int, int], int] = {
+    masks: value for value, masks in enumerate(_DECODE)
+}
+
+
+def encoded_size(square_count: int = SQUARE_COUNT) -> int:
+    """Bytes taken by a position on a board of ``square_count`` squares."""
+    return (2 * 5 ** square_count - 1).bit_length() + 7 >> 3
+
+
+ENCODED_SIZE = encoded_size()
+
+
+def encode(
+    white: int,
+    black: int,
+    kings: int,
+    turn: PieceColor,
+    square_count: int = SQUARE_COUNT
+) -> bytes:
+    value = 0
+    for group in reversed(range(-(-square_count // _GROUP))):
+        shift = group * _GROUP
+        value = value * _GROUP_BASE + _ENCODE[(
+            (white >> shift) & 0xF,
+            (black >> shift) & 0xF,
+            (kings >> shift) & 0xF,
+        )]
+    value = value * 2 + (turn == PieceColor.BLACK)
+    return value.to_bytes(encoded_size(square_count), 'little')
+
+
+def decode(
+    data: bytes, square_count: int = SQUARE_COUNT
+) -> Tuple[int, int, int, PieceColor]:
+    """Return the white, black and king masks and the side to move."""
+    size = encoded_size(square_count)
+    if len(data) != size:
+        raise ValueError(f'Expected {size} bytes, got {len(data)}')
+
+    value = int.from_bytes(data, 'little')
+    turn = PieceColor.BLACK if value & 1 else PieceColor.WHITE
+    value >>= 1
+    if value >= 5 ** square_count:
+        raise ValueError('Encoded board is out of range')
+
+    white = black = kings = 0
+    for group in range(-(-square_count // _GROUP)):
+        value, digits = divmod(value, _GROUP_BASE)
+        w, b, k = _DECODE[digits]
+        shift = group * _GROUP
+        white |= w << shift
+        black |= b << shift
+        kings |= k << shift
+
+    return white, black, kings, turn
+
+
+def decode_turn(data: bytes) -> PieceColor:
+    return PieceColor.BLACK if data[0] & 1 else PieceColor.WHITE
+
+
+# A move packs from square, to square, captured square and a capture flag,
+# each square in as many bits as the board needs: 5 + 5 + 5 + 1 bits on
+# the 8x8 board, 6 + 6 + 6 + 1 on the 10x10 one
+
+
+def _move_layout(geometry: Geometry) -> Tuple[int, int]:
+    """Bits per square and bytes per move."""
+    bits = (geometry.square_count - 1).bit_length()
+    return bits, 3 * bits + 8 >> 3
+
+
+def encode_moves(
+    moves: Iterable[Move], geometry: Geometry = STANDARD
+) -> bytes:
+    bits, size = _move_layout(geometry)
+    data = bytearray()
+    for move in moves:
+        value = move.from_sq | move.to_sq << bits
+        if move.is_capture:
+            captured = move.captured_mask
+            value |= ((captured & -captured).bit_length() - 1) << 2 * bits
+            value |= 1 << 3 * bits
+        data += value.to_bytes(size, 'little')
+    return bytes(data)
+
+
+def decode_moves(
+    data: bytes, geometry: Geometry = STANDARD
+) -> Dict[str, List[Move]]:
+    """Decode moves grouped by the square they start from."""
+    bits, size = _move_layout(geometry)
+    square = (1 << bits) - 1
+    moves: Dict[str, List[Move]] = {}
+    for offset in range(0, len(data), size):
+        value = int.from_bytes(data[offset:offset + size], 'little')
+        from_sq = value & square
+        captured = (
+            1 << (value >> 2 * bits & square) if value >> 3 * bits else 0
+        )
+        move = Move.from_code(
+            encode_move(from_sq, value >> bits & square, captured), geometry
+        )
+        moves.setdefault(geometry.positions[from_sq], []).append(move)
+    return moves
@@ -0,0 +1,367 @@
+"""Alpha-beta search for the computer opponent.
+
+The search runs over complete turns: a capture sequence is played to its
+end before the other side moves, as in ``bot.bench.perft``. Iterative
+deepening keeps the best turn of the last finished depth, so the search
+can stop on its time or node budget and still answer.
+"""
+import random
+import time
+from enum import StrEnum, auto
+from typing import Dict, List, NamedTuple, Tuple
+
+from bot.bl.bitboard import Geometry
+from bot.bl.board import Board
+from bot.bl.move import Move
+from bot.bl.piece import PieceColor
+from bot.bl.variant import VARIANTS, Variant, get_variant
+
+
+class Difficulty(StrEnum):
+    EASY = auto()
+    MEDIUM = auto()
+    HARD = auto()
+
+
+class Budget(NamedTuple):
+    max_depth: int
+    seconds: float
+    nodes: int
+    # Root turns scoring within this margin of the best are picked at random
+    noise: int
+
+
+BUDGETS: Dict[Difficulty, Budget] = {
+    Difficulty.EASY: Budget(max_depth=2, seconds=0.2, nodes=2_000, noise=60),
+    Difficulty.MEDIUM: Budget(
+        max_depth=6, seconds=0.5, nodes=40_000, noise=15
+    ),
+    Difficulty.HARD: Budget(
+        max_depth=32, seconds=1.5, nodes=400_000, noise=0
+    ),
+}
+
+
+class SearchResult(NamedTuple):
+    codes: List[int]
+    score: int
+    depth: int
+    nodes: int
+
+
+MAN = 100
+FLYING_KING = 300
+SHORT_KING = 160
+ADVANCE = 4
+CENTER = 6
+BACK_ROW = 8
+
+MATE = 100_000
+# Captures still on the board at the horizon are searched this much deeper
+MAX_EXTENSION = 8
+
+TABLE_BITS = 18
+EXACT, LOWER, UPPER = range(3)
+
+
+class _Weights(NamedTuple):
+    # rank masks from each side's own back row
+    white_ranks: Tuple[int, ...]
+    black_ranks: Tuple[int, ...]
+    center: int
+    king: int
+
+
+def _weights(variant: Variant) -> _Weights:
+    geometry: Geometry = variant.geometry
+    size = geometry.size
+    rows = [0] * size
+    center = 0
+    for sq, (col, row) in enumerate(geometry.square_coords):
+        rows[row] |= 1 << sq
+        if 2 <= col < size - 2 and 2 <= row < size - 2:
+            center |= 1 << sq
+    return _Weights(
+        white_ranks=tuple(rows),
+        black_ranks=tuple(reversed(rows)),
+        center=center,
+        king=FLYING_KING if variant.flying_kings else SHORT_KING,
+    )
+
+
+_WEIGHTS: Dict[Variant, _Weights] = {
+    variant: _weights(variant) for variant in VARIANTS.values()
+}
+
+
+def evaluate(board: Board, color: PieceColor) -> int:
+    """Static score in centipawns from the point of view of ``color``."""
+    weights = _WEIGHTS[board.variant]
+    white, black, kings = board.white, board.black, board.kings
+    white_men = white & ~kings
+    black_men = black & ~kings
+
+    score = (
+        MAN * (white_men.bit_count() - black_men.bit_count())
+        + weights.king * (
+            (white & kings).bit_count() - (black & kings).bit_count()
+        )
+        + CENTER * (
+            (white & weights.center).bit_count()
+            - (black & weights.center).bit_count()
+        )
+        + BACK_ROW * (
+            (white_men & weights.white_ranks[0]).bit_count()
+            - (black_men & weights.black_ranks[0]).bit_count()
+        )
+    )
+    for rank in range(1, len(weights.white_ranks) - 1):
+        score += ADVANCE * rank * (
+            (white_men & weights.white_ranks[rank]).bit_count()
+            - (black_men & weights.black_ranks[rank]).bit_count()
+        )
+
+    return score if color == PieceColor.WHITE else -score
+
+
+class TranspositionTable:
+    """Fixed number of slots indexed by the low bits of the position hash.
+
+    A slot keeps the deeper of the old and the new entry, so the table
+    never grows past its size however long the process plays.
+    """
+
+    __slots__ = ('mask', 'slots')
+
+    def __init__(self, bits: int = TABLE_BITS) -> None:
+        self.mask = (1 << bits) - 1
+        self.slots: List[Tuple[int, int, int, int, Tuple[int, ...]] | None] = (
+            [None] * (1 << bits)
+        )
+
+    def get(
+        self, key: int
+    ) -> Tuple[int, int, int, int, Tuple[int, ...]] | None:
+        entry = self.slots[key & self.mask]
+        return entry if entry is not None and entry[0] == key else None
+
+    def put(
+        self, key: int, depth: int, score: int, bound: int,
+        best: Tuple[int, ...]
+    ) -> None:
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[1] <= depth:
+            self.slots[index] = (key, depth, score, bound, best)
+
+
+class _Abort(Exception):
+    pass
+
+
+def _opponent(color: PieceColor) -> PieceColor:
+    return PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+
+
+def _codes(turn: List[Move]) -> Tuple[int, ...]:
+    return tuple(move.code for move in turn)
+
+
+class Search:
+    """One search; the transposition table may outlive it."""
+
+    def __init__(
+        self,
+        board: Board,
+        budget: Budget,
+        table: TranspositionTable,
+        deadline: float | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.board = board
+        self.budget = budget
+        self.table = table
+        self.deadline = (
+            deadline if deadline is not None
+            else time.time() + budget.seconds
+        )
+        self.rng = rng or random.Random()
+        self.nodes = 0
+        self.history: Dict[int, int] = {}
+        self.killers: Dict[int, Tuple[int, ...]] = {}
+
+    def run(self, color: PieceColor) -> SearchResult:
+        board = self.board
+        turns = board.get_turns(color)
+        if not turns:
+            return SearchResult([], -MATE, 0, 0)
+
+        result = SearchResult(list(_codes(turns[0])), 0, 0, 0)
+        for depth in range(1, self.budget.max_depth + 1):
+            try:
+                score, turn = self._root(color, turns, depth)
+            except _Abort:
+                break
+            result = SearchResult(list(turn), score, depth, self.nodes)
+            # Depth 1 always completes, so there is a move to play
+            if (
+                time.time() >= self.deadline
+                or self.nodes >= self.budget.nodes
+                or abs(score) >= MATE - depth
+                or len(turns) == 1
+            ):
+                break
+
+            best = turn
+            turns.sort(key=lambda t: _codes(t) != best)
+
+        return result._replace(nodes=self.nodes)
+
+    def _root(
+        self, color: PieceColor, turns: List[List[Move]], depth: int
+    ) -> Tuple[int, Tuple[int, ...]]:
+        board = self.board
+        noise = self.budget.noise
+        scored: List[Tuple[int, Tuple[int, ...]]] = []
+        best = -MATE - 1
+
+        for turn in turns:
+            # Keep scores within the noise margin exact, not just bounds
+            alpha = max(best - noise - 1, -MATE - 1)
+            tokens = [board.make_move(move) for move in turn]
+            try:
+                score = -self._search(
+                    _opponent(color), depth - 1, -MATE - 1, -alpha, 1,
+                    check=depth > 1,
+                )
+            finally:
+                for token in reversed(tokens):
+                    board.unmake_move(token)
+            scored.append((score, _codes(turn)))
+            best = max(best, score)
+
+        candidates = [
+            codes for score, codes in scored if score >= best - noise
+        ]
+        return best, self.rng.choice(candidates)
+
+    def _search(
+        self,
+        color: PieceColor,
+        depth: int,
+        alpha: int,
+        beta: int,
+        ply: int,
+        check: bool = True
+    ) -> int:
+        self.nodes += 1
+        if check and not self.nodes & 0xFF and (
+            time.time() >= self.deadline or self.nodes >= self.budget.nodes
+        ):
+            raise _Abort
+
+        board = self.board
+        if depth <= 0 and (
+            ply >= self.budget.max_depth + MAX_EXTENSION
+            or not board.has_mandatory_captures(color)
+        ):
+            return evaluate(board, color)
+
+        key = board.position_hash(color)
+        entry = self.table.get(key)
+        tt_best: Tuple[int, ...] = ()
+        if entry is not None:
+            _, entry_depth, score, bound, tt_best = entry
+            if entry_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER and score >= beta
+                or bound == UPPER and score <= alpha
+            ):
+                return score
+
+        turns = board.get_turns(color)
+        if not turns:
+            return -MATE + ply
+
+        killer = self.killers.get(ply)
+        history = self.history
+
+        def priority(turn: List[Move]) -> int:
+            codes = _codes(turn)
+            if codes == tt_best:
+                return -1 << 40
+            if codes == killer:
+                return -1 << 30
+            return -len(turn) * 1000 - history.get(turn[0].code, 0)
+
+        turns.sort(key=priority)
+
+        original_alpha = alpha
+        best_score = -MATE - 1
+        best: Tuple[int, ...] = ()
+        for turn in turns:
+            tokens = [board.make_move(move) for move in turn]
+            try:
+                score = -self._search(
+                    _opponent(color), depth - 1, -beta, -alpha, ply + 1,
+                    check,
+                )
+            finally:
+                for token in reversed(tokens):
+                    board.unmake_move(token)
+
+            if score > best_score:
+                best_score = score
+                best = _codes(turn)
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not turn[0].is_capture:
+                    self.killers[ply] = best
+                    code = turn[0].code
+                    history[code] = history.get(code, 0) + depth * depth
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.put(key, max(depth, 0), best_score, bound, best)
+        return best_score
+
+
+# One table per process, reused by every search the process runs
+_table = TranspositionTable()
+
+
+def search(
+    data: bytes,
+    variant: str,
+    color: PieceColor,
+    difficulty: Difficulty,
+    deadline: float | None = None,
+) -> SearchResult:
+    """Find a turn for the position encoded by ``Board.to_bytes``.
+
+    Takes and returns plain values so it can run in a worker process.
+    A job that only starts after its ``deadline`` has been given up by
+    the caller, so it answers with the first legal turn at once.
+    """
+    board = Board.from_bytes(data, variant=get_variant(variant))
+    if deadline is not None and time.time() >= deadline:
+        turns = board.get_turns(color)
+        if not turns:
+            return SearchResult([], -MATE, 0, 0)
+        return SearchResult(list(_codes(turns[0])), 0, 0, 0)
+    return Search(board, BUDGETS[difficulty], _table, deadline).run(color)
+
+
+def warm_up() -> None:
+    """Build every lookup table and exercise the search once."""
+    for variant in VARIANTS.values():
+        board = Board(variant)
+        Search(
+            board, Budget(2, 1.0, 1_000, 0), TranspositionTable(8)
+        ).run(PieceColor.WHITE)
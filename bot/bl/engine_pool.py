@@ -0,0 +1,119 @@
+"""Worker processes that run the engine away from the event loop.
+
+Each search gets a deadline when it is submitted, so time spent waiting
+for a free worker counts against its budget. When even that runs out,
+for example under a burst of bot games, the reply falls back to a
+depth-one search on a thread, and the abandoned job is cancelled if it
+has not started or gives up at its deadline if it has. Game reviews
+have their own workers, so a long review never holds up a bot reply.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Sequence
+
+from bot.bl import engine, review
+from bot.bl.board import Board
+from bot.bl.engine import BUDGETS, Difficulty, SearchResult
+from bot.bl.history import MoveRecord
+from bot.bl.piece import PieceColor
+
+log = logging.getLogger(__name__)
+
+# Time allowed on top of the search budget for pickling and scheduling
+LATENCY_SLACK = 0.5
+
+_pool: ProcessPoolExecutor | None = None
+_review_pool: ProcessPoolExecutor | None = None
+
+
+async def start(workers: int | None = None, review_workers: int = 1) -> None:
+    """Start the workers and wait until every one of them is warm."""
+    global _pool, _review_pool
+    if _pool is not None:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context('spawn')
+    _pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=engine.warm_up,
+    )
+    _review_pool = ProcessPoolExecutor(
+        max_workers=review_workers, mp_context=context
+    )
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    # The pool only spawns a worker when a job waits for one
+    await asyncio.gather(*(
+        loop.run_in_executor(_pool, time.sleep, 0.05)
+        for _ in range(workers)
+    ))
+    log.info(
+        'Engine pool: %d workers ready in %.2fs',
+        workers, time.perf_counter() - started
+    )
+
+
+async def stop() -> None:
+    global _pool, _review_pool
+    for pool in (_pool, _review_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _pool = _review_pool = None
+
+
+def _quick(board: Board, color: PieceColor) -> SearchResult:
+    return engine.Search(
+        board, BUDGETS[Difficulty.EASY]._replace(max_depth=1, noise=0),
+        engine.TranspositionTable(8),
+    ).run(color)
+
+
+async def find_turn(
+    board: Board, color: PieceColor, difficulty: Difficulty
+) -> SearchResult:
+    """Search for the turn ``color`` should play on ``board``."""
+    budget = BUDGETS[difficulty]
+    loop = asyncio.get_running_loop()
+    deadline = time.time() + budget.seconds
+    data = board.to_bytes(color)
+    job = partial(
+        engine.search, data, board.variant.name, color, difficulty, deadline
+    )
+
+    if _pool is None:
+        return await asyncio.to_thread(job)
+
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(_pool, job),
+            budget.seconds + LATENCY_SLACK,
+        )
+        # Depth 0 is a job that only started after its deadline
+        if result.depth > 0 or not result.codes:
+            return result
+    except asyncio.TimeoutError:
+        pass
+
+    log.warning('Engine pool busy, answering with a quick search')
+    return await asyncio.to_thread(
+        _quick, Board.from_bytes(data, variant=board.variant), color
+    )
+
+
+async def review_game(
+    variant: str, records: Sequence[MoveRecord]
+) -> bytes:
+    """Run ``bot.bl.review.review_game`` on a review worker."""
+    job = partial(review.review_game, variant, records)
+    if _review_pool is None:
+        return await asyncio.to_thread(job)
+    return await asyncio.get_running_loop().run_in_executor(
+        _review_pool, job
+    )
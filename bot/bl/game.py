@@ -1,31 +1,94 @@
-from datetime import datetime
+import asyncio
+import logging
+import random
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence, Set, Tuple
 from uuid import UUID
 
-from sqlalchemy import desc, select
+from sqlalchemy import ColumnElement, desc, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
 
+from bot.bl import book, codec, engine_pool, repertoire, review
+from bot.bl.analysis import RULES_VERSION
 from bot.bl.board import Board
-from bot.db.models import Game
-from bot.db.models.game import GameStatus
+from bot.bl.engine import Difficulty
+from bot.bl.history import MoveRecord, position_key
+from bot.bl.move import Move
+from bot.bl.piece import PieceColor
+from bot.bl.puzzle import PuzzleCandidate
+from bot.bl.variant import VariantName, get_variant
+from bot.db.models import Game, GamePosition, GameReview
+from bot.db.models import Move as MoveModel
+from bot.db.models import OpeningStat, Puzzle
+from bot.db.models.game import GameStatus, PlayerColor
 from bot.db.session import s
 
+log = logging.getLogger(__name__)
+
+# Rows per insert; a statement takes at most 32767 parameters
+POSITION_BATCH = 10_000
+OPENING_BATCH = 4_000
+
+# Reviews running in the background, kept so they are not collected early
+_review_tasks: Set[asyncio.Task] = set()
+
+
+def load_board(game: Game) -> Board:
+    """Decode the game's board, reusing its stored legal-move map."""
+    variant = get_variant(game.variant)
+    board = Board.from_bytes(game.board_data, game.board_version, variant)
+
+    if (
+        game.legal_moves is not None
+        and game.legal_moves_version == RULES_VERSION
+    ):
+        board.analysis.preload(
+            PieceColor(game.current_turn.value),
+            codec.decode_moves(game.legal_moves, variant.geometry)
+        )
+
+    return board
+
+
+def store_board(
+    game: Game, board: Board, moves: Dict[str, List[Move]] | None = None
+) -> None:
+    """Save the board and the legal moves of the side to move.
+
+    ``moves`` replaces the generated map, e.g. with the jumps that may
+    continue a capture sequence.
+    """
+    turn = PieceColor(game.current_turn.value)
+    if moves is None:
+        moves = board.analysis.moves(turn)
+    game.board_data = board.to_bytes(turn)
+    game.board_version = codec.CODEC_VERSION
+    game.legal_moves = codec.encode_moves(
+        (move for piece_moves in moves.values() for move in piece_moves),
+        board.geometry,
+    )
+    game.legal_moves_version = RULES_VERSION
+
 
 async def create_game(
     white_player_id: int,
     chat_id: int,
     message_id: int,
-    locale: str = 'en'
+    locale: str = 'en',
+    variant: VariantName = VariantName.RUSSIAN
 ) -> Game:
-    board = Board()
-
     game = Game(
         white_player_id=white_player_id,
         chat_id=chat_id,
         message_id=message_id,
-        board_state=board.to_dict(),
+        current_turn=PlayerColor.WHITE,
         status=GameStatus.PENDING,
-        locale=locale
+        locale=locale,
+        variant=variant
     )
+    store_board(game, Board(get_variant(variant)))
     s.session.add(game)
     await s.session.flush()
 
@@ -57,6 +120,80 @@ async def accept_game(game_id: UUID, black_player_id: int) -> Game | None:
     return game
 
 
+async def start_bot_game(
+    game_id: UUID, bot_player_id: int, difficulty: Difficulty
+) -> Game | None:
+    """Start a pending game with the engine playing black."""
+    result = await s.session.execute(
+        select(Game)
+        .options(
+            selectinload(Game.white_player),
+            selectinload(Game.black_player)
+        )
+        .where(Game.id == game_id)
+    )
+    game = result.scalar_one_or_none()
+
+    if not game or game.status != GameStatus.PENDING:
+        return None
+
+    game.black_player_id = bot_player_id
+    game.bot_difficulty = difficulty
+    game.status = GameStatus.ACTIVE
+    await s.session.flush()
+
+    await s.session.refresh(game, ['black_player'])
+
+    return game
+
+
+async def play_bot_turn(game: Game, board: Board) -> None:
+    """Let the engine play the side to move and record its moves.
+
+    Positions in the opening book are answered with a book turn instead.
+    """
+    assert game.bot_difficulty is not None
+    color = PieceColor(game.current_turn.value)
+    opening = book.get(board.variant.name)
+    turn = opening.choose(board, color) if opening else None
+    if turn is not None:
+        codes = [move.code for move in turn]
+    else:
+        codes = (await engine_pool.find_turn(
+            board, color, game.bot_difficulty
+        )).codes
+
+    move_count = (await s.session.execute(
+        select(func.count(MoveModel.id)).where(MoveModel.game_id == game.id)
+    )).scalar() or 0
+    player_id = (
+        game.white_player_id if color == PieceColor.WHITE
+        else game.black_player_id
+    )
+
+    for number, code in enumerate(codes, start=move_count + 1):
+        move = Move.from_code(code, board.geometry)
+        board.execute_move(move)
+        s.session.add(MoveModel(
+            game_id=game.id,
+            player_id=player_id,
+            from_position=move.from_pos,
+            to_position=move.to_pos,
+            captured_positions=move.captured_positions or None,
+            promoted=move.promoted,
+            move_number=number
+        ))
+
+    game.current_turn = (
+        PlayerColor.BLACK if color == PieceColor.WHITE
+        else PlayerColor.WHITE
+    )
+    add_position(
+        game.id, move_count + len(codes), board,
+        PieceColor(game.current_turn.value)
+    )
+
+
 async def cancel_game(game_id: UUID) -> bool:
     result = await s.session.execute(
         select(Game).where(Game.id == game_id)
@@ -116,11 +253,251 @@ async def finish_game(game_id: UUID, winner_id: int | None) -> Game | None:
             black_player.wins += 1
             white_player.losses += 1
 
+    records = await load_move_records([game.id])
+    await store_openings(repertoire.game_scores(
+        game.variant,
+        records[game.id],
+        repertoire.game_players(
+            game.white_player_id, game.black_player_id,
+            game.bot_difficulty is not None,
+        ),
+        repertoire.game_winner(
+            winner_id, game.white_player_id, game.black_player_id
+        ),
+    ))
+
     await s.session.flush()
+    schedule_review(game)
 
     return game
 
 
+async def store_openings(
+    scores: Dict[repertoire.OpeningKey, repertoire.Score]
+) -> None:
+    """Add results to the players' opening statistics."""
+    rows = [
+        {
+            'user_id': key.user_id,
+            'color': PlayerColor(key.color.value),
+            'turns': key.turns,
+            'variant': key.variant,
+            'opening': key.opening,
+            'wins': score.wins,
+            'draws': score.draws,
+            'losses': score.losses,
+        }
+        for key, score in scores.items()
+    ]
+    for start in range(0, len(rows), OPENING_BATCH):
+        query = insert(OpeningStat).values(rows[start:start + OPENING_BATCH])
+        await s.session.execute(query.on_conflict_do_update(
+            index_elements=[
+                OpeningStat.user_id, OpeningStat.color, OpeningStat.turns,
+                OpeningStat.variant, OpeningStat.opening,
+            ],
+            set_={
+                'wins': OpeningStat.wins + query.excluded.wins,
+                'draws': OpeningStat.draws + query.excluded.draws,
+                'losses': OpeningStat.losses + query.excluded.losses,
+            },
+        ))
+
+
+async def load_game_chunk(
+    columns: Sequence[Any],
+    after: UUID | None,
+    size: int,
+    *criteria: ColumnElement[bool],
+    statuses: Sequence[GameStatus] = (GameStatus.FINISHED,),
+) -> List[Tuple[Any, ...]]:
+    """Next ``size`` games after the id ``after``, as rows of ``columns``.
+
+    Jobs stream games with it in id order, passing the last id of a chunk
+    to get the next one. Only games in ``statuses`` matching every one of
+    ``criteria`` are returned.
+    """
+    query = (
+        select(*columns)
+        .where(Game.status.in_(statuses), *criteria)
+        .order_by(Game.id)
+        .limit(size)
+    )
+    if after is not None:
+        query = query.where(Game.id > after)
+    return list((await s.session.execute(query)).tuples())
+
+
+async def load_move_records(
+    game_ids: Sequence[UUID]
+) -> Dict[UUID, List[MoveRecord]]:
+    """Stored moves of each game in the form ``bot.bl.review`` takes."""
+    records: Dict[UUID, List[MoveRecord]] = {
+        game_id: [] for game_id in game_ids
+    }
+    if not game_ids:
+        return records
+
+    rows = await s.session.execute(
+        select(
+            MoveModel.game_id,
+            MoveModel.from_position,
+            MoveModel.to_position,
+            MoveModel.captured_positions,
+            MoveModel.player_id,
+        )
+        .where(MoveModel.game_id.in_(game_ids))
+        .order_by(MoveModel.game_id, MoveModel.move_number)
+    )
+    for game_id, from_pos, to_pos, captured, player_id in rows:
+        records[game_id].append((from_pos, to_pos, captured, player_id))
+    return records
+
+
+async def store_review(game_id: UUID, data: bytes) -> None:
+    await s.session.merge(GameReview(
+        game_id=game_id, data=data, version=review.REVIEW_VERSION
+    ))
+    await s.session.flush()
+
+
+async def get_review(game_id: UUID) -> List[review.MoveReview] | None:
+    """Per-move review of a game, None until an up to date one is stored."""
+    game_review = await s.session.get(GameReview, game_id)
+    if game_review is None or game_review.version != review.REVIEW_VERSION:
+        return None
+    return review.unpack(game_review.data)
+
+
+def add_position(
+    game_id: UUID, move_number: int, board: Board, turn: PieceColor
+) -> None:
+    """Index the position after a complete turn, with ``turn`` to move."""
+    s.session.add(GamePosition(
+        game_id=game_id,
+        move_number=move_number,
+        hash=position_key(board, turn),
+    ))
+
+
+async def store_positions(
+    positions: Sequence[Tuple[UUID, int, int]]
+) -> None:
+    """Index (game id, move number, key) rows, skipping known ones."""
+    for start in range(0, len(positions), POSITION_BATCH):
+        await s.session.execute(
+            insert(GamePosition)
+            .values([
+                {'game_id': game_id, 'move_number': number, 'hash': key}
+                for game_id, number, key
+                in positions[start:start + POSITION_BATCH]
+            ])
+            .on_conflict_do_nothing()
+        )
+
+
+async def find_games_at_position(
+    board: Board, turn: PieceColor, user_id: int,
+    exclude: UUID | None = None, limit: int = 100
+) -> List[Tuple[UUID, int, datetime | None]]:
+    """The user's finished games that reached the position, newest first.
+
+    Each game comes once, with the first move it reached the position
+    at and when it finished; ``exclude`` leaves out the game asked from.
+    """
+    query = (
+        select(
+            Game.id, func.min(GamePosition.move_number), Game.finished_at
+        )
+        .join(Game, Game.id == GamePosition.game_id)
+        .where(
+            GamePosition.hash == position_key(board, turn),
+            Game.status == GameStatus.FINISHED,
+            or_(
+                Game.white_player_id == user_id,
+                Game.black_player_id == user_id,
+            ),
+        )
+        .group_by(Game.id)
+        .order_by(desc(Game.finished_at))
+        .limit(limit)
+    )
+    if exclude is not None:
+        query = query.where(GamePosition.game_id != exclude)
+    return list((await s.session.execute(query)).tuples())
+
+
+async def store_puzzles(
+    game_id: UUID, variant: VariantName, puzzles: Sequence[PuzzleCandidate]
+) -> None:
+    """Add the puzzles of a game; ones already stored are kept as they are."""
+    if not puzzles:
+        return
+    await s.session.execute(
+        insert(Puzzle)
+        .values([
+            {
+                'game_id': game_id,
+                'variant': variant,
+                'move_number': puzzle.move_number,
+                'board_data': puzzle.board_data,
+                'board_version': codec.CODEC_VERSION,
+                'solution': puzzle.solution,
+                'difficulty': puzzle.difficulty,
+                'gain': puzzle.gain,
+                'pick': random.getrandbits(31),
+            }
+            for puzzle in puzzles
+        ])
+        .on_conflict_do_nothing(index_elements=['game_id', 'move_number'])
+    )
+
+
+async def get_puzzle(puzzle_id: int) -> Puzzle | None:
+    return await s.session.get(Puzzle, puzzle_id)
+
+
+async def get_daily_puzzle(difficulty: int, day: date) -> Puzzle | None:
+    """The puzzle of the day, the same for everyone asking that day.
+
+    Puzzles carry a random key and the day picks the first key at or
+    past its own, wrapping around, so it is an index lookup.
+    """
+    key = zlib.crc32(day.isoformat().encode()) & 0x7FFFFFFF
+    query = (
+        select(Puzzle)
+        .where(Puzzle.difficulty == difficulty)
+        .order_by(Puzzle.pick)
+        .limit(1)
+    )
+    puzzle = await s.session.scalar(query.where(Puzzle.pick >= key))
+    if puzzle is None:
+        puzzle = await s.session.scalar(query)
+    return puzzle
+
+
+async def _review_in_background(game_id: UUID, variant: str) -> None:
+    s.session = s.maker()
+    try:
+        records = await load_move_records([game_id])
+        data = await engine_pool.review_game(variant, records[game_id])
+        await store_review(game_id, data)
+        await s.session.commit()
+    except Exception:
+        log.exception('Review of game %s failed', game_id)
+    finally:
+        await s.session.close()
+
+
+def schedule_review(game: Game) -> None:
+    """Review a finished game once the current update is handled."""
+    task = asyncio.create_task(
+        _review_in_background(game.id, game.variant)
+    )
+    _review_tasks.add(task)
+    task.add_done_callback(_review_tasks.discard)
+
+
 async def get_finished_games_for_user(
     user_id: int,
     limit: int = 10
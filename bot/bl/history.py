@@ -1,15 +1,77 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 
+from bot.bl.bitboard import Geometry
 from bot.bl.board import Board
 from bot.bl.move import Move, MoveType
+from bot.bl.piece import PieceColor
+from bot.bl.variant import RUSSIAN, Variant
 
 if TYPE_CHECKING:
     from bot.db.models import Move as MoveModel
 
+# from position, to position, captured positions, player id
+MoveRecord = Tuple[str, str, Sequence[str] | None, int]
+
+
+def split_turns(records: Sequence[MoveRecord]) -> List[List[MoveRecord]]:
+    """Group stored moves into turns.
+
+    A capture sequence is stored one jump per move; the turn passes when
+    the player changes.
+    """
+    turns: List[List[MoveRecord]] = []
+    for record in records:
+        if turns and turns[-1][-1][3] == record[3]:
+            turns[-1].append(record)
+        else:
+            turns.append([record])
+    return turns
+
+
+def record_move(record: MoveRecord, geometry: Geometry) -> Move:
+    from_pos, to_pos, captured, _ = record
+    return Move(
+        from_pos=from_pos,
+        to_pos=to_pos,
+        move_type=MoveType.CAPTURE if captured else MoveType.NORMAL,
+        captured_positions=list(captured or []),
+        geometry=geometry
+    )
+
+
+def position_key(board: Board, turn: PieceColor) -> int:
+    """Position hash as a signed 64-bit int, the way the index stores it."""
+    key = board.position_hash(turn)
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def turn_positions(
+    records: Sequence[MoveRecord], variant: Variant
+) -> List[Tuple[int, int]]:
+    """Move number and position key after every complete turn.
+
+    The initial position is shared by every game and left out.
+    """
+    board = Board(variant)
+    color = PieceColor.WHITE
+    positions: List[Tuple[int, int]] = []
+    move_number = 0
+    for turn in split_turns(records):
+        for record in turn:
+            board.execute_move(record_move(record, board.geometry))
+        move_number += len(turn)
+        color = (
+            PieceColor.BLACK if color == PieceColor.WHITE
+            else PieceColor.WHITE
+        )
+        positions.append((move_number, position_key(board, color)))
+    return positions
+
 
 def reconstruct_board_at_move(
     moves: list['MoveModel'],
-    target_move: int
+    target_move: int,
+    variant: Variant = RUSSIAN
 ) -> Board:
     """
     Reconstruct board state at a specific move number.
@@ -17,11 +79,12 @@ def reconstruct_board_at_move(
     Args:
         moves: List of Move model instances, ordered by move_number
         target_move: The move number to reconstruct to (0 = initial position)
+        variant: Rules the game was played with
 
     Returns:
         Board at the specified move state
     """
-    board = Board()
+    board = Board(variant)
 
     for move_record in moves:
         if move_record.move_number > target_move:
@@ -33,7 +96,8 @@ def reconstruct_board_at_move(
             to_pos=move_record.to_position,
             move_type=MoveType.CAPTURE if captured else MoveType.NORMAL,
             captured_positions=captured,
-            promoted=move_record.promoted
+            promoted=move_record.promoted,
+            geometry=variant.geometry
         )
         board.execute_move(move)
 
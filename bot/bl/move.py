@@ -1,5 +1,21 @@
-from dataclasses import dataclass
 from enum import StrEnum, auto
+from typing import Any, List
+
+from bot.bl.bitboard import STANDARD, Geometry, iter_bits
+
+# Packed move layout: from square (6 bits), to square (6 bits), capture
+# flag, promoted flag, then the mask of captured squares
+TO_SHIFT = 6
+CAPTURE_FLAG = 1 << 12
+PROMOTED_FLAG = 1 << 13
+CAPTURED_SHIFT = 14
+SQUARE_MASK = 0x3F
+
+
+def encode(from_sq: int, to_sq: int, captured: int = 0) -> int:
+    """Pack a move; a non-empty ``captured`` mask marks it a capture."""
+    code = from_sq | to_sq << TO_SHIFT | captured << CAPTURED_SHIFT
+    return code | CAPTURE_FLAG if captured else code
 
 
 class MoveType(StrEnum):
@@ -7,21 +23,109 @@ class MoveType(StrEnum):
     CAPTURE = auto()
 
 
-@dataclass
 class Move:
-    from_pos: str
-    to_pos: str
-    move_type: MoveType = MoveType.NORMAL
-    captured_positions: list[str] | None = None
-    promoted: bool = False
+    """A move packed into a single int and decoded on attribute access.
+
+    Square indexes refer to ``geometry``, the board the move is played on.
+    The rules engine creates moves with ``Move.from_code``; the string
+    based constructor is kept for the history replay and tests.
+    """
+
+    __slots__ = ('code', 'geometry')
+
+    code: int
+    geometry: Geometry
+
+    def __init__(
+        self,
+        from_pos: str,
+        to_pos: str,
+        move_type: MoveType = MoveType.NORMAL,
+        captured_positions: List[str] | None = None,
+        promoted: bool = False,
+        geometry: Geometry = STANDARD
+    ) -> None:
+        index = geometry.square_index
+        captured = 0
+        for pos in captured_positions or []:
+            captured |= 1 << index[pos]
+
+        code = (
+            index[from_pos]
+            | index[to_pos] << TO_SHIFT
+            | captured << CAPTURED_SHIFT
+        )
+        if move_type == MoveType.CAPTURE:
+            code |= CAPTURE_FLAG
+        if promoted:
+            code |= PROMOTED_FLAG
+        self.code = code
+        self.geometry = geometry
+
+    @classmethod
+    def from_code(cls, code: int, geometry: Geometry = STANDARD) -> 'Move':
+        move = cls.__new__(cls)
+        move.code = code
+        move.geometry = geometry
+        return move
+
+    @property
+    def from_sq(self) -> int:
+        return self.code & SQUARE_MASK
+
+    @property
+    def to_sq(self) -> int:
+        return self.code >> TO_SHIFT & SQUARE_MASK
 
-    def __post_init__(self):
-        if self.captured_positions is None:
-            self.captured_positions = []
+    @property
+    def captured_mask(self) -> int:
+        return self.code >> CAPTURED_SHIFT
+
+    @property
+    def from_pos(self) -> str:
+        return self.geometry.positions[self.code & SQUARE_MASK]
+
+    @property
+    def to_pos(self) -> str:
+        return self.geometry.positions[self.code >> TO_SHIFT & SQUARE_MASK]
+
+    @property
+    def move_type(self) -> MoveType:
+        if self.code & CAPTURE_FLAG:
+            return MoveType.CAPTURE
+        return MoveType.NORMAL
+
+    @property
+    def captured_positions(self) -> List[str]:
+        positions = self.geometry.positions
+        return [positions[sq] for sq in iter_bits(self.captured_mask)]
+
+    @property
+    def promoted(self) -> bool:
+        return bool(self.code & PROMOTED_FLAG)
+
+    @promoted.setter
+    def promoted(self, value: bool) -> None:
+        if value:
+            self.code |= PROMOTED_FLAG
+        else:
+            self.code &= ~PROMOTED_FLAG
 
     @property
     def is_capture(self) -> bool:
+        return bool(self.code & CAPTURE_FLAG) and self.captured_mask != 0
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Move):
+            return NotImplemented
+        return self.code == other.code and self.geometry is other.geometry
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
         return (
-            self.move_type == MoveType.CAPTURE
-            and len(self.captured_positions or []) > 0
+            f'Move(from_pos={self.from_pos!r}, to_pos={self.to_pos!r}, '
+            f'move_type={self.move_type!r}, '
+            f'captured_positions={self.captured_positions!r}, '
+            f'promoted={self.promoted!r})'
         )
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
 from enum import StrEnum, auto
+from typing import Any, Dict, Tuple, Type
 
 
 class PieceColor(StrEnum):
@@ -12,13 +12,42 @@ class PieceType(StrEnum):
     KING = auto()
 
 
-@dataclass
 class Piece:
+    """Immutable piece; there is exactly one instance per color and type.
+
+    ``Piece(color, type)`` returns the shared instance, so pieces can be
+    compared by identity and handed out without copying. Promotion replaces
+    the piece on the square with ``piece.promoted()``.
+    """
+
+    __slots__ = ('color', 'type')
+
     color: PieceColor
-    type: PieceType = PieceType.REGULAR
+    type: PieceType
+
+    def __new__(
+        cls, color: PieceColor, type: PieceType = PieceType.REGULAR
+    ) -> 'Piece':
+        return _PIECES[(PieceColor(color), PieceType(type))]
+
+    @classmethod
+    def _create(cls, color: PieceColor, type: PieceType) -> 'Piece':
+        piece = object.__new__(cls)
+        object.__setattr__(piece, 'color', color)
+        object.__setattr__(piece, 'type', type)
+        return piece
 
-    def promote(self) -> None:
-        self.type = PieceType.KING
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('Piece is immutable')
+
+    def __reduce__(self) -> Tuple[Type['Piece'], Tuple[PieceColor, PieceType]]:
+        return Piece, (self.color, self.type)
+
+    def __repr__(self) -> str:
+        return f'Piece(color={self.color!r}, type={self.type!r})'
+
+    def promoted(self) -> 'Piece':
+        return Piece(self.color, PieceType.KING)
 
     def is_king(self) -> bool:
         return self.type == PieceType.KING
@@ -40,3 +69,15 @@ class Piece:
         color = PieceColor(data["color"])
         piece_type = PieceType.KING if data["king"] else PieceType.REGULAR
         return cls(color=color, type=piece_type)
+
+
+_PIECES: Dict[Tuple[PieceColor, PieceType], Piece] = {
+    (color, piece_type): Piece._create(color, piece_type)
+    for color in PieceColor
+    for piece_type in PieceType
+}
+
+WHITE_MAN = Piece(PieceColor.WHITE)
+WHITE_KING = Piece(PieceColor.WHITE, PieceType.KING)
+BLACK_MAN = Piece(PieceColor.BLACK)
+BLACK_KING = Piece(PieceColor.BLACK, PieceType.KING)
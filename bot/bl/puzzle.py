@@ -0,0 +1,184 @@
+"""Tactical puzzles mined from finished games.
+
+Every position where a turn starts is searched to a fixed budget. It
+becomes a puzzle when the best turn wins clearly more than the position
+seems to be worth, e.g. a multi-capture or a sacrifice that wins
+material back with interest, and every other turn falls well short of
+it, so the puzzle has one answer. The difficulty grows with the depth a
+search needs to find the answer, and by one when the answer is a quiet
+move rather than a capture.
+"""
+import struct
+from typing import List, NamedTuple, Sequence
+
+from bot.bl.board import Board
+from bot.bl.engine import Budget, Search, TranspositionTable, evaluate
+from bot.bl.history import MoveRecord, record_move, split_turns
+from bot.bl.move import Move
+from bot.bl.piece import PieceColor
+from bot.bl.variant import get_variant
+
+BUDGET = Budget(max_depth=6, seconds=5.0, nodes=20_000, noise=0)
+
+# Centipawns the best turn must win over the static evaluation
+MIN_GAIN = 180
+# ... and over every other turn
+MIN_MARGIN = 120
+# Endings with fewer pieces are left to the tablebases
+MIN_PIECES = 6
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+# Scores are stored as int32; won positions saturate
+SCORE_LIMIT = 30_000
+
+_CODE = struct.Struct('<Q')
+
+
+class PuzzleCandidate(NamedTuple):
+    # Stored moves played before the position
+    move_number: int
+    board_data: bytes
+    solution: bytes
+    difficulty: int
+    gain: int
+
+
+def pack_solution(turn: Sequence[Move]) -> bytes:
+    return b''.join(_CODE.pack(move.code) for move in turn)
+
+
+def unpack_solution(data: bytes, board: Board) -> List[Move]:
+    return [
+        Move.from_code(code, board.geometry)
+        for code, in _CODE.iter_unpack(data)
+    ]
+
+
+def turn_captures(turn: Sequence[Move]) -> int:
+    """Mask of the pieces a turn takes; it tells apart capture routes
+    between the same two squares."""
+    mask = 0
+    for move in turn:
+        mask |= move.captured_mask
+    return mask
+
+
+def turn_notation(turn: Sequence[Move]) -> str:
+    if not turn[0].is_capture:
+        return f"{turn[0].from_pos}-{turn[0].to_pos}"
+    return ":".join([turn[0].from_pos, *(move.to_pos for move in turn)])
+
+
+def _opponent(color: PieceColor) -> PieceColor:
+    return PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+
+
+def _codes(turn: List[Move]) -> List[int]:
+    return [move.code for move in turn]
+
+
+def _alternatives(
+    board: Board,
+    color: PieceColor,
+    turns: List[List[Move]],
+    best: List[int],
+    depth: int,
+    table: TranspositionTable,
+) -> int:
+    """Best score of the turns other than ``best``."""
+    budget = BUDGET._replace(max_depth=max(1, depth - 1))
+    score = -SCORE_LIMIT
+    for turn in turns:
+        if _codes(turn) == best:
+            continue
+        tokens = [board.make_move(move) for move in turn]
+        try:
+            reply = Search(board, budget, table).run(_opponent(color))
+        finally:
+            for token in reversed(tokens):
+                board.unmake_move(token)
+        score = max(score, -reply.score)
+    return score
+
+
+def _difficulty(
+    board: Board, color: PieceColor, best: List[int], target: int
+) -> int:
+    # A table of its own, or deeper results would leak into the probes
+    table = TranspositionTable(12)
+    for depth in range(1, BUDGET.max_depth + 1):
+        result = Search(
+            board, BUDGET._replace(max_depth=depth), table
+        ).run(color)
+        if result.codes == best and result.score >= target:
+            break
+    quiet = not Move.from_code(best[0], board.geometry).is_capture
+    return max(
+        MIN_DIFFICULTY, min(MAX_DIFFICULTY, (depth + 1) // 2 + quiet)
+    )
+
+
+def find_puzzle(board: Board, color: PieceColor) -> PuzzleCandidate | None:
+    """The puzzle in the position with ``color`` to move, if it is one.
+
+    The move number of the result is left at zero for the caller.
+    """
+    if board.white_count + board.black_count < MIN_PIECES:
+        return None
+    turns = board.get_turns(color)
+    if len(turns) < 2:
+        return None
+
+    table = TranspositionTable(16)
+    static = evaluate(board, color)
+    result = Search(board, BUDGET, table).run(color)
+    gain = result.score - static
+    if gain < MIN_GAIN:
+        return None
+    if result.score - _alternatives(
+        board, color, turns, result.codes, result.depth, table
+    ) < MIN_MARGIN:
+        return None
+
+    solution = [Move.from_code(code, board.geometry) for code in result.codes]
+    return PuzzleCandidate(
+        move_number=0,
+        board_data=board.to_bytes(color),
+        solution=pack_solution(solution),
+        difficulty=_difficulty(board, color, result.codes, static + MIN_GAIN),
+        gain=min(gain, SCORE_LIMIT),
+    )
+
+
+def mine_game(
+    variant: str, records: Sequence[MoveRecord]
+) -> List[PuzzleCandidate]:
+    """Puzzles found in one game, in move order.
+
+    Takes plain values so it can run in a worker process.
+    """
+    board = Board(get_variant(variant))
+    color = PieceColor.WHITE
+    puzzles: List[PuzzleCandidate] = []
+    move_number = 0
+    # A combination is still on the board a turn later while it plays
+    # out, so the side that had one is not searched again right away
+    skip: PieceColor | None = None
+
+    for turn in split_turns(records):
+        if color == skip:
+            skip = None
+        else:
+            puzzle = find_puzzle(board, color)
+            if puzzle is not None:
+                puzzles.append(puzzle._replace(move_number=move_number))
+                skip = color
+
+        for record in turn:
+            board.execute_move(record_move(record, board.geometry))
+        move_number += len(turn)
+        color = _opponent(color)
+
+    return puzzles
@@ -0,0 +1,107 @@
+"""Opening repertoire: how each player scores with the openings they play.
+
+An opening is the first turns of a game in move notation, e.g.
+``c3-d4 f6-g5``. A finished game adds its result, for each of its
+players, to every prefix of up to ``MAX_TURNS`` turns, so a player's
+repertoire is read from a few precomputed rows and never from their
+games.
+"""
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from bot.bl.history import MoveRecord, split_turns
+from bot.bl.piece import PieceColor
+from bot.bl.variant import VariantName
+
+MAX_TURNS = 4
+DEFAULT_TURNS = 2
+
+
+class Score(NamedTuple):
+    wins: int
+    draws: int
+    losses: int
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+
+class OpeningKey(NamedTuple):
+    user_id: int
+    color: PieceColor
+    variant: VariantName
+    turns: int
+    opening: str
+
+
+def turn_notation(turn: Sequence[MoveRecord]) -> str:
+    """``c3-d4`` for a move, ``c3:e5:g3`` for a capture sequence."""
+    if not turn[0][2]:
+        return f'{turn[0][0]}-{turn[0][1]}'
+    return ':'.join([turn[0][0], *(record[1] for record in turn)])
+
+
+def openings(records: Sequence[MoveRecord]) -> List[str]:
+    """The game's first turn, first two turns and so on up to MAX_TURNS."""
+    prefixes: List[str] = []
+    for turn in split_turns(records)[:MAX_TURNS]:
+        notation = turn_notation(turn)
+        prefixes.append(
+            f'{prefixes[-1]} {notation}' if prefixes else notation
+        )
+    return prefixes
+
+
+def game_scores(
+    variant: VariantName,
+    records: Sequence[MoveRecord],
+    players: Sequence[Tuple[int, PieceColor]],
+    winner: PieceColor | None,
+) -> Dict[OpeningKey, Score]:
+    """What one game adds to the repertoire of each of ``players``."""
+    scores: Dict[OpeningKey, Score] = {}
+    lines = openings(records)
+    for user_id, color in players:
+        score = (
+            Score(0, 1, 0) if winner is None
+            else Score(1, 0, 0) if winner == color
+            else Score(0, 0, 1)
+        )
+        for turns, opening in enumerate(lines, start=1):
+            key = OpeningKey(user_id, color, variant, turns, opening)
+            scores[key] = score
+    return scores
+
+
+def add_scores(
+    total: Dict[OpeningKey, Score], game: Dict[OpeningKey, Score]
+) -> None:
+    for key, score in game.items():
+        known = total.get(key)
+        total[key] = score if known is None else Score(
+            known.wins + score.wins,
+            known.draws + score.draws,
+            known.losses + score.losses,
+        )
+
+
+def game_players(
+    white_id: int, black_id: int | None, bot_game: bool
+) -> List[Tuple[int, PieceColor]]:
+    """Players whose repertoire a game counts for; the engine has none."""
+    players = [(white_id, PieceColor.WHITE)]
+    if black_id is not None and not bot_game:
+        players.append((black_id, PieceColor.BLACK))
+    return players
+
+
+def game_winner(
+    winner_id: int | None, white_id: int, black_id: int | None
+) -> PieceColor | None:
+    if winner_id is None:
+        return None
+    if winner_id == white_id:
+        return PieceColor.WHITE
+    if winner_id == black_id:
+        return PieceColor.BLACK
+    return None
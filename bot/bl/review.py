@@ -0,0 +1,105 @@
+"""Engine review of finished games.
+
+Every position where a turn starts is searched to a fixed budget. A turn
+is flagged when it scores much worse for its player than the best turn
+the engine found, and each stored move gets the evaluation, from white's
+side, of the position its turn led to. Reviews are packed into three
+bytes per move so a whole game fits in one small row.
+"""
+import struct
+from enum import IntEnum
+from typing import List, NamedTuple, Sequence, Tuple
+
+from bot.bl.board import Board
+from bot.bl.engine import Budget, Search, TranspositionTable
+from bot.bl.history import MoveRecord, record_move, split_turns
+from bot.bl.piece import PieceColor
+from bot.bl.variant import get_variant
+
+# Bump when the budget or the thresholds change, so old reviews are redone
+REVIEW_VERSION = 1
+
+BUDGET = Budget(max_depth=6, seconds=5.0, nodes=20_000, noise=0)
+
+# Centipawns lost against the engine's best turn
+MISTAKE = 60
+BLUNDER = 150
+
+# Scores are stored as int16; won and lost positions saturate
+SCORE_LIMIT = 30_000
+
+_RECORD = struct.Struct('<hB')
+
+
+class Annotation(IntEnum):
+    NONE = 0
+    MISTAKE = 1
+    BLUNDER = 2
+
+
+class MoveReview(NamedTuple):
+    score: int
+    annotation: Annotation
+
+
+def _annotate(loss: int) -> Annotation:
+    if loss >= BLUNDER:
+        return Annotation.BLUNDER
+    if loss >= MISTAKE:
+        return Annotation.MISTAKE
+    return Annotation.NONE
+
+
+def review_game(variant: str, records: Sequence[MoveRecord]) -> bytes:
+    """Review one game and return the packed per-move results.
+
+    Takes plain values so it can run in a worker process.
+    """
+    board = Board(get_variant(variant))
+    table = TranspositionTable(16)
+    color = PieceColor.WHITE
+
+    def search() -> Tuple[int, int]:
+        # Score for the side to move and the number of turns it had
+        result = Search(board, BUDGET, table).run(color)
+        return result.score, len(board.get_turns(color))
+
+    best, choices = search()
+    reviews: List[MoveReview] = []
+    for turn in split_turns(records):
+        for record in turn:
+            board.execute_move(record_move(record, board.geometry))
+
+        mover = color
+        color = (
+            PieceColor.BLACK if color == PieceColor.WHITE
+            else PieceColor.WHITE
+        )
+        reply, reply_choices = search()
+        played = -reply
+        white_score = played if mover == PieceColor.WHITE else reply
+        annotation = (
+            _annotate(best - played) if choices > 1 else Annotation.NONE
+        )
+
+        score = max(-SCORE_LIMIT, min(SCORE_LIMIT, white_score))
+        reviews.extend(
+            MoveReview(score, Annotation.NONE) for _ in turn[:-1]
+        )
+        reviews.append(MoveReview(score, annotation))
+        best, choices = reply, reply_choices
+
+    return pack(reviews)
+
+
+def pack(reviews: Sequence[MoveReview]) -> bytes:
+    return b''.join(
+        _RECORD.pack(review.score, review.annotation) for review in reviews
+    )
+
+
+def unpack(data: bytes) -> List[MoveReview]:
+    return [
+        MoveReview(score, Annotation(annotation))
+        for score, annotation in _RECORD.iter_unpack(data)
+    ]
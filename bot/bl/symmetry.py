@@ -0,0 +1,81 @@
+"""Colour-swap symmetry of positions.
+
+Swapping the colours and turning the board by 180 degrees gives an
+equivalent position: square ``i`` becomes ``n - 1 - i`` on a board of
+``n`` playable squares, each man keeps
+moving towards the row it promotes on and the other side is to move.
+Of every such pair exactly one position has white to move, and that one
+is canonical, so position-keyed data can be shared between the two.
+"""
+from enum import StrEnum, auto
+from typing import Tuple
+
+from bot.bl import move as move_codes
+from bot.bl.bitboard import STANDARD, Geometry
+from bot.bl.move import Move
+from bot.bl.piece import PieceColor
+
+
+class Transform(StrEnum):
+    """How a position maps onto its canonical form.
+
+    Each transform is its own inverse: applying it to anything taken from
+    the canonical position gives back the original.
+    """
+    IDENTITY = auto()
+    SWAP = auto()
+
+    @classmethod
+    def for_turn(cls, turn: PieceColor) -> 'Transform':
+        return cls.SWAP if turn == PieceColor.BLACK else cls.IDENTITY
+
+    def square(self, sq: int, geometry: Geometry = STANDARD) -> int:
+        if self is Transform.IDENTITY:
+            return sq
+        return geometry.square_count - 1 - sq
+
+    def pos(self, pos: str, geometry: Geometry = STANDARD) -> str:
+        if self is Transform.IDENTITY:
+            return pos
+        last = geometry.square_count - 1
+        return geometry.positions[last - geometry.square_index[pos]]
+
+    def color(self, color: PieceColor) -> PieceColor:
+        if self is Transform.IDENTITY:
+            return color
+        if color == PieceColor.WHITE:
+            return PieceColor.BLACK
+        return PieceColor.WHITE
+
+    def masks(
+        self,
+        white: int,
+        black: int,
+        kings: int,
+        geometry: Geometry = STANDARD
+    ) -> Tuple[int, int, int]:
+        """Return the transformed white, black and king masks."""
+        if self is Transform.IDENTITY:
+            return white, black, kings
+        rotate = geometry.rotate
+        return rotate(black), rotate(white), rotate(kings)
+
+    def code(self, code: int, geometry: Geometry = STANDARD) -> int:
+        if self is Transform.IDENTITY:
+            return code
+        last = geometry.square_count - 1
+        from_sq = code & move_codes.SQUARE_MASK
+        to_sq = code >> move_codes.TO_SHIFT & move_codes.SQUARE_MASK
+        flags = code & (move_codes.CAPTURE_FLAG | move_codes.PROMOTED_FLAG)
+        captured = geometry.rotate(code >> move_codes.CAPTURED_SHIFT)
+        return (
+            last - from_sq
+            | (last - to_sq) << move_codes.TO_SHIFT
+            | flags
+            | captured << move_codes.CAPTURED_SHIFT
+        )
+
+    def move(self, move: Move) -> Move:
+        return Move.from_code(
+            self.code(move.code, move.geometry), move.geometry
+        )
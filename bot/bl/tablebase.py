@@ -0,0 +1,317 @@
+"""Endgame tablebases: the exact result of every position with few pieces.
+
+A tablebase file covers one variant and every material signature, the
+number of men and kings of each side, up to a number of pieces. Only
+positions with white to move are stored; a position with black to move
+is looked up through its colour-swapped twin (see ``bot.bl.symmetry``).
+Each position takes one byte: 0 for a draw, otherwise the number of turns
+to the end of the game plus one. An odd number of turns means the side
+to move wins, an even one that it loses.
+
+Files are built by ``bot.jobs.tablebase`` and memory-mapped, so a probe
+is an index calculation and a single byte read. The results follow the
+rules as ``Board.get_turns`` plays them and know nothing of move-count
+draw rules.
+"""
+import logging
+import mmap
+import os
+import struct
+from enum import IntEnum
+from itertools import combinations
+from math import comb
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+from bot.bl.bitboard import Geometry
+from bot.bl.board import Board
+from bot.bl.piece import PieceColor
+from bot.bl.symmetry import Transform
+from bot.bl.variant import Variant, VariantName, get_variant
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'CKTB'
+FORMAT_VERSION = 1
+
+# magic, format version, variant name, pieces, slice count
+_HEADER = struct.Struct('<4sH16sBH')
+# white men, white kings, black men, black kings, offset of the slice
+_ENTRY = struct.Struct('<4BQ')
+
+DRAW = 0
+MAX_DISTANCE = 254
+
+# white men, white kings, black men, black kings
+Signature = Tuple[int, int, int, int]
+
+
+class Outcome(IntEnum):
+    LOSS = -1
+    DRAW = 0
+    WIN = 1
+
+
+class Probe(NamedTuple):
+    """Result for the side to move and the turns left to the end."""
+    outcome: Outcome
+    distance: int
+
+
+def decode(value: int) -> Probe:
+    if value == DRAW:
+        return Probe(Outcome.DRAW, 0)
+    distance = value - 1
+    return Probe(Outcome.WIN if distance % 2 else Outcome.LOSS, distance)
+
+
+def swapped(signature: Signature) -> Signature:
+    white_men, white_kings, black_men, black_kings = signature
+    return black_men, black_kings, white_men, white_kings
+
+
+def signature_of(white: int, black: int, kings: int) -> Signature:
+    return (
+        (white & ~kings).bit_count(), (white & kings).bit_count(),
+        (black & ~kings).bit_count(), (black & kings).bit_count(),
+    )
+
+
+def signatures(pieces: int) -> Iterator[Signature]:
+    """Every signature with both sides on the board and ``pieces`` at most.
+
+    Captures lead to fewer pieces and promotions to fewer men, so a
+    signature only ever leads to ones before it, or to its swapped twin.
+    """
+    found: List[Signature] = []
+    for white in range(1, pieces):
+        for black in range(1, pieces - white + 1):
+            for white_men in range(white + 1):
+                for black_men in range(black + 1):
+                    found.append((
+                        white_men, white - white_men,
+                        black_men, black - black_men,
+                    ))
+    yield from sorted(
+        found, key=lambda s: (sum(s), s[0] + s[2], min(s, swapped(s)), s)
+    )
+
+
+def _rank(mask: int) -> int:
+    # Colexicographic rank among the subsets with as many bits
+    rank = count = 0
+    while mask:
+        low = mask & -mask
+        count += 1
+        rank += comb(low.bit_length() - 1, count)
+        mask ^= low
+    return rank
+
+
+class Layout:
+    """Where each position of a signature sits in its slice.
+
+    Men never stand on the row they promote on, so the men of each side
+    are ranked among the other squares; kings are ranked among all of
+    them. The four ranks are combined like digits. Positions with two
+    pieces on one square keep their (unused) slot, which keeps the
+    index a few multiplications.
+    """
+
+    __slots__ = ('signature', 'shift', 'radices', 'size')
+
+    def __init__(self, geometry: Geometry, signature: Signature) -> None:
+        white_men, white_kings, black_men, black_kings = signature
+        squares = geometry.square_count
+        # Black men are ranked from the first square past black's last row
+        self.shift = geometry.size // 2
+        men_squares = squares - self.shift
+        self.signature = signature
+        self.radices = (
+            comb(men_squares, white_men), comb(men_squares, black_men),
+            comb(squares, white_kings), comb(squares, black_kings),
+        )
+        self.size = 1
+        for radix in self.radices:
+            self.size *= radix
+
+    def index(self, white: int, black: int, kings: int) -> int:
+        _, black_men, white_kings, black_kings = self.radices
+        return (
+            (
+                _rank(white & ~kings) * black_men
+                + _rank((black & ~kings) >> self.shift)
+            ) * white_kings
+            + _rank(white & kings)
+        ) * black_kings + _rank(black & kings)
+
+    def masks(
+        self, index: int, subsets: 'Subsets'
+    ) -> Tuple[int, int, int] | None:
+        """Masks of the position at ``index``, None for an unused slot."""
+        white_men, white_kings, black_men, black_kings = self.signature
+        _, black_radix, white_king_radix, black_king_radix = self.radices
+        index, black_kings_rank = divmod(index, black_king_radix)
+        index, white_kings_rank = divmod(index, white_king_radix)
+        white_men_rank, black_men_rank = divmod(index, black_radix)
+
+        pieces = (
+            subsets.men(white_men)[white_men_rank],
+            subsets.men(black_men)[black_men_rank] << self.shift,
+            subsets.kings(white_kings)[white_kings_rank],
+            subsets.kings(black_kings)[black_kings_rank],
+        )
+        occupied = 0
+        for mask in pieces:
+            if occupied & mask:
+                return None
+            occupied |= mask
+        white_men_mask, black_men_mask, white_kings_mask, black_kings_mask = (
+            pieces
+        )
+        return (
+            white_men_mask | white_kings_mask,
+            black_men_mask | black_kings_mask,
+            white_kings_mask | black_kings_mask,
+        )
+
+
+class Subsets:
+    """Masks of every subset of the men's and kings' squares, by rank."""
+
+    def __init__(self, geometry: Geometry) -> None:
+        self.squares = geometry.square_count
+        self.men_squares = self.squares - geometry.size // 2
+        self._cache: Dict[Tuple[int, int], List[int]] = {}
+
+    def _subsets(self, squares: int, count: int) -> List[int]:
+        key = (squares, count)
+        if key not in self._cache:
+            masks = [0] * comb(squares, count)
+            for chosen in combinations(range(squares), count):
+                mask = sum(1 << sq for sq in chosen)
+                masks[_rank(mask)] = mask
+            self._cache[key] = masks
+        return self._cache[key]
+
+    def men(self, count: int) -> List[int]:
+        return self._subsets(self.men_squares, count)
+
+    def kings(self, count: int) -> List[int]:
+        return self._subsets(self.squares, count)
+
+
+def file_name(variant: VariantName) -> str:
+    return f'{variant}.tb'
+
+
+def write(
+    path: str,
+    variant: Variant,
+    pieces: int,
+    slices: Dict[Signature, bytes],
+) -> None:
+    """Write the slices of one variant to ``path``."""
+    directory_size = _HEADER.size + _ENTRY.size * len(slices)
+    entries = []
+    offset = directory_size
+    for signature, data in slices.items():
+        entries.append(_ENTRY.pack(*signature, offset))
+        offset += len(data)
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(_HEADER.pack(
+            MAGIC, FORMAT_VERSION, variant.name.encode(), pieces, len(slices)
+        ))
+        file.writelines(entries)
+        file.writelines(slices.values())
+    os.replace(temporary, path)
+
+
+class Tablebase:
+    """A memory-mapped tablebase file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, name, self.pieces, count = _HEADER.unpack_from(
+            self._data
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._data.close()
+            raise ValueError(f'{path} is not a version {FORMAT_VERSION} '
+                             'tablebase')
+
+        self.variant = get_variant(name.rstrip(b'\0').decode())
+        geometry = self.variant.geometry
+        self._slices: Dict[Signature, Tuple[Layout, int]] = {}
+        for number in range(count):
+            white_men, white_kings, black_men, black_kings, offset = (
+                _ENTRY.unpack_from(
+                    self._data, _HEADER.size + _ENTRY.size * number
+                )
+            )
+            signature = (white_men, white_kings, black_men, black_kings)
+            self._slices[signature] = (Layout(geometry, signature), offset)
+
+    def close(self) -> None:
+        self._data.close()
+
+    def probe(self, board: Board, turn: PieceColor) -> Probe | None:
+        """Result of the position for ``turn``, None if it is not covered."""
+        if board.white_count + board.black_count > self.pieces:
+            return None
+
+        white, black, kings = Transform.for_turn(turn).masks(
+            board.white, board.black, board.kings, board.geometry
+        )
+        found = self._slices.get(signature_of(white, black, kings))
+        if found is None:
+            return None
+        layout, offset = found
+        return decode(self._data[offset + layout.index(white, black, kings)])
+
+
+_tables: Dict[VariantName, Tablebase] = {}
+
+
+def load(directory: str) -> None:
+    """Map the tablebase of every variant found in ``directory``."""
+    for name in VariantName:
+        path = os.path.join(directory, file_name(name))
+        if not os.path.exists(path):
+            continue
+        table = Tablebase(path)
+        old = _tables.pop(name, None)
+        if old is not None:
+            old.close()
+        _tables[name] = table
+        log.info('Tablebase for %s: up to %d pieces', name, table.pieces)
+
+
+def probe(board: Board, turn: PieceColor) -> Probe | None:
+    table = _tables.get(board.variant.name)
+    if table is None:
+        return None
+    return table.probe(board, turn)
+
+
+def adjudicate(
+    board: Board, turn: PieceColor
+) -> Tuple[bool, PieceColor | None]:
+    """Like ``Board.is_game_over``, but ends every decided position.
+
+    Positions the tablebase covers are over right away: won for the side
+    that wins with best play, drawn when neither side can force a win.
+    """
+    result = probe(board, turn)
+    if result is None:
+        return False, None
+    if result.outcome == Outcome.DRAW:
+        return True, None
+    if result.outcome == Outcome.WIN:
+        return True, turn
+    return True, (
+        PieceColor.BLACK if turn == PieceColor.WHITE else PieceColor.WHITE
+    )
@@ -1,4 +1,9 @@
-from bot.db.models import User
+from typing import List
+
+from sqlalchemy import desc, select
+
+from bot.db.models import OpeningStat, User
+from bot.db.models.game import PlayerColor
 from bot.db.session import s
 
 
@@ -43,3 +48,22 @@ async def get_user_stats(user_id: int) -> dict:
         "losses": user.losses,
         "win_rate": win_rate
     }
+
+
+async def get_openings(
+    user_id: int, color: PlayerColor, turns: int, limit: int = 3
+) -> List[OpeningStat]:
+    """A player's most played openings of ``turns`` turns with a color."""
+    result = await s.session.execute(
+        select(OpeningStat)
+        .where(
+            OpeningStat.user_id == user_id,
+            OpeningStat.color == color,
+            OpeningStat.turns == turns,
+        )
+        .order_by(desc(
+            OpeningStat.wins + OpeningStat.draws + OpeningStat.losses
+        ))
+        .limit(limit)
+    )
+    return list(result.scalars().all())
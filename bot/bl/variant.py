@@ -0,0 +1,106 @@
+"""Rule variants and the tables each of them is played with."""
+from enum import StrEnum, auto
+from typing import Dict, Tuple
+
+from bot.bl import zobrist
+from bot.bl.bitboard import (
+    BLACK_FORWARD,
+    INTERNATIONAL,
+    STANDARD,
+    WHITE_FORWARD,
+    Geometry,
+)
+
+
+class VariantName(StrEnum):
+    RUSSIAN = auto()
+    BRAZILIAN = auto()
+    INTERNATIONAL = auto()
+    ENGLISH = auto()
+
+
+class CapturePromotion(StrEnum):
+    """What a man reaching the last row in the middle of a capture does."""
+    CONTINUE_AS_KING = auto()
+    CONTINUE_AS_MAN = auto()
+    STOP = auto()
+
+
+_ALL_DIRECTIONS = (0, 1, 2, 3)
+
+
+class Variant:
+    """Board geometry plus the rules that differ between variants.
+
+    ``majority_capture`` obliges the side to move to take the sequence
+    that captures the most pieces; otherwise any capture may be chosen.
+    """
+
+    __slots__ = (
+        'name', 'geometry', 'flying_kings', 'men_capture_backward',
+        'majority_capture', 'capture_promotion', 'hash_key',
+        '_men_captures',
+    )
+
+    def __init__(
+        self,
+        name: VariantName,
+        geometry: Geometry,
+        flying_kings: bool = True,
+        men_capture_backward: bool = True,
+        majority_capture: bool = False,
+        capture_promotion: CapturePromotion = (
+            CapturePromotion.CONTINUE_AS_KING
+        )
+    ) -> None:
+        self.name = name
+        self.geometry = geometry
+        self.flying_kings = flying_kings
+        self.men_capture_backward = men_capture_backward
+        self.majority_capture = majority_capture
+        self.capture_promotion = capture_promotion
+        # Russian keeps a zero key, so its hashes match the plain position
+        self.hash_key = (
+            0 if name == VariantName.RUSSIAN else zobrist.variant_key(name)
+        )
+        self._men_captures: Tuple[Tuple[int, ...], Tuple[int, ...]] = (
+            (_ALL_DIRECTIONS, _ALL_DIRECTIONS) if men_capture_backward
+            else (WHITE_FORWARD, BLACK_FORWARD)
+        )
+
+    def __repr__(self) -> str:
+        return f'Variant({self.name!r})'
+
+    def __reduce__(self) -> Tuple[object, Tuple[VariantName]]:
+        return get_variant, (self.name,)
+
+    def men_capture_directions(self, white: bool) -> Tuple[int, ...]:
+        return self._men_captures[0 if white else 1]
+
+
+RUSSIAN = Variant(VariantName.RUSSIAN, STANDARD)
+BRAZILIAN = Variant(
+    VariantName.BRAZILIAN, STANDARD,
+    majority_capture=True,
+    capture_promotion=CapturePromotion.CONTINUE_AS_MAN,
+)
+INTERNATIONAL_10X10 = Variant(
+    VariantName.INTERNATIONAL, INTERNATIONAL,
+    majority_capture=True,
+    capture_promotion=CapturePromotion.CONTINUE_AS_MAN,
+)
+ENGLISH = Variant(
+    VariantName.ENGLISH, STANDARD,
+    flying_kings=False,
+    men_capture_backward=False,
+    capture_promotion=CapturePromotion.STOP,
+)
+
+VARIANTS: Dict[VariantName, Variant] = {
+    variant.name: variant
+    for variant in (RUSSIAN, BRAZILIAN, INTERNATIONAL_10X10, ENGLISH)
+}
+
+
+def get_variant(name: str) -> Variant:
+    return VARIANTS[VariantName(name)]
@@ -0,0 +1,172 @@
+"""Win probability of a position from a small logistic regression.
+
+A position is described from white's side by a handful of features:
+the difference in men, in kings, in legal moves and in how far the men
+have advanced, and which side is to move. One weight vector per variant
+turns them into the probability that white wins, a draw counting half.
+The weights are fitted offline by ``bot.jobs.winprob`` from finished
+games.
+
+The bot asks for one position per move. Requests made while the event
+loop runs one batch of callbacks are answered together by a single
+matrix product when the loop gets to the flush it scheduled, so the
+model costs the features and a share of one NumPy call per move.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from bot.bl.board import Board
+from bot.bl.piece import PieceColor
+from bot.bl.variant import VARIANTS, Variant, VariantName
+
+log = logging.getLogger(__name__)
+
+FEATURES = ('men', 'kings', 'mobility', 'advance', 'to_move')
+
+# Ridge penalty of the fit, keeps rare features from running away
+L2 = 1e-3
+ITERATIONS = 25
+
+
+def _rank_masks(variant: Variant) -> Tuple[Tuple[int, ...], ...]:
+    # Squares of each rank counted from white's back row
+    geometry = variant.geometry
+    rows = [0] * geometry.size
+    for sq, (_, row) in enumerate(geometry.square_coords):
+        rows[row] |= 1 << sq
+    return tuple(rows), tuple(reversed(rows))
+
+
+_RANKS = {variant: _rank_masks(variant) for variant in VARIANTS.values()}
+
+
+def _mobility(board: Board, color: PieceColor) -> int:
+    return sum(len(moves) for moves in board.analysis.moves(color).values())
+
+
+def features(board: Board, turn: PieceColor) -> Tuple[float, ...]:
+    """Feature row of the position with ``turn`` to move, as in FEATURES."""
+    white, black, kings = board.white, board.black, board.kings
+    white_men = white & ~kings
+    black_men = black & ~kings
+    white_ranks, black_ranks = _RANKS[board.variant]
+    advance = sum(
+        rank * (
+            (white_men & white_ranks[rank]).bit_count()
+            - (black_men & black_ranks[rank]).bit_count()
+        )
+        for rank in range(1, len(white_ranks) - 1)
+    )
+    return (
+        white_men.bit_count() - black_men.bit_count(),
+        (white & kings).bit_count() - (black & kings).bit_count(),
+        _mobility(board, PieceColor.WHITE)
+        - _mobility(board, PieceColor.BLACK),
+        advance,
+        1.0 if turn == PieceColor.WHITE else -1.0,
+    )
+
+
+def predict(weights: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Probability that white wins for each feature row."""
+    logits = rows @ weights[1:] + weights[0]
+    return 1.0 / (1.0 + np.exp(-logits))
+
+
+def fit(rows: np.ndarray, results: np.ndarray) -> np.ndarray:
+    """Weights, bias first, fitted by Newton's method.
+
+    ``results`` are 1 for a white win, 0 for a black win and 0.5 for a
+    draw.
+    """
+    x = np.hstack([np.ones((len(rows), 1)), rows.astype(np.float64)])
+    weights = np.zeros(x.shape[1])
+    penalty = L2 * len(x) * np.eye(x.shape[1])
+    penalty[0, 0] = 0
+    for _ in range(ITERATIONS):
+        p = 1.0 / (1.0 + np.exp(-(x @ weights)))
+        gradient = x.T @ (p - results) + penalty @ weights
+        hessian = (x.T * (p * (1 - p))) @ x + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    return weights
+
+
+def save(path: str, models: Dict[VariantName, np.ndarray]) -> None:
+    """Write the weights of every variant to one ``.npz`` file."""
+    arrays: Dict[str, Any] = {
+        str(name): weights for name, weights in models.items()
+    }
+    np.savez(path, features=np.array(FEATURES), **arrays)
+
+
+_models: Dict[VariantName, np.ndarray] = {}
+
+
+def load(path: str) -> None:
+    """Take the weights of every variant found in ``path``."""
+    if not os.path.exists(path):
+        log.warning('No win probability model at %s', path)
+        return
+    with np.load(path) as data:
+        if tuple(data['features']) != FEATURES:
+            raise ValueError(f'{path} was fitted on other features')
+        for name in VariantName:
+            if name in data:
+                _models[name] = data[name]
+                log.info('Win probability model for %s', name)
+
+
+def has_model(variant: VariantName) -> bool:
+    return variant in _models
+
+
+_pending: List[
+    Tuple[VariantName, Tuple[float, ...], asyncio.Future[float | None]]
+] = []
+
+
+def _flush() -> None:
+    pending = _pending[:]
+    _pending.clear()
+
+    by_variant: Dict[VariantName, List[int]] = {}
+    for index, (variant, _, _) in enumerate(pending):
+        by_variant.setdefault(variant, []).append(index)
+    for variant, indexes in by_variant.items():
+        probabilities: List[float | None]
+        try:
+            rows = np.array(
+                [pending[i][1] for i in indexes], dtype=np.float64
+            )
+            probabilities = [
+                float(p) for p in predict(_models[variant], rows)
+            ]
+        except Exception:
+            # The bar is optional; a broken model must not hold up moves
+            log.exception('Win probability failed for %s', variant)
+            probabilities = [None] * len(indexes)
+        for i, probability in zip(indexes, probabilities):
+            future = pending[i][2]
+            if not future.done():
+                future.set_result(probability)
+
+
+async def white_win_probability(
+    board: Board, turn: PieceColor
+) -> float | None:
+    """Chance that white wins, None without a working model for it."""
+    if board.variant.name not in _models:
+        return None
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[float | None] = loop.create_future()
+    if not _pending:
+        loop.call_soon(_flush)
+    _pending.append((board.variant.name, features(board, turn), future))
+    return await future
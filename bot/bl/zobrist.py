@@ -0,0 +1,38 @@
+"""64-bit Zobrist keys for board positions.
+
+The keys come from a fixed seed, so a position hashes to the same value in
+every process and across restarts.
+"""
+import random
+from typing import Tuple
+
+from bot.bl.bitboard import INTERNATIONAL, iter_bits
+
+_SEED = 0x636865636B657273
+
+_rng = random.Random(_SEED)
+
+# PIECE_KEYS[sq][kind], kind as in Board material slots:
+# white man, white king, black man, black king. Sized for the largest
+# board; smaller boards use the leading squares.
+PIECE_KEYS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_rng.getrandbits(64) for _ in range(4))
+    for _ in range(INTERNATIONAL.square_count)
+)
+
+BLACK_TO_MOVE: int = _rng.getrandbits(64)
+
+
+def variant_key(name: str) -> int:
+    """Key mixed into hashes so equal masks of two variants differ."""
+    return random.Random(f'{_SEED}:{name}').getrandbits(64)
+
+
+def compute(white: int, black: int, kings: int) -> int:
+    """Hash a position from scratch; Board keeps it updated afterwards."""
+    key = 0
+    for sq in iter_bits(white | black):
+        bit = 1 << sq
+        kind = (0 if white & bit else 2) + (1 if kings & bit else 0)
+        key ^= PIECE_KEYS[sq][kind]
+    return key
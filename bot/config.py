@@ -14,6 +14,16 @@ class Settings(BaseModel):
     updates_strategy: UpdateStrategy
     database_dns: str
     host_url: str | None = None
+    # Engine worker processes for bot games, one per CPU when unset
+    engine_workers: int | None = None
+    # Processes reviewing finished games in the background
+    review_workers: int = 1
+    # Directory with endgame tablebases built by bot.jobs.tablebase
+    tablebase_dir: str | None = None
+    # Directory with opening books built by bot.jobs.book
+    book_dir: str | None = None
+    # Win probability model fitted by bot.jobs.winprob
+    winprob_model: str | None = None
 
 
 class Config(BaseModel):
@@ -0,0 +1,181 @@
+from functools import partial
+from uuid import UUID
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery
+
+from bot.bl.analysis_board import AnalysisSession, sessions
+from bot.bl.game import get_game_with_moves
+from bot.bl.history import reconstruct_board_at_move
+from bot.bl.piece import PieceColor
+from bot.bl.variant import get_variant
+from bot.controllers.history import fork_turn
+from bot.db.models import User
+from bot.middlewares.i18n import gettext as _
+from bot.middlewares.i18n import gettext_with_locale
+from bot.utils.keyboard import create_analysis_keyboard
+
+router = Router()
+
+
+def _analysis_text(session: AnalysisSession) -> str:
+    t = partial(gettext_with_locale, locale=session.locale)
+    over, winner = session.board.is_game_over()
+    if over:
+        status = t(
+            'analysis-winner-white' if winner == PieceColor.WHITE
+            else 'analysis-winner-black'
+        )
+    else:
+        status = t(
+            'analysis-white-to-move' if session.turn == PieceColor.WHITE
+            else 'analysis-black-to-move'
+        )
+    variant = t(f'variant-{session.variant.name}')
+    return (
+        f"{t('analysis-header', variant=variant)}\n"
+        f"{t('analysis-from-move', move=session.move_number)}\n\n"
+        f"{status}"
+    )
+
+
+async def _show(callback: CallbackQuery, session: AnalysisSession) -> None:
+    keyboard = create_analysis_keyboard(
+        session.board,
+        session.id,
+        session.turn,
+        session.selected,
+        session.can_undo,
+        session.can_redo,
+        back=f"hv:{session.game_id}:{session.move_number}",
+        locale=session.locale,
+    )
+    if callback.message and hasattr(callback.message, 'edit_text'):
+        await callback.message.edit_text(
+            _analysis_text(session),
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+    elif callback.inline_message_id and callback.bot:
+        await callback.bot.edit_message_text(
+            text=_analysis_text(session),
+            inline_message_id=callback.inline_message_id,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+
+
+@router.callback_query(F.data.startswith("hfork:"))
+async def handle_fork(callback: CallbackQuery, user: User) -> None:
+    if not callback.data:
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    parts = callback.data.split(":")
+    try:
+        game_id = UUID(parts[1])
+        target_move = int(parts[2])
+    except (ValueError, IndexError):
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    game = await get_game_with_moves(game_id)
+    if not game:
+        await callback.answer(_('notif-game-not-found'))
+        return
+
+    if user.id not in [game.white_player_id, game.black_player_id]:
+        await callback.answer(_('notif-not-in-game'))
+        return
+
+    variant = get_variant(game.variant)
+    board = reconstruct_board_at_move(game.moves or [], target_move, variant)
+    turn = fork_turn(game, board, target_move)
+    if turn is None:
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    session = AnalysisSession(
+        variant, game.id, target_move, board, turn, game.locale
+    )
+    sessions.put(user.id, session)
+    await _show(callback, session)
+    await callback.answer()
+
+
+def _session(
+    callback: CallbackQuery, user: User
+) -> AnalysisSession | None:
+    parts = (callback.data or "").split(":")
+    if len(parts) < 2:
+        return None
+    return sessions.get(user.id, parts[1])
+
+
+@router.callback_query(F.data.startswith("ans:"))
+async def handle_analysis_select(callback: CallbackQuery, user: User) -> None:
+    session = _session(callback, user)
+    if session is None:
+        await callback.answer(_('notif-analysis-expired'), show_alert=True)
+        return
+
+    position = (callback.data or "").split(":")[2]
+    if not session.turns_from(position):
+        await callback.answer(_('notif-invalid-move'))
+        return
+    session.selected = position
+    await _show(callback, session)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("and:"))
+async def handle_analysis_deselect(
+    callback: CallbackQuery, user: User
+) -> None:
+    session = _session(callback, user)
+    if session is None:
+        await callback.answer(_('notif-analysis-expired'), show_alert=True)
+        return
+
+    session.selected = None
+    await _show(callback, session)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("anm:"))
+async def handle_analysis_move(callback: CallbackQuery, user: User) -> None:
+    session = _session(callback, user)
+    if session is None:
+        await callback.answer(_('notif-analysis-expired'), show_alert=True)
+        return
+
+    from_pos, to_pos = (callback.data or "").split(":")[2].split("-")
+    if not session.play(from_pos, to_pos):
+        await callback.answer(_('notif-invalid-move'))
+        return
+    await _show(callback, session)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("anu:"))
+async def handle_analysis_undo(callback: CallbackQuery, user: User) -> None:
+    session = _session(callback, user)
+    if session is None:
+        await callback.answer(_('notif-analysis-expired'), show_alert=True)
+        return
+
+    if session.undo():
+        await _show(callback, session)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("anr:"))
+async def handle_analysis_redo(callback: CallbackQuery, user: User) -> None:
+    session = _session(callback, user)
+    if session is None:
+        await callback.answer(_('notif-analysis-expired'), show_alert=True)
+        return
+
+    if session.redo():
+        await _show(callback, session)
+    await callback.answer()
@@ -1,4 +1,5 @@
 from functools import partial
+from typing import Callable, Dict, List
 from uuid import UUID
 
 from aiogram import F, Router
@@ -11,15 +12,25 @@ from aiogram.types import User as TelegramUser
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import func, select
 
-from bot.bl.board import Board
+from bot.bl import book, tablebase, winprob
+from bot.bl.analysis import tree_moves
+from bot.bl.engine import Difficulty
 from bot.bl.game import (
     accept_game,
+    add_position,
     cancel_game,
     create_game,
     finish_game,
     get_game,
+    load_board,
+    play_bot_turn,
+    start_bot_game,
+    store_board,
 )
+from bot.bl.move import Move
 from bot.bl.piece import PieceColor
+from bot.bl.user import create_or_update_user
+from bot.bl.variant import VariantName
 from bot.db.models import Move as MoveModel
 from bot.db.models import User
 from bot.db.models.game import GameStatus, PlayerColor
@@ -39,6 +50,17 @@ def get_user_locale(telegram_user: TelegramUser | None) -> str:
 
 router = Router()
 
+# Telegram cuts alerts at 200 characters
+EXPLORER_MOVES = 3
+WIN_BAR_CELLS = 10
+
+
+def _win_bar(t: Callable[..., str], white_chance: float) -> str:
+    white = round(white_chance * 100)
+    filled = round(white_chance * WIN_BAR_CELLS)
+    bar = "▰" * filled + "▱" * (WIN_BAR_CELLS - filled)
+    return t('game-win-chance', white=white, black=100 - white, bar=bar)
+
 
 async def edit_game_message(
     callback: CallbackQuery,
@@ -78,7 +100,8 @@ async def handle_accept_game(
     if not callback.data:
         await callback.answer(_('notif-invalid-request'))
         return
-    game_id_str = callback.data.split(":")[1]
+    parts = callback.data.split(":")
+    game_id_str = parts[1]
 
     if callback.message:
         chat_id = callback.message.chat.id
@@ -91,17 +114,28 @@ async def handle_accept_game(
         return
 
     if game_id_str == "new":
+        try:
+            variant = (
+                VariantName(parts[2]) if len(parts) > 2
+                else VariantName.RUSSIAN
+            )
+        except ValueError:
+            await callback.answer(_('notif-invalid-request'))
+            return
+
         locale = get_user_locale(callback.from_user)
         game = await create_game(
             white_player_id=user.id,
             chat_id=chat_id,
             message_id=message_id,
-            locale=locale
+            locale=locale,
+            variant=variant
         )
         t = partial(gettext_with_locale, locale=locale)
 
         text = (
-            f"{t('game-header')}\n\n"
+            f"{t('game-header')}\n"
+            f"{t('game-variant', variant=t(f'variant-{variant}'))}\n\n"
             f"{t('game-white-player', name=user.first_name)}\n"
             f"{t('game-black-waiting')}\n\n"
             f"{t('game-waiting-opponent')}"
@@ -135,7 +169,7 @@ async def handle_accept_game(
         return
 
     t = partial(gettext_with_locale, locale=accepted_game.locale)
-    board = Board.from_dict(accepted_game.board_state)
+    board = load_board(accepted_game)
 
     white_name = accepted_game.white_player.first_name
     black_name = (
@@ -159,6 +193,63 @@ async def handle_accept_game(
     await callback.answer(_('notif-game-started'))
 
 
+@router.callback_query(F.data.startswith("vsbot:"))
+async def handle_play_vs_bot(
+    callback: CallbackQuery, user: User
+) -> None:
+    if not callback.data or not callback.bot:
+        await callback.answer(_('notif-invalid-request'))
+        return
+    parts = callback.data.split(":")
+
+    try:
+        game_id = UUID(parts[1])
+        difficulty = Difficulty(parts[2])
+    except (IndexError, ValueError):
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    game = await get_game(game_id)
+    if not game:
+        await callback.answer(_('notif-game-not-found'))
+        return
+
+    if game.white_player_id != user.id:
+        await callback.answer(_('notif-only-creator-vs-bot'))
+        return
+
+    me = await callback.bot.me()
+    bot_user = await create_or_update_user(
+        id=me.id,
+        username=me.username,
+        first_name=me.first_name,
+        last_name=me.last_name
+    )
+    started_game = await start_bot_game(game_id, bot_user.id, difficulty)
+
+    if not started_game:
+        await callback.answer(_('notif-game-already-started'))
+        return
+
+    t = partial(gettext_with_locale, locale=started_game.locale)
+    board = load_board(started_game)
+
+    text = (
+        f"{t('game-header')}\n\n"
+        f"{t('game-white-player', name=user.first_name)}\n"
+        f"{t('game-black-player', name=bot_user.first_name)}\n"
+        f"{t('game-bot-difficulty', level=t(f'difficulty-{difficulty}'))}"
+        f"\n\n{t('game-current-turn-white')}"
+    )
+
+    keyboard = create_board_keyboard(
+        board, str(started_game.id), PieceColor.WHITE,
+        locale=started_game.locale
+    )
+    await edit_game_message(callback, text, keyboard)
+    await callback.answer(_('notif-bot-game-started'))
+
+
 @router.callback_query(F.data.startswith("cancel:"))
 async def handle_cancel_game(
     callback: CallbackQuery, user: User
@@ -223,7 +314,7 @@ async def handle_select_piece(
         await callback.answer(_('notif-not-your-turn'))
         return
 
-    board = Board.from_dict(game.board_state)
+    board = load_board(game)
 
     white_name = game.white_player.first_name
     black_name = (
@@ -267,7 +358,7 @@ async def handle_deselect_piece(
         return
 
     t = partial(gettext_with_locale, locale=game.locale)
-    board = Board.from_dict(game.board_state)
+    board = load_board(game)
     current_color = (
         PieceColor.WHITE
         if game.current_turn == PlayerColor.WHITE
@@ -332,7 +423,7 @@ async def handle_move(
         await callback.answer(_('notif-not-your-turn'))
         return
 
-    board = Board.from_dict(game.board_state)
+    board = load_board(game)
 
     valid_moves = board.get_valid_moves(from_pos, current_color)
     move = next((m for m in valid_moves if m.to_pos == to_pos), None)
@@ -341,6 +432,7 @@ async def handle_move(
         await callback.answer(_('notif-invalid-move'))
         return
 
+    capture_tree = board.get_capture_tree(from_pos) if move.is_capture else None
     board.execute_move(move)
 
     move_count_result = await s.session.execute(
@@ -361,15 +453,41 @@ async def handle_move(
     )
     s.session.add(db_move)
 
-    continue_capturing = False
-    if move.is_capture:
-        piece = board.get_piece(to_pos)
-        if piece:
-            further_captures = board._get_single_captures(to_pos, piece)
-            if further_captures:
-                continue_capturing = True
+    # Mid-sequence only the jumps that continue it are legal
+    continuation: Dict[str, List[Move]] | None = None
+    if capture_tree is not None:
+        next_node = capture_tree.jump_to(move.to_sq)
+        if next_node is not None and not next_node.is_final:
+            continuation = {to_pos: tree_moves(board.variant, next_node)}
+            board.analysis.preload(current_color, continuation)
+    continue_capturing = continuation is not None
+
+    if not continue_capturing:
+        game.current_turn = (
+            PlayerColor.BLACK
+            if game.current_turn == PlayerColor.WHITE
+            else PlayerColor.WHITE
+        )
+        add_position(
+            game.id, move_count + 1, board,
+            PieceColor(game.current_turn.value)
+        )
+        if (
+            game.bot_difficulty is not None
+            and not board.is_game_over()[0]
+            and not tablebase.adjudicate(
+                board, PieceColor(game.current_turn.value)
+            )[0]
+        ):
+            await play_bot_turn(game, board)
 
     is_over, winner_color = board.is_game_over()
+    adjudicated = False
+    if not is_over and not continue_capturing:
+        is_over, winner_color = tablebase.adjudicate(
+            board, PieceColor(game.current_turn.value)
+        )
+        adjudicated = is_over
 
     if is_over:
         winner_id = None
@@ -380,34 +498,40 @@ async def handle_move(
 
         await finish_game(game_id, winner_id)
 
-        winner_name = t(
-            'color-white' if winner_color == PieceColor.WHITE
-            else 'color-black'
-        )
         black_name = (
             game.black_player.first_name
             if game.black_player
             else 'Unknown'
         )
-        text = (
-            f"{t('game-header-finished')}\n\n"
+        players = (
             f"{t('game-white-player', name=game.white_player.first_name)}\n"
             f"{t('game-black-player', name=black_name)}\n\n"
-            f"{t('game-winner', name=winner_name)}"
+        )
+        note = f"\n{t('game-tablebase-result')}" if adjudicated else ""
+
+        if winner_color is None:
+            text = (
+                f"{t('game-header-draw')}\n\n{players}"
+                f"{t('game-draw-ended')}{note}"
+            )
+            await edit_game_message(callback, text)
+            await callback.answer(_('notif-game-drawn'))
+            return
+
+        winner_name = t(
+            'color-white' if winner_color == PieceColor.WHITE
+            else 'color-black'
+        )
+        text = (
+            f"{t('game-header-finished')}\n\n{players}"
+            f"{t('game-winner', name=winner_name)}{note}"
         )
 
         await edit_game_message(callback, text)
         await callback.answer(_('notif-game-over', winner=winner_name))
         return
 
-    game.board_state = board.to_dict()
-
-    if not continue_capturing:
-        game.current_turn = (
-            PlayerColor.BLACK
-            if game.current_turn == PlayerColor.WHITE
-            else PlayerColor.WHITE
-        )
+    store_board(game, board, continuation)
 
     if continue_capturing:
         keyboard = create_board_keyboard(
@@ -446,6 +570,9 @@ async def handle_move(
             f"{t('game-black-player', name=black_name)}\n\n"
             f"{t('game-current-turn', emoji=turn_emoji, color=turn_color)}"
         )
+        white_chance = await winprob.white_win_probability(board, next_color)
+        if white_chance is not None:
+            text += f"\n{_win_bar(t, white_chance)}"
         keyboard = create_board_keyboard(
             board, str(game.id), next_color, locale=game.locale
         )
@@ -560,7 +687,7 @@ async def handle_draw_decline(
         return
 
     t = partial(gettext_with_locale, locale=game.locale)
-    board = Board.from_dict(game.board_state)
+    board = load_board(game)
     current_color = (
         PieceColor.WHITE
         if game.current_turn == PlayerColor.WHITE
@@ -708,7 +835,7 @@ async def handle_surrender_cancel(
         return
 
     t = partial(gettext_with_locale, locale=game.locale)
-    board = Board.from_dict(game.board_state)
+    board = load_board(game)
     current_color = (
         PieceColor.WHITE
         if game.current_turn == PlayerColor.WHITE
@@ -741,6 +868,43 @@ async def handle_surrender_cancel(
     await callback.answer(_('notif-surrender-cancelled'))
 
 
+@router.callback_query(F.data.startswith("book:"))
+async def handle_opening_explorer(
+    callback: CallbackQuery, user: User
+) -> None:
+    if not callback.data:
+        await callback.answer(_('notif-invalid-request'))
+        return
+    game_id = UUID(callback.data.split(":")[1])
+
+    game = await get_game(game_id)
+    if not game:
+        await callback.answer(_('notif-game-not-found'))
+        return
+
+    opening = book.get(game.variant)
+    board = load_board(game)
+    moves = (
+        opening.moves_at(board, PieceColor(game.current_turn.value))
+        if opening else []
+    )
+    if not moves:
+        await callback.answer(_('explorer-empty'), show_alert=True)
+        return
+
+    lines = [_('explorer-title')]
+    for move in moves[:EXPLORER_MOVES]:
+        lines.append(_(
+            'explorer-move',
+            move=move.notation(board.geometry),
+            games=move.games,
+            white=round(100 * move.white / move.games),
+            draws=round(100 * move.draws / move.games),
+            black=round(100 * move.black / move.games),
+        ))
+    await callback.answer("\n".join(lines), show_alert=True)
+
+
 @router.callback_query(F.data == "noop")
 async def handle_noop(callback: CallbackQuery) -> None:
     await callback.answer()
@@ -1,18 +1,29 @@
 from functools import partial
+from typing import Callable, List
 from uuid import UUID
 
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
 
-from bot.bl.game import get_game_with_moves
+from bot.bl.board import Board
+from bot.bl.game import find_games_at_position, get_game_with_moves, get_review
 from bot.bl.history import reconstruct_board_at_move
-from bot.db.models import User
+from bot.bl.piece import PieceColor
+from bot.bl.review import Annotation, MoveReview
+from bot.bl.variant import get_variant
+from bot.db.models import Game, User
 from bot.middlewares.i18n import gettext as _
 from bot.middlewares.i18n import gettext_with_locale
-from bot.utils.keyboard import create_history_board_keyboard
+from bot.utils.keyboard import (
+    create_history_board_keyboard,
+    create_position_games_keyboard,
+)
 
 router = Router()
 
+# Games listed by the position search, one button each
+POSITION_GAMES = 10
+
 
 async def _edit_history_message(
     callback: CallbackQuery,
@@ -34,6 +45,47 @@ async def _edit_history_message(
         )
 
 
+def _review_text(
+    t: Callable[..., str], reviews: List[MoveReview] | None, move: int
+) -> str:
+    """Engine evaluation and annotation of the move just played."""
+    if not reviews or not 0 < move <= len(reviews):
+        return ""
+    review = reviews[move - 1]
+    text = t('history-evaluation', score=f"{review.score / 100:+.1f}")
+    if review.annotation == Annotation.BLUNDER:
+        text += f"\n{t('history-blunder')}"
+    elif review.annotation == Annotation.MISTAKE:
+        text += f"\n{t('history-mistake')}"
+    return f"\n{text}"
+
+
+def _turn_after(game: Game, board: Board, move: int) -> PieceColor | None:
+    """Side to move once ``move`` is played, None in mid-turn."""
+    moves = game.moves or []
+    if not 0 < move <= len(moves):
+        return None
+    if (
+        move < len(moves)
+        and moves[move].player_id == moves[move - 1].player_id
+    ):
+        return None
+    piece = board.get_piece(moves[move - 1].to_position)
+    if piece is None:
+        return None
+    return (
+        PieceColor.BLACK if piece.color == PieceColor.WHITE
+        else PieceColor.WHITE
+    )
+
+
+def fork_turn(game: Game, board: Board, move: int) -> PieceColor | None:
+    """Side to move on an analysis board forked at ``move``, if one can."""
+    if move == 0:
+        return PieceColor.WHITE
+    return _turn_after(game, board, move)
+
+
 @router.callback_query(F.data.startswith("hview:"))
 async def handle_view_history(
     callback: CallbackQuery, user: User
@@ -62,7 +114,9 @@ async def handle_view_history(
     t = partial(gettext_with_locale, locale=game.locale)
     total_moves = len(game.moves) if game.moves else 0
 
-    board = reconstruct_board_at_move(game.moves or [], total_moves)
+    board = reconstruct_board_at_move(
+        game.moves or [], total_moves, get_variant(game.variant)
+    )
 
     white_name = game.white_player.first_name
     black_name = (
@@ -78,15 +132,20 @@ async def handle_view_history(
     else:
         result_text = t('history-winner-black')
 
+    reviews = await get_review(game.id)
     text = (
         f"{t('history-header')}\n\n"
         f"{t('game-white-player', name=white_name)}\n"
         f"{t('game-black-player', name=black_name)}\n\n"
         f"{result_text}"
+        f"{_review_text(t, reviews, total_moves)}"
     )
 
     keyboard = create_history_board_keyboard(
-        board, str(game.id), total_moves, total_moves
+        board, str(game.id), total_moves, total_moves,
+        searchable=_turn_after(game, board, total_moves) is not None,
+        forkable=fork_turn(game, board, total_moves) is not None,
+        locale=game.locale
     )
 
     await _edit_history_message(callback, text, keyboard)
@@ -130,7 +189,9 @@ async def handle_history_navigate(
         await callback.answer(_('notif-invalid-request'))
         return
 
-    board = reconstruct_board_at_move(game.moves or [], target_move)
+    board = reconstruct_board_at_move(
+        game.moves or [], target_move, get_variant(game.variant)
+    )
 
     white_name = game.white_player.first_name
     black_name = (
@@ -154,16 +215,72 @@ async def handle_history_navigate(
         else:
             turn_text = t('history-after-black-move', move=target_move)
 
+    reviews = await get_review(game.id)
     text = (
         f"{t('history-header')}\n\n"
         f"{t('game-white-player', name=white_name)}\n"
         f"{t('game-black-player', name=black_name)}\n\n"
         f"{turn_text}"
+        f"{_review_text(t, reviews, target_move)}"
     )
 
     keyboard = create_history_board_keyboard(
-        board, str(game.id), target_move, total_moves
+        board, str(game.id), target_move, total_moves,
+        searchable=_turn_after(game, board, target_move) is not None,
+        forkable=fork_turn(game, board, target_move) is not None,
+        locale=game.locale
     )
 
     await _edit_history_message(callback, text, keyboard)
     await callback.answer()
+
+
+@router.callback_query(F.data.startswith("hpos:"))
+async def handle_position_search(
+    callback: CallbackQuery, user: User
+) -> None:
+    if not callback.data:
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    parts = callback.data.split(":")
+    try:
+        game_id = UUID(parts[1])
+        target_move = int(parts[2])
+    except (ValueError, IndexError):
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    game = await get_game_with_moves(game_id)
+    if not game:
+        await callback.answer(_('notif-game-not-found'))
+        return
+
+    if user.id not in [game.white_player_id, game.black_player_id]:
+        await callback.answer(_('notif-not-in-game'))
+        return
+
+    board = reconstruct_board_at_move(
+        game.moves or [], target_move, get_variant(game.variant)
+    )
+    turn = _turn_after(game, board, target_move)
+    if turn is None:
+        await callback.answer(_('notif-invalid-request'))
+        return
+
+    found = await find_games_at_position(
+        board, turn, user.id, exclude=game.id, limit=POSITION_GAMES + 1
+    )
+    if not found:
+        await callback.answer(_('position-search-none'), show_alert=True)
+        return
+
+    t = partial(gettext_with_locale, locale=game.locale)
+    text = f"{t('history-header')}\n\n{t('position-search-header')}"
+    if len(found) > POSITION_GAMES:
+        text += f"\n{t('position-search-more', count=POSITION_GAMES)}"
+    keyboard = create_position_games_keyboard(
+        found[:POSITION_GAMES], f"hv:{game.id}:{target_move}", game.locale
+    )
+    await _edit_history_message(callback, text, keyboard)
+    await callback.answer()
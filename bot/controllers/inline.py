@@ -8,6 +8,7 @@ from aiogram.types import (
 )
 
 from bot.bl.game import get_finished_games_for_user
+from bot.bl.variant import VariantName
 from bot.db.models import User
 from bot.middlewares.i18n import gettext as _
 
@@ -18,33 +19,53 @@ router = Router()
 async def handle_inline_query(query: InlineQuery, user: User) -> None:
     results = []
 
-    new_game_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(
-            text=_('btn-accept-join'),
-            callback_data="accept:new"
-        )],
-        [InlineKeyboardButton(
-            text=_('btn-cancel'),
-            callback_data="cancel:new"
-        )]
-    ])
+    for variant in VariantName:
+        # The Russian invitation keeps its original id and callback
+        if variant == VariantName.RUSSIAN:
+            result_id = "checkers_invite"
+            accept_data = "accept:new"
+            title = _('inline-title')
+            description = _('inline-description')
+            message_text = _('inline-invitation-message')
+        else:
+            variant_name = _(f'variant-{variant}')
+            result_id = f"checkers_invite_{variant}"
+            accept_data = f"accept:new:{variant}"
+            title = _('inline-title-variant', variant=variant_name)
+            description = _(
+                'inline-description-variant', variant=variant_name
+            )
+            message_text = _(
+                'inline-invitation-message-variant', variant=variant_name
+            )
 
-    results.append(
-        InlineQueryResultArticle(
-            id="checkers_invite",
-            title=_('inline-title'),
-            description=_('inline-description'),
-            input_message_content=InputTextMessageContent(
-                message_text=_('inline-invitation-message'),
-                parse_mode="HTML"
-            ),
-            reply_markup=new_game_keyboard,
-            thumbnail_url=(
-                "https://em-content.zobj.net/thumbs/120/"
-                "apple/354/video-game_1f3ae.png"
+        new_game_keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(
+                text=_('btn-accept-join'),
+                callback_data=accept_data
+            )],
+            [InlineKeyboardButton(
+                text=_('btn-cancel'),
+                callback_data="cancel:new"
+            )]
+        ])
+
+        results.append(
+            InlineQueryResultArticle(
+                id=result_id,
+                title=title,
+                description=description,
+                input_message_content=InputTextMessageContent(
+                    message_text=message_text,
+                    parse_mode="HTML"
+                ),
+                reply_markup=new_game_keyboard,
+                thumbnail_url=(
+                    "https://em-content.zobj.net/thumbs/120/"
+                    "apple/354/video-game_1f3ae.png"
+                )
             )
         )
-    )
 
     finished_games = await get_finished_games_for_user(user.id, limit=10)
 
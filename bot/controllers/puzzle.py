@@ -0,0 +1,199 @@
+from datetime import date
+from functools import partial
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+from bot.bl import codec
+from bot.bl.board import Board
+from bot.bl.game import get_daily_puzzle, get_puzzle
+from bot.bl.piece import PieceColor
+from bot.bl.puzzle import (
+    MAX_DIFFICULTY,
+    MIN_DIFFICULTY,
+    turn_captures,
+    turn_notation,
+    unpack_solution,
+)
+from bot.bl.variant import get_variant
+from bot.db.models import Puzzle
+from bot.middlewares.i18n import gettext as _
+from bot.utils.keyboard import board_keyboards, create_puzzle_keyboard
+
+router = Router()
+
+DEFAULT_DIFFICULTY = 2
+
+
+def _render_keyboard(
+    puzzle: Puzzle, selected_pos: str | None, solved: bool
+) -> InlineKeyboardMarkup:
+    board = Board.from_bytes(
+        puzzle.board_data, puzzle.board_version, get_variant(puzzle.variant)
+    )
+    if solved:
+        for move in unpack_solution(puzzle.solution, board):
+            board.execute_move(move)
+        return create_puzzle_keyboard(board, puzzle.id, None)
+    return create_puzzle_keyboard(
+        board, puzzle.id, codec.decode_turn(puzzle.board_data), selected_pos
+    )
+
+
+def _keyboard(
+    puzzle: Puzzle, selected_pos: str | None = None, solved: bool = False
+) -> InlineKeyboardMarkup:
+    """Puzzles never change, so their keyboards are kept by id."""
+    return board_keyboards.render(
+        ('puzzle', puzzle.id, selected_pos, solved),
+        partial(_render_keyboard, puzzle, selected_pos, solved),
+    )
+
+
+def _puzzle_text(puzzle: Puzzle) -> str:
+    to_move = (
+        'puzzle-white-to-move'
+        if codec.decode_turn(puzzle.board_data) == PieceColor.WHITE
+        else 'puzzle-black-to-move'
+    )
+    return (
+        f"{_('puzzle-header', variant=_(f'variant-{puzzle.variant}'))}\n"
+        f"{_('puzzle-difficulty', stars='⭐' * puzzle.difficulty)}\n\n"
+        f"{_(to_move)}"
+    )
+
+
+def _solution_notation(puzzle: Puzzle, board: Board) -> str:
+    return turn_notation(unpack_solution(puzzle.solution, board))
+
+
+@router.message(Command("puzzle"))
+async def handle_puzzle_command(
+    message: Message, command: CommandObject
+) -> None:
+    difficulty = DEFAULT_DIFFICULTY
+    if command.args and command.args.strip().isdigit():
+        difficulty = max(
+            MIN_DIFFICULTY, min(MAX_DIFFICULTY, int(command.args))
+        )
+
+    puzzle = await get_daily_puzzle(difficulty, date.today())
+    if puzzle is None:
+        await message.answer(_('puzzle-none'))
+        return
+
+    await message.answer(
+        _puzzle_text(puzzle),
+        parse_mode="HTML",
+        reply_markup=_keyboard(puzzle)
+    )
+
+
+async def _load_puzzle(callback: CallbackQuery) -> Puzzle | None:
+    if not callback.data:
+        await callback.answer(_('notif-invalid-request'))
+        return None
+    try:
+        puzzle_id = int(callback.data.split(":")[1])
+    except ValueError:
+        await callback.answer(_('notif-invalid-request'))
+        return None
+
+    puzzle = await get_puzzle(puzzle_id)
+    if puzzle is None:
+        await callback.answer(_('puzzle-not-found'))
+    return puzzle
+
+
+async def _edit_puzzle_message(
+    callback: CallbackQuery, text: str, keyboard: InlineKeyboardMarkup
+) -> None:
+    if callback.message and hasattr(callback.message, 'edit_text'):
+        await callback.message.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+
+
+@router.callback_query(F.data.startswith("pzs:"))
+async def handle_puzzle_select(callback: CallbackQuery) -> None:
+    puzzle = await _load_puzzle(callback)
+    if puzzle is None:
+        return
+    position = (callback.data or "").split(":")[2]
+
+    await _edit_puzzle_message(
+        callback, _puzzle_text(puzzle), _keyboard(puzzle, position)
+    )
+    await callback.answer(_('notif-selected-position', position=position))
+
+
+@router.callback_query(F.data.startswith("pzd:"))
+async def handle_puzzle_deselect(callback: CallbackQuery) -> None:
+    puzzle = await _load_puzzle(callback)
+    if puzzle is None:
+        return
+
+    await _edit_puzzle_message(
+        callback, _puzzle_text(puzzle), _keyboard(puzzle)
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("pzm:"))
+async def handle_puzzle_move(callback: CallbackQuery) -> None:
+    puzzle = await _load_puzzle(callback)
+    if puzzle is None:
+        return
+    parts = (callback.data or "").split(":")
+    from_pos, to_pos = parts[2].split("-")
+
+    board = Board.from_bytes(
+        puzzle.board_data, puzzle.board_version, get_variant(puzzle.variant)
+    )
+    color = codec.decode_turn(puzzle.board_data)
+    # Captures may reach the same square taking different pieces
+    routes = {
+        turn_captures(turn): turn
+        for turn in board.get_turns(color)
+        if (turn[0].from_pos, turn[-1].to_pos) == (from_pos, to_pos)
+    }
+    if len(parts) > 3:
+        try:
+            captured: int | None = int(parts[3], 16)
+        except ValueError:
+            await callback.answer(_('notif-invalid-request'))
+            return
+    elif len(routes) > 1:
+        await _edit_puzzle_message(
+            callback,
+            _puzzle_text(puzzle),
+            create_puzzle_keyboard(
+                board, puzzle.id, color, from_pos, list(routes.values())
+            )
+        )
+        await callback.answer(_('notif-puzzle-route'))
+        return
+    else:
+        captured = next(iter(routes), None)
+
+    solution = unpack_solution(puzzle.solution, board)
+    if captured not in routes or (from_pos, to_pos, captured) != (
+        solution[0].from_pos, solution[-1].to_pos, turn_captures(solution)
+    ):
+        await _edit_puzzle_message(
+            callback, _puzzle_text(puzzle), _keyboard(puzzle)
+        )
+        await callback.answer(_('notif-puzzle-wrong'), show_alert=True)
+        return
+
+    text = (
+        f"{_puzzle_text(puzzle)}\n\n"
+        f"{_('puzzle-solved', line=_solution_notation(puzzle, board))}"
+    )
+    await _edit_puzzle_message(
+        callback, text, _keyboard(puzzle, solved=True)
+    )
+    await callback.answer(_('notif-puzzle-solved'))
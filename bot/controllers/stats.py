@@ -1,17 +1,43 @@
+from typing import List
+
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
-from bot.bl.user import get_user_stats
-from bot.db.models import User
+from bot.bl.repertoire import DEFAULT_TURNS, MAX_TURNS
+from bot.bl.user import get_openings, get_user_stats
+from bot.bl.variant import VariantName
+from bot.db.models import OpeningStat, User
+from bot.db.models.game import PlayerColor
 from bot.middlewares.i18n import gettext as _
 
 router = Router()
 
 
+def _openings_text(header: str, openings: List[OpeningStat]) -> str:
+    lines = [header]
+    for opening in openings:
+        games = opening.wins + opening.draws + opening.losses
+        name = opening.opening
+        if opening.variant != VariantName.RUSSIAN:
+            name += f" ({_(f'variant-{opening.variant}')})"
+        lines.append(_(
+            'stats-opening',
+            opening=name,
+            games=games,
+            rate=round(100 * opening.wins / games),
+        ))
+    return "\n".join(lines)
+
+
 @router.message(Command("stats"))
-async def handle_stats_command(message: Message, user: User) -> None:
+async def handle_stats_command(
+    message: Message, user: User, command: CommandObject
+) -> None:
     stats = await get_user_stats(user.id)
+    turns = DEFAULT_TURNS
+    if command.args and command.args.strip().isdigit():
+        turns = max(1, min(MAX_TURNS, int(command.args)))
 
     text = (
         f"{_('stats-header')}\n\n"
@@ -21,6 +47,14 @@ async def handle_stats_command(message: Message, user: User) -> None:
         f"{_('stats-win-rate', rate=f'{stats['win_rate']:.1f}')}"
     )
 
+    for color, header in (
+        (PlayerColor.WHITE, 'stats-openings-white'),
+        (PlayerColor.BLACK, 'stats-openings-black'),
+    ):
+        openings = await get_openings(user.id, color, turns)
+        if openings:
+            text += f"\n\n{_openings_text(_(header, turns=turns), openings)}"
+
     await message.answer(text, parse_mode="HTML")
 
 
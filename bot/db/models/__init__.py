@@ -1,5 +1,12 @@
 from bot.db.models.game import Game
 from bot.db.models.move import Move
+from bot.db.models.opening import OpeningStat
+from bot.db.models.position import GamePosition
+from bot.db.models.puzzle import Puzzle
+from bot.db.models.review import GameReview
 from bot.db.models.user import User
 
-__all__ = ['User', 'Game', 'Move']
+__all__ = [
+    'User', 'Game', 'Move', 'GameReview', 'Puzzle', 'GamePosition',
+    'OpeningStat',
+]
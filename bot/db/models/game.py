@@ -3,9 +3,12 @@ from datetime import datetime
 from enum import StrEnum, auto
 from uuid import uuid4
 
-from sqlalchemy import BIGINT, JSON, Enum
+from sqlalchemy import BIGINT, Enum, LargeBinary, SmallInteger
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from bot.bl.codec import CODEC_VERSION
+from bot.bl.engine import Difficulty
+from bot.bl.variant import VariantName
 from bot.db.base import Base
 from bot.db.mixin import CreatedUpdatedAtMixin
 from bot.db.types import user_fk, uuid_pk
@@ -37,7 +40,23 @@ class Game(Base, CreatedUpdatedAtMixin):
     chat_id: Mapped[int] = mapped_column(BIGINT)
     message_id: Mapped[int] = mapped_column(BIGINT)
 
-    board_state: Mapped[dict] = mapped_column(JSON)
+    variant: Mapped[VariantName] = mapped_column(
+        Enum(VariantName), default=VariantName.RUSSIAN
+    )
+    # Set when black is played by the engine
+    bot_difficulty: Mapped[Difficulty | None] = mapped_column(
+        Enum(Difficulty), nullable=True
+    )
+    board_data: Mapped[bytes] = mapped_column(LargeBinary)
+    board_version: Mapped[int] = mapped_column(
+        SmallInteger, default=CODEC_VERSION
+    )
+    legal_moves: Mapped[bytes | None] = mapped_column(
+        LargeBinary, nullable=True
+    )
+    legal_moves_version: Mapped[int | None] = mapped_column(
+        SmallInteger, nullable=True
+    )
     current_turn: Mapped[PlayerColor] = mapped_column(
         Enum(PlayerColor), default=PlayerColor.WHITE
     )
@@ -0,0 +1,27 @@
+from sqlalchemy import Enum, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from bot.bl.variant import VariantName
+from bot.db.base import Base
+from bot.db.models.game import PlayerColor
+from bot.db.types import user_fk
+
+
+class OpeningStat(Base):
+    """Results of a player with one opening, see ``bot.bl.repertoire``."""
+    __tablename__ = 'opening_stats'
+
+    user_id: Mapped[user_fk] = mapped_column(primary_key=True)
+    color: Mapped[PlayerColor] = mapped_column(
+        Enum(PlayerColor), primary_key=True
+    )
+    # Turns the opening is made of
+    turns: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    variant: Mapped[VariantName] = mapped_column(
+        Enum(VariantName), primary_key=True
+    )
+    opening: Mapped[str] = mapped_column(primary_key=True)
+
+    wins: Mapped[int] = mapped_column(default=0)
+    draws: Mapped[int] = mapped_column(default=0)
+    losses: Mapped[int] = mapped_column(default=0)
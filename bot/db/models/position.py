@@ -0,0 +1,19 @@
+from sqlalchemy import BIGINT
+from sqlalchemy.orm import Mapped, mapped_column
+
+from bot.db.base import Base
+from bot.db.types import game_fk
+
+
+class GamePosition(Base):
+    """Position reached after a complete turn of a game.
+
+    Answers which games went through a position, see
+    ``bot.bl.history.position_key``.
+    """
+    __tablename__ = 'game_positions'
+
+    game_id: Mapped[game_fk] = mapped_column(primary_key=True)
+    # Stored moves of the game played before the position
+    move_number: Mapped[int] = mapped_column(primary_key=True)
+    hash: Mapped[int] = mapped_column(BIGINT, index=True)
@@ -0,0 +1,34 @@
+from sqlalchemy import Enum, Index, LargeBinary, SmallInteger, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from bot.bl.codec import CODEC_VERSION
+from bot.bl.variant import VariantName
+from bot.db.base import Base
+from bot.db.mixin import CreatedAtMixin
+from bot.db.types import game_fk, int_pk
+
+
+class Puzzle(Base, CreatedAtMixin):
+    """A position from a finished game, see ``bot.bl.puzzle``."""
+    __tablename__ = 'puzzles'
+    __table_args__ = (
+        UniqueConstraint('game_id', 'move_number'),
+        Index('ix_puzzles_difficulty_pick', 'difficulty', 'pick'),
+    )
+
+    id: Mapped[int_pk]
+    game_id: Mapped[game_fk]
+    # Stored moves of the game played before the position
+    move_number: Mapped[int]
+
+    variant: Mapped[VariantName] = mapped_column(Enum(VariantName))
+    board_data: Mapped[bytes] = mapped_column(LargeBinary)
+    board_version: Mapped[int] = mapped_column(
+        SmallInteger, default=CODEC_VERSION
+    )
+    # Move codes of the winning turn, eight bytes each
+    solution: Mapped[bytes] = mapped_column(LargeBinary)
+    difficulty: Mapped[int] = mapped_column(SmallInteger)
+    gain: Mapped[int]
+    # Random key the daily puzzle is looked up by
+    pick: Mapped[int]
@@ -0,0 +1,16 @@
+from sqlalchemy import LargeBinary, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from bot.db.base import Base
+from bot.db.mixin import CreatedAtMixin
+from bot.db.types import game_fk
+
+
+class GameReview(Base, CreatedAtMixin):
+    """Engine review of a finished game, see ``bot.bl.review``."""
+    __tablename__ = 'game_reviews'
+
+    game_id: Mapped[game_fk] = mapped_column(primary_key=True)
+    # Three bytes per stored move, in move_number order
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    version: Mapped[int] = mapped_column(SmallInteger)
@@ -0,0 +1,95 @@
+"""Build the opening books from the finished games.
+
+Games are streamed in chunks in id order, their moves in move order, and
+added to one trie per variant; only the trie is kept in memory. Each
+variant that has games gets a book file in the output directory, to be
+loaded by the bot through ``book_dir``.
+
+Usage: python -m bot.jobs.book [--plies N] [--min-games N] [--chunk N]
+    [--output DIR]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Dict
+from uuid import UUID
+
+from bot.bl import book
+from bot.bl.book import BookBuilder
+from bot.bl.game import load_game_chunk, load_move_records
+from bot.bl.repertoire import game_winner
+from bot.bl.variant import VariantName, get_variant
+from bot.db.models import Game
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+_COLUMNS = (
+    Game.id,
+    Game.variant,
+    Game.winner_id,
+    Game.white_player_id,
+    Game.black_player_id,
+)
+
+
+async def run(chunk: int, plies: int, min_games: int, output: str) -> None:
+    s.session = s.maker()
+    builders: Dict[VariantName, BookBuilder] = {}
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    try:
+        while True:
+            games = await load_game_chunk(_COLUMNS, last_id, chunk)
+            if not games:
+                break
+
+            records = await load_move_records([row[0] for row in games])
+            for game_id, variant, winner_id, white_id, black_id in games:
+                builder = builders.get(variant)
+                if builder is None:
+                    builder = builders[variant] = BookBuilder(
+                        get_variant(variant), plies
+                    )
+                builder.add_game(
+                    records[game_id],
+                    game_winner(winner_id, white_id, black_id),
+                )
+            last_id = games[-1][0]
+    finally:
+        await s.session.close()
+
+    os.makedirs(output, exist_ok=True)
+    for variant, builder in builders.items():
+        path = os.path.join(output, book.file_name(variant))
+        nodes = builder.write(path, min_games)
+        log.info(
+            'Wrote %s: %d games, %d nodes, %d bytes',
+            path, builder.games, nodes, os.path.getsize(path)
+        )
+    log.info(
+        'Built %d books in %.2fs',
+        len(builders), time.perf_counter() - started
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=1000)
+    parser.add_argument('--plies', type=int, default=20)
+    parser.add_argument('--min-games', type=int, default=2)
+    parser.add_argument('--output', default='books')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk, args.plies, args.min_games, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Rebuild the players' opening statistics from the finished games.
+
+The bot adds every game to ``opening_stats`` when it finishes; this job
+recomputes the table from scratch, e.g. after ``bot.bl.repertoire``
+changes how openings are counted. Games are streamed in chunks in id
+order and only the totals are kept in memory. The old rows are replaced
+in one transaction, opened on a connection taken out of the engine's
+autocommit mode, so ``/stats`` shows the old table until the new one is
+committed and a failed run changes nothing. Games finished while the
+games are read may be missed; run the job again to count them.
+
+Usage: python -m bot.jobs.openings [--chunk N]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict
+from uuid import UUID
+
+from sqlalchemy import delete
+
+from bot.bl import repertoire
+from bot.bl.game import load_game_chunk, load_move_records, store_openings
+from bot.bl.repertoire import OpeningKey, Score
+from bot.db.models import Game, OpeningStat
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+_COLUMNS = (
+    Game.id,
+    Game.variant,
+    Game.winner_id,
+    Game.white_player_id,
+    Game.black_player_id,
+    Game.bot_difficulty.is_not(None),
+)
+
+
+async def run(chunk: int) -> None:
+    s.session = s.maker()
+    totals: Dict[OpeningKey, Score] = {}
+    games_total = 0
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    try:
+        while True:
+            games = await load_game_chunk(_COLUMNS, last_id, chunk)
+            if not games:
+                break
+
+            records = await load_move_records([row[0] for row in games])
+            for (
+                game_id, variant, winner_id, white_id, black_id, bot_game
+            ) in games:
+                repertoire.add_scores(totals, repertoire.game_scores(
+                    variant,
+                    records[game_id],
+                    repertoire.game_players(white_id, black_id, bot_game),
+                    repertoire.game_winner(winner_id, white_id, black_id),
+                ))
+            games_total += len(games)
+            last_id = games[-1][0]
+            log.info('Counted %d games', games_total)
+    finally:
+        await s.session.close()
+
+    s.session = s.maker()
+    try:
+        # The engine autocommits every statement; the swap must not
+        await s.session.connection(
+            execution_options={'isolation_level': 'READ COMMITTED'}
+        )
+        await s.session.execute(delete(OpeningStat))
+        await store_openings(totals)
+        await s.session.commit()
+    finally:
+        await s.session.close()
+
+    log.info(
+        'Stored %d opening rows from %d games in %.2fs',
+        len(totals), games_total, time.perf_counter() - started
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk))
+
+
+if __name__ == '__main__':
+    main()
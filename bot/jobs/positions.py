@@ -0,0 +1,86 @@
+"""Index the positions of stored games for position search.
+
+Games are streamed in chunks in id order and replayed turn by turn; the
+position after every complete turn is written to ``game_positions``.
+The bot indexes new turns as they are played, so this job backfills the
+games from before the index existed. Rows already indexed are skipped,
+so it can be stopped and run again from the start or from ``--after``.
+
+Usage: python -m bot.jobs.positions [--chunk N] [--after GAME_ID]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from uuid import UUID
+
+from bot.bl.game import load_game_chunk, load_move_records, store_positions
+from bot.bl.history import turn_positions
+from bot.bl.variant import get_variant
+from bot.db.models import Game
+from bot.db.models.game import GameStatus
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+
+async def run(chunk: int, after: UUID | None) -> None:
+    s.session = s.maker()
+    games_total = positions = 0
+    last_id = after
+    started = time.perf_counter()
+
+    try:
+        while True:
+            games = await load_game_chunk(
+                (Game.id, Game.variant), last_id, chunk,
+                statuses=(GameStatus.ACTIVE, GameStatus.FINISHED),
+            )
+            if not games:
+                break
+
+            records = await load_move_records(
+                [game_id for game_id, _ in games]
+            )
+            rows = [
+                (game_id, number, key)
+                for game_id, variant in games
+                for number, key in turn_positions(
+                    records[game_id], get_variant(variant)
+                )
+            ]
+            await store_positions(rows)
+            await s.session.commit()
+            positions += len(rows)
+
+            games_total += len(games)
+            last_id = games[-1][0]
+            log.info(
+                'Indexed %d games, %d positions, last %s',
+                games_total, positions, last_id
+            )
+    finally:
+        await s.session.close()
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        'Indexed %d games, %d positions in %.2fs',
+        games_total, positions, elapsed
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=1000)
+    parser.add_argument('--after', type=UUID, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk, args.after))
+
+
+if __name__ == '__main__':
+    main()
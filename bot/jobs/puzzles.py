@@ -0,0 +1,102 @@
+"""Mine tactical puzzles from finished games.
+
+Games finished in the last days are read in chunks and replayed in
+parallel, one game per worker process; every position where a turn
+starts is checked with a bounded search (``bot.bl.puzzle``). Puzzles are
+keyed by game and move, so running the job again over the same games
+adds nothing twice. Run it daily, or with ``--days 0`` to mine every
+finished game.
+
+Usage: python -m bot.jobs.puzzles [--days N] [--chunk N] [--workers N]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Sequence, Tuple
+from uuid import UUID
+
+from bot.bl import puzzle
+from bot.bl.game import load_game_chunk, load_move_records, store_puzzles
+from bot.bl.variant import VariantName
+from bot.db.models import Game
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+
+async def mine_chunk(
+    games: Sequence[Tuple[UUID, VariantName]], pool: ProcessPoolExecutor
+) -> int:
+    """Mine one chunk of games; returns the number of puzzles found."""
+    records = await load_move_records([game_id for game_id, _ in games])
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(
+            pool, partial(puzzle.mine_game, variant, records[game_id])
+        )
+        for game_id, variant in games
+    ))
+
+    for (game_id, variant), puzzles in zip(games, results):
+        await store_puzzles(game_id, variant, puzzles)
+    await s.session.commit()
+    return sum(len(puzzles) for puzzles in results)
+
+
+async def run(days: int, chunk: int, workers: int | None) -> None:
+    s.session = s.maker()
+    recent = (
+        [Game.finished_at >= datetime.now() - timedelta(days=days)]
+        if days else []
+    )
+    games_total = found = 0
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+    try:
+        while True:
+            games = await load_game_chunk(
+                (Game.id, Game.variant), last_id, chunk, *recent
+            )
+            if not games:
+                break
+
+            found += await mine_chunk(games, pool)
+            games_total += len(games)
+            last_id = games[-1][0]
+            log.info('Mined %d games, %d puzzles', games_total, found)
+    finally:
+        pool.shutdown()
+        await s.session.close()
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        'Mined %d games, %d puzzles in %.2fs', games_total, found, elapsed
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--chunk', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.days, args.chunk, args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Replay every finished game and check it against the stored board.
+
+Games are read in chunks and replayed together with the vectorised rules
+engine. A game is reported when one of its moves is illegal or when the
+final position differs from ``games.board_data``.
+
+Usage: python -m bot.jobs.replay [--chunk N]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+
+from bot.bl import batch, codec
+from bot.bl.game import load_game_chunk
+from bot.bl.variant import VariantName
+from bot.db.models import Game, Move
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+
+async def _load_chunk(
+    after: UUID | None, size: int
+) -> Tuple[List[Game], Dict[UUID, List[int]]]:
+    games = [
+        game for game, in await load_game_chunk(
+            (Game,), after, size, Game.variant == VariantName.RUSSIAN
+        )
+    ]
+
+    moves: Dict[UUID, List[int]] = {game.id: [] for game in games}
+    if games:
+        rows = await s.session.execute(
+            select(
+                Move.game_id,
+                Move.from_position,
+                Move.to_position,
+                Move.captured_positions,
+            )
+            .where(Move.game_id.in_(moves))
+            .order_by(Move.game_id, Move.move_number)
+        )
+        for game_id, from_pos, to_pos, captured in rows:
+            moves[game_id].extend(
+                batch.game_codes([from_pos], [to_pos], [captured])
+            )
+
+    return games, moves
+
+
+def check_chunk(games: List[Game], moves: Dict[UUID, List[int]]) -> int:
+    """Replay one chunk and log every broken game; returns their count."""
+    final, invalid = batch.replay([moves[game.id] for game in games])
+    broken = 0
+
+    for n, game in enumerate(games):
+        if invalid[n] >= 0:
+            log.warning('Game %s: illegal move at ply %d', game.id, invalid[n])
+            broken += 1
+            continue
+
+        white, black, kings, _ = codec.decode(game.board_data)
+        board = final.board(n)
+        if (board.white, board.black, board.kings) != (white, black, kings):
+            log.warning('Game %s: replay does not reach stored board', game.id)
+            broken += 1
+
+    return broken
+
+
+async def run(chunk: int) -> None:
+    s.session = s.maker()
+    games_total = plies = broken = 0
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    try:
+        while True:
+            games, moves = await _load_chunk(last_id, chunk)
+            if not games:
+                break
+
+            broken += check_chunk(games, moves)
+            games_total += len(games)
+            plies += sum(len(codes) for codes in moves.values())
+            last_id = games[-1].id
+            s.session.expunge_all()
+    finally:
+        await s.session.close()
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        'Replayed %d games, %d plies in %.2fs, %d broken',
+        games_total, plies, elapsed, broken
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk))
+
+
+if __name__ == '__main__':
+    main()
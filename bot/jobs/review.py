@@ -0,0 +1,102 @@
+"""Review finished games with the engine and store the results.
+
+Games without an up to date review are read in chunks and reviewed in
+parallel, one game per worker process. Finished games are also reviewed
+in the background by the bot itself; this job backfills older games and
+redoes reviews after ``bot.bl.review.REVIEW_VERSION`` changes.
+
+Usage: python -m bot.jobs.review [--chunk N] [--workers N]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import exists
+
+from bot.bl import review
+from bot.bl.game import load_game_chunk, load_move_records, store_review
+from bot.bl.variant import VariantName
+from bot.db.models import Game, GameReview
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+# Games without a review made by the current engine
+_UNREVIEWED = ~exists().where(
+    GameReview.game_id == Game.id,
+    GameReview.version == review.REVIEW_VERSION,
+)
+
+
+async def review_chunk(
+    games: Sequence[Tuple[UUID, VariantName]], pool: ProcessPoolExecutor
+) -> int:
+    """Review one chunk of games; returns the number of moves reviewed."""
+    records = await load_move_records([game_id for game_id, _ in games])
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(
+            pool, partial(review.review_game, variant, records[game_id])
+        )
+        for game_id, variant in games
+    ))
+
+    for (game_id, _), data in zip(games, results):
+        await store_review(game_id, data)
+    await s.session.commit()
+    return sum(len(moves) for moves in records.values())
+
+
+async def run(chunk: int, workers: int | None) -> None:
+    s.session = s.maker()
+    games_total = moves = 0
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+    try:
+        while True:
+            games = await load_game_chunk(
+                (Game.id, Game.variant), last_id, chunk, _UNREVIEWED
+            )
+            if not games:
+                break
+
+            moves += await review_chunk(games, pool)
+            games_total += len(games)
+            last_id = games[-1][0]
+            log.info('Reviewed %d games', games_total)
+    finally:
+        pool.shutdown()
+        await s.session.close()
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        'Reviewed %d games, %d moves in %.2fs', games_total, moves, elapsed
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk, args.workers))
+
+
+if __name__ == '__main__':
+    main()
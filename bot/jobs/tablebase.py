@@ -0,0 +1,272 @@
+"""Build an endgame tablebase by retrograde analysis.
+
+Signatures are solved in the order of ``bot.bl.tablebase.signatures``,
+each together with its colour-swapped twin, because a quiet turn leads
+from one to the other. Worker processes generate every turn of every
+position once; turns into a signature solved earlier are resolved
+against its finished slice. The pair is then solved backwards from the
+lost positions with NumPy: a position is won in d turns when one of its
+turns leads to a loss in d - 1, and lost in d when every turn leads to a
+win and the slowest of them ends in d - 1. Whatever is left is a draw.
+
+Usage: python -m bot.jobs.tablebase [--variant NAME] [--pieces N]
+    [--workers N] [--output DIR]
+"""
+import argparse
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import time
+from array import array
+from bisect import bisect_right
+from functools import partial
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+
+import numpy as np
+
+from bot.bl import tablebase
+from bot.bl.board import Board
+from bot.bl.piece import PieceColor
+from bot.bl.symmetry import Transform
+from bot.bl.tablebase import Layout, Signature, Subsets, signature_of
+from bot.bl.variant import VariantName, get_variant
+
+log = logging.getLogger(__name__)
+
+# Ranges of positions handed to a worker at a time
+CHUNKS_PER_WORKER = 8
+
+
+class _Expansion(NamedTuple):
+    # positions whose side to move has no turn
+    lost: np.ndarray
+    # positions with a turn that takes every piece left
+    wins: np.ndarray
+    # parent and child of each turn staying within the pair
+    parents: np.ndarray
+    children: np.ndarray
+    # parent, signature number and index of each turn leaving it
+    external_parents: np.ndarray
+    external_signatures: np.ndarray
+    external_indexes: np.ndarray
+
+
+def _array(values: array) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.int32)
+
+
+def _expand(
+    variant_name: str,
+    order: Sequence[Signature],
+    pair: Sequence[Signature],
+    bounds: Tuple[int, int],
+) -> _Expansion:
+    """Generate the turns of the positions in ``bounds`` of ``pair``."""
+    variant = get_variant(variant_name)
+    geometry = variant.geometry
+    subsets = Subsets(geometry)
+    layouts: Dict[Signature, Layout] = {}
+
+    def layout(signature: Signature) -> Layout:
+        if signature not in layouts:
+            layouts[signature] = Layout(geometry, signature)
+        return layouts[signature]
+
+    numbers = {signature: number for number, signature in enumerate(order)}
+    offsets: Dict[Signature, int] = {}
+    starts: List[int] = []
+    offset = 0
+    for signature in pair:
+        offsets[signature] = offset
+        starts.append(offset)
+        offset += layout(signature).size
+
+    lost, wins = array('i'), array('i')
+    parents, children = array('i'), array('i')
+    external = (array('i'), array('i'), array('i'))
+    swap = Transform.SWAP
+
+    for position in range(*bounds):
+        signature = pair[bisect_right(starts, position) - 1]
+        masks = layout(signature).masks(position - offsets[signature], subsets)
+        if masks is None:
+            continue
+
+        board = Board.from_masks(*masks, variant=variant)
+        turns = board.get_turns(PieceColor.WHITE)
+        if not turns:
+            lost.append(position)
+            continue
+
+        results: Set[Tuple[int, int, int]] = set()
+        takes_all = False
+        for turn in turns:
+            tokens = [board.make_move(move) for move in turn]
+            white, black, kings = board.white, board.black, board.kings
+            for token in reversed(tokens):
+                board.unmake_move(token)
+            if not black:
+                takes_all = True
+                break
+            # The other side moves next: store it as white to move
+            results.add(swap.masks(white, black, kings, geometry))
+
+        if takes_all:
+            wins.append(position)
+            continue
+        for child in results:
+            child_signature = signature_of(*child)
+            index = layout(child_signature).index(*child)
+            if child_signature in offsets:
+                parents.append(position)
+                children.append(offsets[child_signature] + index)
+            else:
+                external[0].append(position)
+                external[1].append(numbers[child_signature])
+                external[2].append(index)
+
+    return _Expansion(
+        _array(lost), _array(wins), _array(parents), _array(children),
+        *(_array(values) for values in external),
+    )
+
+
+def _solve(
+    size: int,
+    parts: Sequence[_Expansion],
+    order: Sequence[Signature],
+    slices: Dict[Signature, bytes],
+) -> np.ndarray:
+    """Turns to the end of every position of a pair, -1 for a draw."""
+    lost, wins, parents, children, external_parents, numbers, indexes = (
+        np.concatenate(arrays) for arrays in zip(*parts)
+    )
+
+    # Results of the turns leaving the pair, from the mover's side
+    values = np.zeros(len(external_parents), dtype=np.int64)
+    for number in np.unique(numbers):
+        chosen = numbers == number
+        table = np.frombuffer(slices[order[number]], dtype=np.uint8)
+        values[chosen] = table[indexes[chosen]]
+    ends = values - 1
+    losing = (values != tablebase.DRAW) & (ends % 2 == 0)
+    winning = (values != tablebase.DRAW) & (ends % 2 == 1)
+
+    unreachable = tablebase.MAX_DISTANCE + 1
+    win_at = np.full(size, unreachable, dtype=np.int64)
+    np.minimum.at(win_at, external_parents[losing], ends[losing] + 1)
+    win_at[wins] = 1
+    loss_at = np.zeros(size, dtype=np.int64)
+    np.maximum.at(loss_at, external_parents[winning], ends[winning] + 1)
+    external_wins = np.bincount(external_parents[winning], minlength=size)
+    degree = (
+        np.bincount(parents, minlength=size)
+        + np.bincount(external_parents, minlength=size)
+    )
+    last_external = max(
+        int(loss_at.max(initial=0)),
+        int(win_at[win_at < unreachable].max(initial=0)),
+    )
+
+    distance = np.full(size, -1, dtype=np.int64)
+    distance[lost] = 0
+    won_children = np.zeros(size, dtype=np.int64)
+    turns = 1
+    while True:
+        # All positions decided in the last round lost if it was even
+        decided = distance[children] == turns - 1
+        found = np.zeros(size, dtype=bool)
+        if turns % 2:
+            found[parents[decided]] = True
+            found |= win_at == turns
+        else:
+            won_children += np.bincount(parents[decided], minlength=size)
+            found = (
+                (degree > 0)
+                & (won_children + external_wins == degree)
+                & (loss_at <= turns)
+            )
+        found &= distance < 0
+
+        if found.any():
+            if turns > tablebase.MAX_DISTANCE:
+                raise ValueError('Distance does not fit into a byte')
+            distance[found] = turns
+        elif turns >= last_external:
+            return distance
+        turns += 1
+
+
+def build(
+    variant_name: VariantName,
+    pieces: int,
+    pool: multiprocessing.pool.Pool,
+    workers: int,
+) -> Dict[Signature, bytes]:
+    variant = get_variant(variant_name)
+    order = list(tablebase.signatures(pieces))
+    slices: Dict[Signature, bytes] = {}
+
+    for signature in order:
+        if signature in slices:
+            continue
+        twin = tablebase.swapped(signature)
+        pair = [signature] if twin == signature else [signature, twin]
+        sizes = [Layout(variant.geometry, member).size for member in pair]
+        size = sum(sizes)
+
+        started = time.perf_counter()
+        step = max(1, -(-size // (workers * CHUNKS_PER_WORKER)))
+        parts = pool.map(
+            partial(_expand, variant_name, order, pair),
+            [(start, min(start + step, size)) for start in range(0, size, step)]
+        )
+        distance = _solve(size, parts, order, slices)
+
+        data = np.where(distance >= 0, distance + 1, tablebase.DRAW)
+        data = data.astype(np.uint8)
+        start = 0
+        for member, member_size in zip(pair, sizes):
+            slices[member] = data[start:start + member_size].tobytes()
+            start += member_size
+
+        decided = distance >= 0
+        log.info(
+            '%s: %d positions, %d decided, longest %d turns, %.1fs',
+            '/'.join(''.join(map(str, member)) for member in pair),
+            size, int(decided.sum()), int(distance.max(initial=0)),
+            time.perf_counter() - started,
+        )
+
+    return {signature: slices[signature] for signature in order}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--variant', choices=list(VariantName), default=VariantName.RUSSIAN
+    )
+    parser.add_argument('--pieces', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='tablebases')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    variant = VariantName(args.variant)
+    workers = args.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        slices = build(variant, args.pieces, pool, workers)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, tablebase.file_name(variant))
+    tablebase.write(path, get_variant(variant), args.pieces, slices)
+    log.info(
+        'Wrote %s, %d bytes in %.1fs', path,
+        os.path.getsize(path), time.perf_counter() - started
+    )
+
+
+if __name__ == '__main__':
+    main()
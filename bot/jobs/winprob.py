@@ -0,0 +1,131 @@
+"""Fit the win probability model on the finished games.
+
+Games are streamed in chunks in id order and replayed; the features of
+the position at the start of every turn are kept with the game's result
+(``bot.bl.winprob``). One logistic regression is fitted per variant with
+enough positions, and the weights are written to one file, to be loaded
+by the bot through ``winprob_model``.
+
+Usage: python -m bot.jobs.winprob [--chunk N] [--min-games N]
+    [--output FILE]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from bot.bl import winprob
+from bot.bl.board import Board
+from bot.bl.game import load_game_chunk, load_move_records
+from bot.bl.history import MoveRecord, record_move, split_turns
+from bot.bl.piece import PieceColor
+from bot.bl.repertoire import game_winner
+from bot.bl.variant import VariantName, get_variant
+from bot.db.models import Game
+from bot.db.session import init_session, s
+from bot.utils.setup import init_config
+
+log = logging.getLogger(__name__)
+
+_COLUMNS = (
+    Game.id,
+    Game.variant,
+    Game.winner_id,
+    Game.white_player_id,
+    Game.black_player_id,
+)
+
+
+class _Samples:
+    def __init__(self) -> None:
+        self.games = 0
+        self.rows: List[Tuple[float, ...]] = []
+        self.results: List[float] = []
+
+
+def add_game(
+    samples: _Samples,
+    variant: VariantName,
+    records: Sequence[MoveRecord],
+    winner: PieceColor | None,
+) -> None:
+    result = 0.5 if winner is None else float(winner == PieceColor.WHITE)
+    board = Board(get_variant(variant))
+    color = PieceColor.WHITE
+    samples.games += 1
+    for turn in split_turns(records):
+        samples.rows.append(winprob.features(board, color))
+        samples.results.append(result)
+        for record in turn:
+            board.execute_move(record_move(record, board.geometry))
+        color = (
+            PieceColor.BLACK if color == PieceColor.WHITE
+            else PieceColor.WHITE
+        )
+
+
+async def run(chunk: int, min_games: int, output: str) -> None:
+    s.session = s.maker()
+    samples: Dict[VariantName, _Samples] = {}
+    last_id: UUID | None = None
+    started = time.perf_counter()
+
+    try:
+        while True:
+            games = await load_game_chunk(_COLUMNS, last_id, chunk)
+            if not games:
+                break
+
+            records = await load_move_records([row[0] for row in games])
+            for game_id, variant, winner_id, white_id, black_id in games:
+                add_game(
+                    samples.setdefault(variant, _Samples()),
+                    variant,
+                    records[game_id],
+                    game_winner(winner_id, white_id, black_id),
+                )
+            last_id = games[-1][0]
+    finally:
+        await s.session.close()
+
+    models: Dict[VariantName, np.ndarray] = {}
+    for variant, found in samples.items():
+        if found.games < min_games:
+            log.info('%s: %d games, not enough', variant, found.games)
+            continue
+        rows = np.array(found.rows, dtype=np.float64)
+        results = np.array(found.results)
+        weights = models[variant] = winprob.fit(rows, results)
+        error = np.mean((winprob.predict(weights, rows) - results) ** 2)
+        log.info(
+            '%s: %d games, %d positions, Brier score %.4f, weights %s',
+            variant, found.games, len(rows), error,
+            np.array2string(weights, precision=4),
+        )
+
+    winprob.save(output, models)
+    log.info(
+        'Wrote %s: %d models in %.2fs',
+        output, len(models), time.perf_counter() - started
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=1000)
+    parser.add_argument('--min-games', type=int, default=100)
+    parser.add_argument('--output', default='winprob.npz')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_config()
+    init_session()
+    asyncio.run(run(args.chunk, args.min_games, args.output))
+
+
+if __name__ == '__main__':
+    main()
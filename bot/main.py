@@ -10,6 +10,7 @@ from aiogram.webhook.aiohttp_server import (
 )
 from aiohttp import web
 
+from bot.bl import book, engine_pool, tablebase, winprob
 from bot.config import Config, UpdateStrategy
 from bot.controllers.router import router
 from bot.db.session import init_session
@@ -17,6 +18,7 @@ from bot.middlewares.i18n import setup_i18n
 from bot.middlewares.session import session_middleware
 from bot.middlewares.throttling import ThrottlingMiddleware
 from bot.middlewares.user import user_middleware
+from bot.utils.keyboard import board_keyboards
 from bot.utils.setup import init_config
 
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +36,23 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot) -> None:
         await bot.set_webhook(
             f'https://{Config.c.host_url}/webhook/main'
         )
+    if Config.c.tablebase_dir:
+        tablebase.load(Config.c.tablebase_dir)
+    if Config.c.book_dir:
+        book.load(Config.c.book_dir)
+    if Config.c.winprob_model:
+        winprob.load(Config.c.winprob_model)
+    await engine_pool.start(
+        Config.c.engine_workers, Config.c.review_workers
+    )
+
+
+async def on_shutdown(dispatcher: Dispatcher, bot: Bot) -> None:
+    await engine_pool.stop()
+    log.info(
+        'Board keyboard cache: %d hits, %d misses',
+        board_keyboards.hits, board_keyboards.misses
+    )
 
 
 def main() -> None:
@@ -46,6 +65,7 @@ def main() -> None:
 
     dp = Dispatcher()
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     dp.update.outer_middleware(session_middleware)
 
     i18n, i18n_middleware = setup_i18n()
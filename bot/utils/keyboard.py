@@ -1,9 +1,17 @@
-from functools import partial
+from collections import OrderedDict
+from datetime import datetime
+from functools import cache, partial
+from typing import Callable, Dict, Hashable, List, Sequence, Set, Tuple
+from uuid import UUID
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from bot.bl import book, puzzle
+from bot.bl.bitboard import Geometry
 from bot.bl.board import Board
+from bot.bl.engine import Difficulty
+from bot.bl.move import Move
 from bot.bl.piece import PieceColor
 from bot.middlewares.i18n import gettext_with_locale
 
@@ -21,6 +29,13 @@ def create_invitation_keyboard(
             callback_data=f"accept:{game_id}"
         )
     )
+    builder.row(*(
+        InlineKeyboardButton(
+            text=_(f'btn-vs-bot-{difficulty}'),
+            callback_data=f"vsbot:{game_id}:{difficulty}"
+        )
+        for difficulty in Difficulty
+    ))
     builder.row(
         InlineKeyboardButton(
             text=_('btn-cancel'),
@@ -31,29 +46,128 @@ def create_invitation_keyboard(
     return builder.as_markup()
 
 
+# Telegram allows at most 8 buttons in a row
+MAX_ROW_BUTTONS = 8
+
+
+@cache
+def board_layout(geometry: Geometry) -> Tuple[Tuple[str | None, ...], ...]:
+    """Rows of squares from the top, None marks a blank button.
+
+    Boards wider than a keyboard row show only the playable squares,
+    shifted by half a button on alternate rows.
+    """
+    size = geometry.size
+    rows: List[Tuple[str | None, ...]] = []
+    for row in range(size - 1, -1, -1):
+        squares = [
+            geometry.positions[geometry.coords_index[(col, row)]]
+            if (col, row) in geometry.coords_index else None
+            for col in range(size)
+        ]
+        if size > MAX_ROW_BUTTONS:
+            playable = [pos for pos in squares if pos is not None]
+            squares = (
+                [*playable, None] if row % 2 == 0 else [None, *playable]
+            )
+        rows.append(tuple(squares))
+    return tuple(rows)
+
+
+# Rendered game and puzzle boards kept by the bot process
+BOARD_KEYBOARDS = 1024
+
+
+class KeyboardCache:
+    """Rendered keyboards, least recently used dropped first."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._keyboards: OrderedDict[
+            Hashable, InlineKeyboardMarkup
+        ] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keyboards)
+
+    def get(self, key: Hashable) -> InlineKeyboardMarkup | None:
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._keyboards.move_to_end(key)
+        return keyboard
+
+    def put(self, key: Hashable, keyboard: InlineKeyboardMarkup) -> None:
+        self._keyboards[key] = keyboard
+        self._keyboards.move_to_end(key)
+        while len(self._keyboards) > self.size:
+            self._keyboards.popitem(last=False)
+
+    def render(
+        self, key: Hashable, build: Callable[[], InlineKeyboardMarkup]
+    ) -> InlineKeyboardMarkup:
+        """The keyboard kept for ``key``, built and kept on a miss."""
+        keyboard = self.get(key)
+        if keyboard is None:
+            keyboard = build()
+            self.put(key, keyboard)
+        return keyboard
+
+
+board_keyboards = KeyboardCache(BOARD_KEYBOARDS)
+
+
 def create_board_keyboard(
     board: Board,
     game_id: str,
     current_turn: PieceColor,
     selected_pos: str | None = None,
     locale: str = 'en'
+) -> InlineKeyboardMarkup:
+    """Game board with the side to move's pieces and targets as buttons.
+
+    Keyboards are cached by position; the squares that may move and the
+    selected piece's targets are part of the key, since in the middle of
+    a capture sequence they differ from those of the same position at
+    the start of a turn.
+    """
+    legal_moves = board.analysis.moves(current_turn)
+    targets: Tuple[str, ...] = ()
+    if selected_pos:
+        targets = tuple(
+            move.to_pos for move in legal_moves.get(selected_pos, [])
+        )
+
+    key = (
+        board.position_hash(current_turn), current_turn, selected_pos,
+        game_id, locale, tuple(legal_moves), targets,
+    )
+    return board_keyboards.render(key, partial(
+        _render_board_keyboard,
+        board, game_id, legal_moves, selected_pos, set(targets), locale,
+    ))
+
+
+def _render_board_keyboard(
+    board: Board,
+    game_id: str,
+    legal_moves: Dict[str, List[Move]],
+    selected_pos: str | None,
+    targets: Set[str],
+    locale: str,
 ) -> InlineKeyboardMarkup:
     _ = partial(gettext_with_locale, locale=locale)
     builder = InlineKeyboardBuilder()
 
-    valid_moves = []
-    if selected_pos:
-        piece = board.get_piece(selected_pos)
-        if piece and piece.color == current_turn:
-            valid_moves = board.get_valid_moves(selected_pos, current_turn)
-
-    for row in range(7, -1, -1):
+    for squares in board_layout(board.geometry):
         row_buttons = []
 
-        for col in range(8):
-            pos = Board.coords_to_pos(col, row)
-
-            if not pos or pos not in board.squares:
+        for pos in squares:
+            if not pos:
                 row_buttons.append(
                     InlineKeyboardButton(
                         text="  ",
@@ -67,17 +181,13 @@ def create_board_keyboard(
             if selected_pos == pos:
                 button_text = f"[{piece.to_emoji()}]" if piece else "[•]"
                 callback_data = f"deselect:{game_id}"
-            elif selected_pos and any(m.to_pos == pos for m in valid_moves):
+            elif pos in targets:
                 button_text = "🟢"
                 callback_data = f"move:{game_id}:{selected_pos}-{pos}"
             elif piece:
                 button_text = piece.to_emoji()
-                if piece.color == current_turn:
-                    piece_moves = board.get_valid_moves(pos, current_turn)
-                    if piece_moves:
-                        callback_data = f"select:{game_id}:{pos}"
-                    else:
-                        callback_data = "noop"
+                if pos in legal_moves:
+                    callback_data = f"select:{game_id}:{pos}"
                 else:
                     callback_data = "noop"
             else:
@@ -103,6 +213,13 @@ def create_board_keyboard(
             callback_data=f"surrender:{game_id}"
         )
     )
+    if book.get(board.variant.name) is not None:
+        builder.row(
+            InlineKeyboardButton(
+                text=_('btn-opening-explorer'),
+                callback_data=f"book:{game_id}"
+            )
+        )
 
     return builder.as_markup()
 
@@ -111,18 +228,24 @@ def create_history_board_keyboard(
     board: Board,
     game_id: str,
     current_move: int,
-    total_moves: int
+    total_moves: int,
+    searchable: bool = False,
+    forkable: bool = False,
+    locale: str = 'en'
 ) -> InlineKeyboardMarkup:
-    """Create non-interactive board with navigation buttons for history."""
+    """Create non-interactive board with navigation buttons for history.
+
+    ``searchable`` adds a button looking the position up in other games,
+    ``forkable`` one opening an analysis board from it.
+    """
+    _ = partial(gettext_with_locale, locale=locale)
     builder = InlineKeyboardBuilder()
 
-    for row in range(7, -1, -1):
+    for squares in board_layout(board.geometry):
         row_buttons = []
 
-        for col in range(8):
-            pos = Board.coords_to_pos(col, row)
-
-            if not pos or pos not in board.squares:
+        for pos in squares:
+            if not pos:
                 row_buttons.append(
                     InlineKeyboardButton(text="  ", callback_data="noop")
                 )
@@ -181,4 +304,166 @@ def create_history_board_keyboard(
 
     builder.row(*nav_buttons)
 
+    if forkable:
+        builder.row(
+            InlineKeyboardButton(
+                text=_('btn-try-from-here'),
+                callback_data=f"hfork:{game_id}:{current_move}"
+            )
+        )
+    if searchable:
+        builder.row(
+            InlineKeyboardButton(
+                text=_('btn-position-search'),
+                callback_data=f"hpos:{game_id}:{current_move}"
+            )
+        )
+
+    return builder.as_markup()
+
+
+def create_position_games_keyboard(
+    games: Sequence[Tuple[UUID, int, datetime | None]],
+    back: str,
+    locale: str = 'en'
+) -> InlineKeyboardMarkup:
+    """One button per game, opening its history at the position."""
+    _ = partial(gettext_with_locale, locale=locale)
+    builder = InlineKeyboardBuilder()
+
+    for game_id, move, finished_at in games:
+        day = f"{finished_at:%Y-%m-%d}" if finished_at else "?"
+        builder.row(
+            InlineKeyboardButton(
+                text=_('btn-position-game', date=day, move=move),
+                callback_data=f"hv:{game_id}:{move}"
+            )
+        )
+    builder.row(
+        InlineKeyboardButton(
+            text=_('btn-back-to-game'),
+            callback_data=back
+        )
+    )
+
+    return builder.as_markup()
+
+
+def _add_turn_board(
+    builder: InlineKeyboardBuilder,
+    board: Board,
+    prefix: str,
+    key: str,
+    turn: PieceColor | None,
+    selected_pos: str | None
+) -> None:
+    """Board rows played a whole turn per move.
+
+    A selected piece shows the squares its turns end on; buttons send
+    ``{prefix}s`` (select), ``{prefix}d`` (deselect) and ``{prefix}m``
+    (move) with ``key``. Without a ``turn`` there are no moves.
+    """
+    turns = board.get_turns(turn) if turn is not None else []
+    starts = {moves[0].from_pos for moves in turns}
+    targets = {
+        moves[-1].to_pos for moves in turns
+        if moves[0].from_pos == selected_pos
+    }
+
+    for squares in board_layout(board.geometry):
+        row_buttons = []
+
+        for pos in squares:
+            if not pos:
+                row_buttons.append(
+                    InlineKeyboardButton(text="  ", callback_data="noop")
+                )
+                continue
+
+            piece = board.get_piece(pos)
+
+            if selected_pos == pos:
+                button_text = f"[{piece.to_emoji()}]" if piece else "[•]"
+                callback_data = f"{prefix}d:{key}"
+            elif pos in targets:
+                button_text = "🟢"
+                callback_data = f"{prefix}m:{key}:{selected_pos}-{pos}"
+            elif piece and pos in starts:
+                button_text = piece.to_emoji()
+                callback_data = f"{prefix}s:{key}:{pos}"
+            else:
+                button_text = piece.to_emoji() if piece else "•"
+                callback_data = "noop"
+
+            row_buttons.append(
+                InlineKeyboardButton(
+                    text=button_text,
+                    callback_data=callback_data
+                )
+            )
+
+        builder.row(*row_buttons)
+
+
+def create_puzzle_keyboard(
+    board: Board,
+    puzzle_id: int,
+    turn: PieceColor | None,
+    selected_pos: str | None = None,
+    routes: Sequence[Sequence[Move]] = ()
+) -> InlineKeyboardMarkup:
+    """Board of a puzzle; without a ``turn`` it is shown solved.
+
+    ``routes`` are captures between the same two squares that take
+    different pieces; each gets a button of its own below the board.
+    """
+    builder = InlineKeyboardBuilder()
+    _add_turn_board(
+        builder, board, "pz", str(puzzle_id), turn, selected_pos
+    )
+    for route in routes:
+        builder.row(
+            InlineKeyboardButton(
+                text=puzzle.turn_notation(route),
+                callback_data=(
+                    f"pzm:{puzzle_id}:{route[0].from_pos}-"
+                    f"{route[-1].to_pos}:{puzzle.turn_captures(route):x}"
+                )
+            )
+        )
+    return builder.as_markup()
+
+
+def create_analysis_keyboard(
+    board: Board,
+    session_id: str,
+    turn: PieceColor | None,
+    selected_pos: str | None,
+    can_undo: bool,
+    can_redo: bool,
+    back: str,
+    locale: str = 'en'
+) -> InlineKeyboardMarkup:
+    """Analysis board with undo, redo and a button back to ``back``."""
+    _ = partial(gettext_with_locale, locale=locale)
+    builder = InlineKeyboardBuilder()
+    _add_turn_board(builder, board, "an", session_id, turn, selected_pos)
+
+    builder.row(
+        InlineKeyboardButton(
+            text="↶",
+            callback_data=f"anu:{session_id}" if can_undo else "noop"
+        ),
+        InlineKeyboardButton(
+            text="↷",
+            callback_data=f"anr:{session_id}" if can_redo else "noop"
+        )
+    )
+    builder.row(
+        InlineKeyboardButton(
+            text=_('btn-back-to-game'),
+            callback_data=back
+        )
+    )
+
     return builder.as_markup()
@@ -0,0 +1,30 @@
+"""variant_on_games
+
+Revision ID: 9b3e61d0c4a2
+Revises: 4cceea50c2c7
+Create Date: 2026-10-18 16:02:41.308917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e61d0c4a2'
+down_revision = '4cceea50c2c7'
+branch_labels = None
+depends_on = None
+
+variant = sa.Enum(
+    'RUSSIAN', 'BRAZILIAN', 'INTERNATIONAL', 'ENGLISH', name='variantname'
+)
+
+
+def upgrade() -> None:
+    variant.create(op.get_bind(), checkfirst=True)
+    op.add_column('games', sa.Column('variant', variant, nullable=False, server_default='RUSSIAN'))
+
+
+def downgrade() -> None:
+    op.drop_column('games', 'variant')
+    variant.drop(op.get_bind(), checkfirst=True)
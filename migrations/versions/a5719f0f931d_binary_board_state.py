@@ -0,0 +1,116 @@
+"""binary_board_state
+
+Revision ID: a5719f0f931d
+Revises: 37902166f8c9
+Create Date: 2026-10-18 12:04:31.218840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5719f0f931d'
+down_revision = '37902166f8c9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Frozen copy of codec version 1 (bot/bl/codec.py), so this migration keeps
+# working whatever happens to the application code later.
+POSITIONS = [
+    chr(ord('a') + col) + str(row + 1)
+    for row in range(8)
+    for col in range(8)
+    if (col + row) % 2 == 0
+]
+STATES = {
+    ('white', False): 1,
+    ('white', True): 2,
+    ('black', False): 3,
+    ('black', True): 4,
+}
+PIECES = {state: piece for piece, state in STATES.items()}
+
+games = sa.table(
+    'games',
+    sa.column('id', sa.Uuid()),
+    sa.column('current_turn', sa.String()),
+    sa.column('board_state', sa.JSON()),
+    sa.column('board_data', sa.LargeBinary()),
+)
+
+
+def encode(board_state: dict, current_turn: str) -> bytes:
+    squares = board_state.get('squares', {})
+    value = 0
+    for pos in reversed(POSITIONS):
+        piece = squares.get(pos)
+        state = STATES[(piece['color'], piece['king'])] if piece else 0
+        value = value * 5 + state
+    value = value * 2 + (current_turn.upper() == 'BLACK')
+    return value.to_bytes(10, 'little')
+
+
+def decode(data: bytes) -> dict:
+    value = int.from_bytes(data, 'little') >> 1
+    squares = {}
+    for pos in POSITIONS:
+        value, state = divmod(value, 5)
+        if state:
+            color, king = PIECES[state]
+            squares[pos] = {'color': color, 'king': king}
+    return {'squares': squares, 'must_capture': []}
+
+
+def convert(source: str, target: str, transform) -> None:
+    conn = op.get_bind()
+    last_id = None
+
+    while True:
+        query = (
+            sa.select(games.c.id, games.c.current_turn, games.c[source])
+            .order_by(games.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(games.c.id > last_id)
+
+        rows = conn.execute(query).all()
+        if not rows:
+            break
+
+        conn.execute(
+            games.update()
+            .where(games.c.id == sa.bindparam('game_id'))
+            .values({target: sa.bindparam('value')}),
+            [
+                {'game_id': row.id, 'value': transform(row)}
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('games', sa.Column('board_data', sa.LargeBinary(), nullable=True))
+    op.add_column('games', sa.Column('board_version', sa.SmallInteger(), nullable=False, server_default='1'))
+
+    convert(
+        'board_state', 'board_data',
+        lambda row: encode(row.board_state, row.current_turn)
+    )
+
+    op.alter_column('games', 'board_data', nullable=False)
+    op.drop_column('games', 'board_state')
+
+
+def downgrade() -> None:
+    op.add_column('games', sa.Column('board_state', sa.JSON(), nullable=True))
+
+    convert('board_data', 'board_state', lambda row: decode(row.board_data))
+
+    op.alter_column('games', 'board_state', nullable=False)
+    op.drop_column('games', 'board_version')
+    op.drop_column('games', 'board_data')
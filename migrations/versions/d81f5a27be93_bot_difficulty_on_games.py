@@ -0,0 +1,28 @@
+"""bot_difficulty_on_games
+
+Revision ID: d81f5a27be93
+Revises: 9b3e61d0c4a2
+Create Date: 2026-10-18 17:11:05.724183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f5a27be93'
+down_revision = '9b3e61d0c4a2'
+branch_labels = None
+depends_on = None
+
+difficulty = sa.Enum('EASY', 'MEDIUM', 'HARD', name='difficulty')
+
+
+def upgrade() -> None:
+    difficulty.create(op.get_bind(), checkfirst=True)
+    op.add_column('games', sa.Column('bot_difficulty', difficulty, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('games', 'bot_difficulty')
+    difficulty.drop(op.get_bind(), checkfirst=True)